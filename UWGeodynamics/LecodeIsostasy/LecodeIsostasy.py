@@ -4,6 +4,7 @@ import numpy as np
 from mpi4py import MPI
 from scipy.interpolate import interp1d, interp2d
 from UWGeodynamics._material import Material
+from UWGeodynamics._projection import BatchedProjector
 
 comm = MPI.COMM_WORLD
 rank = comm.Get_rank()
@@ -107,12 +108,13 @@ class LecodeIsostasy(object):
             dataType="double", count=1)
         self.DensityVar = uw.mesh.MeshVariable(self.mesh, nodeDofCount=1)
         self.MaterialVar = uw.mesh.MeshVariable(self.mesh, nodeDofCount=1)
-        self.projectorDensity = uw.utils.MeshVariable_Projection(
+        self.projections = BatchedProjector(self.mesh)
+        self.projectorDensity = self.projections.add(
+            "density",
             self.DensityVar,
-            self._densityFn,
-            type=0)
-        self.projectorMaterial = uw.utils.MeshVariable_Projection(
-            self.MaterialVar, self.MaterialIndexFieldFloat, type=0)
+            self._densityFn)
+        self.projectorMaterial = self.projections.add(
+            "material", self.MaterialVar, self.MaterialIndexFieldFloat)
 
         if not self.mesh._cself.isRegular:
             if self._mesh_advector:
@@ -137,8 +139,7 @@ class LecodeIsostasy(object):
             np.rint(self.materialIndexField.data.astype("float"))
         )
 
-        self.projectorDensity.solve()
-        self.projectorMaterial.solve()
+        self.projections.solve()
 
         sep_velocities_nodes, _ = self._get_sep_velocities2D()
         botMeanDensities, botMeanDensities0 = self._get_average_densities2D()
@@ -179,8 +180,7 @@ class LecodeIsostasy(object):
             np.rint(self.materialIndexField.data.astype("float"))
         )
 
-        self.projectorDensity.solve()
-        self.projectorMaterial.solve()
+        self.projections.solve()
 
         sep_velocities_nodes, _ = self._get_sep_velocities3D()
         botMeanDensities, botMeanDensities0 = self._get_average_densities3D()
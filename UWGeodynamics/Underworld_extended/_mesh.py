@@ -7,6 +7,8 @@ from UWGeodynamics import non_dimensionalise
 from UWGeodynamics import UnitRegistry as u
 from UWGeodynamics.version import git_revision as __git_revision__
 from . import _meshvariable as var
+from ._utils import _compression_kwargs
+from ._redistribute import SavedGrid
 
 class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
 
@@ -52,7 +54,8 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
 
         return  var.MeshVariable(self, nodeDofCount, dataType, **kwargs)
 
-    def save(self, filename, units=None, time=None):
+    def save(self, filename, units=None, time=None, dtype=None,
+             compression=None):
         """
         Save the mesh to disk
 
@@ -60,6 +63,11 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
         ----------
         filename : string
             The name of the output file.
+        dtype : numpy dtype, optional
+            The data type used for the vertices (defaults to the type
+            of the mesh data).
+        compression : str, optional
+            Compression filter: "gzip", "gzip:<level>" or "lzf".
 
         Returns
         -------
@@ -134,7 +142,8 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
         globalShape = ( self.nodesGlobal, self.data.shape[1] )
         dset = h5f.create_dataset("vertices",
                                   shape=globalShape,
-                                  dtype=self.data.dtype)
+                                  dtype=dtype if dtype else self.data.dtype,
+                                  **_compression_kwargs(compression, globalShape))
 
         local = self.nodesLocal
         # write to the dset using the local set of global node ids
@@ -145,7 +154,8 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
         globalShape = ( self.elementsGlobal, self.data_elementNodes.shape[1] )
         dset = h5f.create_dataset("en_map",
                                   shape=globalShape,
-                                  dtype=self.data_elementNodes.dtype)
+                                  dtype=self.data_elementNodes.dtype,
+                                  **_compression_kwargs(compression, globalShape))
 
         local = self.elementsLocal
         # write to the dset using the local set of global node ids
@@ -157,7 +167,7 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
         # return our file handle
         return uw.utils.SavedFileData(self, filename)
 
-    def load(self, filename):
+    def load(self, filename, group=None, interpolate=False):
         """
         Load the mesh from disk.
 
@@ -166,6 +176,14 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
         filename: str
             The filename for the saved file. Relative or absolute paths may be
             used, but all directories must exist.
+        group: str
+            The h5 group the mesh is stored in (defaults to the root
+            of the file).
+        interpolate: bool
+            Set to True to load a file saved with a different resolution.
+            The saved mesh must be a regular grid, possibly deformed along
+            its axes. The nodes of the mesh are placed along the saved axes,
+            keeping the spacing of the saved mesh.
 
         Notes
         -----
@@ -189,20 +207,25 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
 
         # get field and mesh information
         h5f = h5py.File( filename, "r", driver='mpio', comm=MPI.COMM_WORLD );
+        grp = h5f[group] if group else h5f
 
         # get resolution of old mesh
-        res = h5f.attrs['mesh resolution']
+        res = grp.attrs['mesh resolution']
         if res is None:
             raise RuntimeError("Can't read the 'mesh resolution' for the field hdf5 file,"+
                    " was it created correctly?")
 
         if (res == self.elementRes).all() == False:
-            raise RuntimeError("Provided file mesh resolution does not appear to correspond to\n"\
-                               "resolution of mesh object.")
+            if not interpolate:
+                raise RuntimeError("Provided file mesh resolution does not appear to correspond to\n"\
+                                   "resolution of mesh object.")
+            self._load_interpolated(grp)
+            h5f.close()
+            return
 
         # get units
         try:
-            units = h5f.attrs["units"]
+            units = grp.attrs["units"]
         except KeyError:
             units = None
 
@@ -211,7 +234,7 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
         else:
             units = None
 
-        dset = h5f.get('vertices')
+        dset = grp.get('vertices')
         if dset == None:
             raise RuntimeError("Can't find the 'vertices' dataset in hdf5 file '{0}'".format(filename) )
 
@@ -222,7 +245,7 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
         if len(dset) != self.nodesGlobal:
             raise RuntimeError("Provided data file appears to be for a different resolution mesh.")
 
-        with self.deform_mesh(isRegular=h5f.attrs['regular']):
+        with self.deform_mesh(isRegular=grp.attrs['regular']):
             with dset.collective:
                 if units:
                     self.data[0:self.nodesLocal] = non_dimensionalise(
@@ -231,3 +254,23 @@ class FeMesh_Cartesian(uw.mesh.FeMesh_Cartesian):
                     self.data[0:self.nodesLocal] = dset[self.data_nodegId[0:self.nodesLocal], :]
 
         h5f.close()
+
+    def _load_interpolated(self, grp):
+        """ Place the nodes along the axes of the saved mesh in grp """
+        grid = SavedGrid(grp)
+        grid.check(self.data.min(axis=0), self.data.max(axis=0))
+
+        fact = 2 if self.elementType.upper() == "Q2" else 1
+        nodeRes = [fact * res + 1 for res in self.elementRes]
+        axes = grid.remap_axes(nodeRes)
+
+        # I, J, K indices of the local and shadow nodes
+        gIds = self.data_nodegId.ravel()
+        indices = []
+        for n in nodeRes:
+            indices.append(gIds % n)
+            gIds = gIds // n
+
+        with self.deform_mesh(isRegular=grp.attrs['regular']):
+            for axis, index in enumerate(indices):
+                self.data[:, axis] = axes[axis][index]
@@ -8,6 +8,8 @@ from UWGeodynamics import dimensionalise
 from UWGeodynamics import non_dimensionalise
 from UWGeodynamics import UnitRegistry as u
 from UWGeodynamics.version import git_revision as __git_revision__
+from ._utils import _compression_kwargs
+from ._redistribute import SavedGrid
 
 
 class MeshVariable(uw.mesh.MeshVariable):
@@ -15,7 +17,7 @@ class MeshVariable(uw.mesh.MeshVariable):
     def __init__(self, mesh, nodeDofCount, dataType="double", **kwargs):
         super(MeshVariable, self).__init__(mesh, nodeDofCount, dataType, **kwargs)
 
-    def load(self, filename, interpolate=False):
+    def load(self, filename, interpolate=False, group=None, meshFilename=None):
         """
         Load the MeshVariable from disk.
 
@@ -26,10 +28,16 @@ class MeshVariable(uw.mesh.MeshVariable):
             used, but all directories must exist.
         interpolate: bool
             Set to True to interpolate a file containing different resolution data.
-            Note that a temporary MeshVariable with the file data will be build
-            on **each** processor. Also note that the temporary MeshVariable
-            can only be built if its corresponding mesh file is available.
-            Also note that the supporting mesh mush be regular.
+            Each processor only reads the part of the file covering its domain.
+            Note that the interpolation is only possible if the corresponding
+            mesh file is available. Also note that the supporting mesh must be
+            regular, possibly deformed along its axes.
+        group: str
+            The h5 group the variable is stored in (defaults to the root
+            of the file).
+        meshFilename: str
+            The file of the mesh the variable was saved on, used for the
+            interpolation. Defaults to the 'mesh' link of the variable file.
 
         Notes
         -----
@@ -52,11 +60,12 @@ class MeshVariable(uw.mesh.MeshVariable):
 
         # get field and mesh information
         h5f = h5py.File( filename, "r", driver='mpio', comm=MPI.COMM_WORLD );
-        dset = h5f.get('data')
+        grp = h5f[group] if group else h5f
+        dset = grp.get('data')
 
         # get units
         try:
-            units = h5f.attrs["units"]
+            units = grp.attrs["units"]
         except KeyError:
             units = None
 
@@ -87,63 +96,28 @@ class MeshVariable(uw.mesh.MeshVariable):
                                    "If you would like to interpolate the data to the current variable, please set\n" \
                                    "the 'interpolate' parameter. Check docstring for important caveats of interpolation method.")
 
-            # if here then we build a local version of the entire file field and interpolate it's values
+            # if here then each process only reads the part of the file field
+            # covering its domain and interpolates it's values
 
             # first get file field's mesh
-            if h5f.get('mesh') == None:
+            meshFile = None
+            if meshFilename:
+                meshFile = h5py.File(meshFilename, "r", driver='mpio', comm=MPI.COMM_WORLD)
+                meshGrp = meshFile
+            elif grp.get('mesh') is not None:
+                meshGrp = grp['mesh']
+            else:
                 raise RuntimeError("The hdf5 field to be loaded with interpolation must have an associated "+
                         "'mesh' hdf5 file. Resave the field with its associated mesh."+
                         "i.e. myField.save(\"filename.h5\", meshFilename)" )
-            # get resolution of old mesh
-            res = h5f['mesh'].attrs.get('mesh resolution')
-            if res is None:
-                raise RuntimeError("Can't read the 'mesh resolution' for the field hdf5 file,"+
-                       " was it created correctly?")
-
-            # get max of old mesh
-            inputMax = h5f['mesh'].attrs.get('max')
-            if inputMax is None:
-                raise RuntimeError("Can't read the 'max' for the field hdf5 file,"+
-                       " was it created correctly?")
-
-            inputMin = h5f['mesh'].attrs.get('min')
-            if inputMin is None:
-                raise RuntimeError("Can't read the 'min' for the field hdf5 file,"+
-                       " was it created correctly?")
-            regular = h5f['mesh'].attrs.get('regular')
-            if regular and regular!=True:
-                raise RuntimeError("Saved mesh file appears to correspond to a irregular mesh.\n"\
-                                   "Interpolating from irregular mesh not currently supported." )
-
-            elType = h5f['mesh'].attrs.get('elementType')
-            # for backwards compatiblity, the 'elementType' attribute was added Feb2017
-            if elType == None:
-                elType = 'Q1'
-
-            # build the NON-PARALLEL field and mesh
-            inputMesh = uw.mesh.FeMesh_Cartesian( elementType = (elType+"/DQ0"), # only geometryMesh can be saved
-                                          elementRes  = tuple(res),
-                                          minCoord    = tuple(inputMin),
-                                          maxCoord    = tuple(inputMax),
-                                          partitioned=False)
-
-            # load data onto MeshVariable
-            if len(dset) == inputMesh.nodesGlobal:
-                inputField = uw.mesh.MeshVariable( mesh=inputMesh, nodeDofCount=dof )
-            elif  dset.shape[0] == inputMesh.subMesh.nodesGlobal:
-                # load as a subMesh
-                # assume the dset field belongs to the subMesh
-                inputField = uw.mesh.MeshVariable( mesh=inputMesh.subMesh, nodeDofCount=dof )
-            else:
-                # raise error
-                raise RuntimeError("The saved mesh file can't be read onto the interpolation grid.\n" \
-                                   "Note: only subMesh variable with elementType 'DQ0' can be used presently used")
 
-            # copy hdf5 numpy array onto serial inputField
-            inputField.data[:] = dset[:]
+            grid = SavedGrid(meshGrp)
+            points = self.mesh.data
+            grid.check(points.min(axis=0), points.max(axis=0))
+            self.data[:] = grid.interpolate(dset, points)
 
-            # interpolate 'inputField' onto the self nodes
-            self.data[:] = inputField.evaluate(self.mesh.data)
+            if meshFile:
+                meshFile.close()
 
         if units:
             if units.units == "degC":
@@ -155,7 +129,8 @@ class MeshVariable(uw.mesh.MeshVariable):
         uw.libUnderworld.StgFEM._FeVariable_SyncShadowValues( self._cself )
         h5f.close()
 
-    def save(self, filename, meshHandle=None, units=None, time=None):
+    def save(self, filename, meshHandle=None, units=None, time=None,
+             dtype=None, compression=None):
         """
         Save the MeshVariable to disk.
 
@@ -168,6 +143,11 @@ class MeshVariable(uw.mesh.MeshVariable):
             The saved mesh file handle. If provided, a link is created within the
             mesh variable file to this saved mesh file. Important for checkpoint when
             the mesh deforms.
+        dtype : numpy dtype, optional
+            The data type used in the file (defaults to the type of the
+            variable).
+        compression : str, optional
+            Compression filter: "gzip", "gzip:<level>" or "lzf".
 
         Notes
         -----
@@ -222,7 +202,8 @@ class MeshVariable(uw.mesh.MeshVariable):
         # create dataset
         dset = h5f.create_dataset("data",
                                   shape=globalShape,
-                                  dtype=self.data.dtype)
+                                  dtype=dtype if dtype else self.data.dtype,
+                                  **_compression_kwargs(compression, globalShape))
         fact = 1.0
         if units:
             fact = dimensionalise(1.0, units=units).magnitude
@@ -0,0 +1,198 @@
+from __future__ import print_function,  absolute_import
+import numpy as np
+from mpi4py import MPI
+from scipy.interpolate import RegularGridInterpolator
+from UWGeodynamics import non_dimensionalise
+from UWGeodynamics import UnitRegistry as u
+
+
+def proc_bounds(coords):
+    """ Bounding box of the particles owned by each process
+
+    Parameters
+    ----------
+    coords : array
+        Coordinates of the local particles.
+
+    Returns an array of shape (nProcs, 2, dim) with the minimum and the
+    maximum coordinates of each process. Processes without particles
+    have an empty (+inf, -inf) box.
+
+    Notes
+    -----
+    This function must be called collectively by all processes.
+    """
+    dim = coords.shape[1]
+    if len(coords):
+        local = np.array([coords.min(axis=0), coords.max(axis=0)])
+    else:
+        local = np.array([np.full(dim, np.inf), np.full(dim, -np.inf)])
+    return np.array(MPI.COMM_WORLD.allgather(local))
+
+
+def overlapping_ranges(procCount, bounds, lower, upper):
+    """ Ranges of a swarm file written by processes overlapping a box
+
+    Parameters
+    ----------
+    procCount : list
+        Number of particles written by each process (proc_offset).
+    bounds : array
+        Bounding box of the particles written by each process
+        (proc_bounds), in the units of lower and upper.
+    lower, upper : array
+        Corners of the box.
+
+    Returns a list of (offset, size) in increasing order.
+    """
+    offsets = np.concatenate(([0], np.cumsum(procCount)[:-1]))
+    overlap = np.all((bounds[:, 0, :] <= upper) &
+                     (bounds[:, 1, :] >= lower), axis=1)
+    return [(int(offsets[p]), int(procCount[p]))
+            for p in np.flatnonzero(overlap) if procCount[p] > 0]
+
+
+def _units(grp):
+    units = grp.attrs.get("units")
+    if units is not None and units != "None":
+        return u.parse_expression(units)
+    return None
+
+
+class SavedGrid(object):
+    """ Tensor product grid of a saved mesh
+
+    Only the coordinates along each axis are read from the file, the
+    data on the grid are then read by windows so that each process
+    only reads the part of the file covering its own domain.
+    """
+
+    def __init__(self, grp):
+        """
+        Parameters
+        ----------
+        grp : h5py group holding the saved mesh (vertices and
+              the 'mesh resolution' attribute).
+        """
+        self.grp = grp
+        self.vertices = grp.get("vertices")
+        if self.vertices is None:
+            raise RuntimeError("Can't find the 'vertices' dataset of the saved mesh")
+
+        self.elementRes = tuple(grp.attrs["mesh resolution"])
+        self.dim = len(self.elementRes)
+
+        # Q1 or Q2 nodes
+        for fact in (1, 2):
+            nodes = tuple(fact * res + 1 for res in self.elementRes)
+            if np.prod(nodes) == len(self.vertices):
+                break
+        else:
+            raise RuntimeError("Can't read the saved mesh: unsupported element type")
+        self.nodeRes = nodes
+
+        units = _units(grp)
+        stride = 1
+        self.axes = []
+        for axis, n in enumerate(self.nodeRes):
+            coords = self.vertices[0:n * stride:stride, axis]
+            if units:
+                coords = non_dimensionalise(coords * units)
+            self.axes.append(np.asarray(coords, dtype="float"))
+            stride *= n
+
+        # the cells of the subMesh (dQ0) are located at the element centres
+        fact = self.nodeRes[0] // self.elementRes[0]
+        self.cell_axes = [0.5 * (axis[:-fact:fact] + axis[fact::fact])
+                          for axis in self.axes]
+
+    def remap_axes(self, nodeRes):
+        """ Axes of a grid with nodeRes nodes following the spacing
+        of the saved grid """
+        return [np.interp(np.linspace(0., 1., new), np.linspace(0., 1., old),
+                          axis)
+                for new, old, axis in zip(nodeRes, self.nodeRes, self.axes)]
+
+    def _window(self, axes, lower, upper):
+        window = []
+        for axis, low, up in zip(axes, lower, upper):
+            n = len(axis)
+            start = min(max(np.searchsorted(axis, low, "right") - 1, 0), n - 1)
+            end = min(max(np.searchsorted(axis, up, "left"), 0), n - 1)
+            if end == start:
+                if end < n - 1:
+                    end += 1
+                elif start > 0:
+                    start -= 1
+            window.append((start, end + 1))
+        return window
+
+    @staticmethod
+    def _read(dset, shape, window):
+        """ Read a window of a dataset ordered along the x axis first
+
+        Returns an array of shape (nz, ny, nx, dof) """
+        nx = shape[0]
+        (i0, i1), (j0, j1) = window[0], window[1]
+        if len(shape) == 2:
+            planes = [0]
+        else:
+            planes = range(*window[2])
+        values = []
+        for k in planes:
+            start = (k * shape[1] + j0) * nx
+            block = dset[start:start + (j1 - j0) * nx]
+            values.append(block.reshape((j1 - j0, nx, -1))[:, i0:i1])
+        if len(shape) == 2:
+            return values[0]
+        return np.array(values)
+
+    def check(self, lower, upper):
+        """ Check that the saved mesh is a tensor product grid
+        over the box [lower, upper]
+
+        Notes
+        -----
+        This method must be called collectively by all processes.
+        """
+        window = self._window(self.axes, lower, upper)
+        vertices = self._read(self.vertices, self.nodeRes, window)
+        units = _units(self.grp)
+        if units:
+            vertices = non_dimensionalise(vertices * units)
+        axes = [axis[start:end] for axis, (start, end) in zip(self.axes, window)]
+        expected = np.stack(np.meshgrid(*axes[::-1], indexing="ij")[::-1],
+                            axis=-1)
+        valid = int(np.allclose(vertices, expected))
+        if not MPI.COMM_WORLD.allreduce(valid, op=MPI.MIN):
+            raise RuntimeError("The saved mesh is not a regular grid.\n"
+                               "Restarting with a different resolution is only "
+                               "supported for meshes deformed along the axes.")
+
+    def interpolate(self, dset, points):
+        """ Interpolate a saved field at points
+
+        Parameters
+        ----------
+        dset : h5py dataset of the field, defined on the nodes of the
+               mesh or on the cells (dQ0) of its subMesh.
+        points : array of the (non-dimensional) coordinates.
+
+        Only the part of the dataset covering the points is read.
+        """
+        if len(dset) == np.prod(self.nodeRes):
+            axes, shape = self.axes, self.nodeRes
+        elif len(dset) == np.prod(self.elementRes):
+            axes, shape = self.cell_axes, self.elementRes
+        else:
+            raise RuntimeError("The saved field can't be read onto the interpolation grid.\n"
+                               "Note: only subMesh variable with elementType 'DQ0' can be used presently used")
+
+        window = self._window(axes, points.min(axis=0), points.max(axis=0))
+        values = self._read(dset, shape, window)
+        axes = [axis[start:end] for axis, (start, end) in zip(axes, window)]
+
+        interpolator = RegularGridInterpolator(axes[::-1], values,
+                                               bounds_error=False,
+                                               fill_value=None)
+        return interpolator(points[:, ::-1])
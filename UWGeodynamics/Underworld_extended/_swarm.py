@@ -6,6 +6,7 @@ from mpi4py import MPI
 from UWGeodynamics import non_dimensionalise
 from UWGeodynamics import UnitRegistry as u
 from . import _swarmvariable as svar
+from ._redistribute import overlapping_ranges
 
 
 class Swarm(uw.swarm.Swarm):
@@ -56,7 +57,8 @@ class Swarm(uw.swarm.Swarm):
         """
         return svar.SwarmVariable( self, dataType, count )
 
-    def save(self, filename, collective=False, units=None, time=None):
+    def save(self, filename, collective=False, units=None, time=None,
+             dtype=None, compression=None):
         """
         Save the swarm to disk.
 
@@ -65,6 +67,10 @@ class Swarm(uw.swarm.Swarm):
         filename : str
             The filename for the saved file. Relative or absolute paths may be
             used, but all directories must exist.
+        dtype : numpy dtype, optional
+            The data type used for the coordinates.
+        compression : str, optional
+            Compression filter: "gzip", "gzip:<level>" or "lzf".
 
         Returns
         -------
@@ -110,11 +116,13 @@ class Swarm(uw.swarm.Swarm):
             raise TypeError("Expected filename to be provided as a string")
 
         # just save the particle coordinates SwarmVariable
-        self.particleCoordinates.save(filename, collective, units=units, time=time)
+        self.particleCoordinates.save(filename, collective, units=units,
+                                      time=time, dtype=dtype,
+                                      compression=compression)
 
         return uw.utils.SavedFileData( self, filename )
 
-    def load( self, filename, collective=False, try_optimise=True, verbose=False ):
+    def load( self, filename, collective=False, try_optimise=True, verbose=False, group=None ):
         """
         Load a swarm from disk. Note that this must be called before any SwarmVariable
         members are loaded.
@@ -133,6 +141,9 @@ class Swarm(uw.swarm.Swarm):
             by setting this option to False.
         verbose : bool
             Prints a swarm load progress bar.
+        group : str
+            The h5 group the swarm is stored in (defaults to the root
+            of the file).
 
         Notes
         -----
@@ -149,10 +160,11 @@ class Swarm(uw.swarm.Swarm):
 
         # open hdf5 file
         h5f = h5py.File(name=filename, mode="r", driver='mpio', comm=MPI.COMM_WORLD)
+        grp = h5f[group] if group else h5f
 
         # get units
         try:
-            units = h5f.attrs["units"]
+            units = grp.attrs["units"]
         except KeyError:
             units = None
 
@@ -161,7 +173,7 @@ class Swarm(uw.swarm.Swarm):
         else:
             units = None
 
-        dset = h5f.get('data')
+        dset = grp.get('data')
         if dset == None:
             raise RuntimeError("Can't find 'data' in file '{0}'.\n".format(filename))
         if dset.shape[1] != self.particleCoordinates.data.shape[1]:
@@ -177,34 +189,41 @@ class Swarm(uw.swarm.Swarm):
         # try and read the procCount attribute & assume that if nProcs in .h5 file
         # is equal to the current no. procs then the particles will be distributed the
         # same across the processors. (Danger if different discretisations are used... i think)
+        # else, if the bounding boxes of the processes were saved, only load the
+        # parts of the .h5 file written by processes overlapping the local domain,
         # else try and load the whole .h5 file.
-        # we set the 'offset' & 'size' variables to achieve the above
 
-        offset = 0
-        size = dset.shape[0] # number of particles in h5 file
-
-        if try_optimise:
-            procCount = h5f.attrs.get('proc_offset')
-            if procCount is not None and nProcs == len(procCount):
-                for p_i in range(rank):
-                    offset += procCount[p_i]
-                size = procCount[rank]
-
-        valid = np.zeros(0, dtype='i') # array for read in
+        # list of (offset, size) of the parts of the file to read
+        ranges = [(0, dset.shape[0])]
+
+        procCount = grp.attrs.get('proc_offset')
+        bounds = grp.attrs.get('proc_bounds')
+        if try_optimise and procCount is not None and nProcs == len(procCount):
+            ranges = [(int(np.sum(procCount[:rank])), int(procCount[rank]))]
+        elif (procCount is not None and bounds is not None and
+              len(bounds) == len(procCount)):
+            # the file was written by a different number of processes:
+            # only read the particles of the processes which domain
+            # overlaps the local domain. As the number of reads now
+            # differs between processes, they are all independent.
+            if units:
+                bounds = non_dimensionalise(bounds * units)
+            ranges = overlapping_ranges(procCount, bounds,
+                                        self.mesh.data.min(axis=0),
+                                        self.mesh.data.max(axis=0))
+            collective = False
+
+        valid = [] # global indices of the local particles, per chunk
         chunk=int(2e7) # read in this many points at a time
 
-        firstChunk = True
-        (multiples, remainder) = divmod( size, chunk )
-        for ii in range(multiples+1):
-            # setup the points to begin and end reading in
-            chunkStart = offset + ii*chunk
-            if ii == multiples:
-                chunkEnd = chunkStart + remainder
-                if remainder == 0: # in the case remainder is 0
-                    break
-            else:
-                chunkEnd = chunkStart + chunk
+        # setup the points to begin and end reading in
+        chunks = []
+        for offset, size in ranges:
+            for chunkStart in range(offset, offset + size, chunk):
+                chunks.append((chunkStart, min(chunkStart + chunk, offset + size)))
 
+        firstChunk = True
+        for chunkStart, chunkEnd in chunks:
             # Add particles to swarm, ztmp is the corresponding local array
             # non-local particles are not added and their ztmp index is -1.
             # Note that for the first chunk, we do collective read, as this
@@ -225,24 +244,17 @@ class Swarm(uw.swarm.Swarm):
                     ztmp = self.add_particles_with_coordinates(vals)
                 else:
                     ztmp = self.add_particles_with_coordinates(dset[ chunkStart : chunkEnd ])
-            tmp = np.copy(ztmp) # copy because ztmp is 'readonly'
-
-            # slice out -neg bits and make the local indices global
-            it = np.nditer(tmp, op_flags=['readwrite'], flags=['f_index'])
-            while not it.finished:
-                if it[0] >= 0:
-                    it[0] = chunkStart+it.index # local to global
-                it.iternext()
-
-            # slice out -neg bits
-            tmp = tmp[tmp[:]>=0]
-            # append to valid
-            valid = np.append(valid, tmp)
+            # the global index of a particle is its position in the file:
+            # keep the positions of the particles added to the local swarm
+            valid.append(chunkStart + np.flatnonzero(np.asarray(ztmp) >= 0))
 
             if rank == 0 and verbose:
                 bar.update(chunkEnd)
 
         h5f.close()
-        self._local2globalMap = valid
+        if valid:
+            self._local2globalMap = np.concatenate(valid)
+        else:
+            self._local2globalMap = np.zeros(0, dtype=np.int64)
         # record which swarm state this corresponds to
         self._checkpointMapsToState = self.stateId
@@ -7,6 +7,8 @@ from UWGeodynamics import dimensionalise
 from UWGeodynamics import non_dimensionalise
 from UWGeodynamics import UnitRegistry as u
 from UWGeodynamics.version import git_revision as __git_revision__
+from ._utils import _compression_kwargs
+from ._redistribute import proc_bounds
 
 class SwarmVariable(uw.swarm.SwarmVariable):
 
@@ -14,7 +16,7 @@ class SwarmVariable(uw.swarm.SwarmVariable):
         super(SwarmVariable, self).__init__(swarm, dataType, count,
                                             writeable=True, **kwargs)
 
-    def load(self, filename, collective=False):
+    def load(self, filename, collective=False, group=None):
         """
         Load the swarm variable from disk. This must be called *after* the swarm.load().
 
@@ -23,6 +25,9 @@ class SwarmVariable(uw.swarm.SwarmVariable):
         filename : str
             The filename for the saved file. Relative or absolute paths may be
             used, but all directories must exist.
+        group : str
+            The h5 group the variable is stored in (defaults to the root
+            of the file).
 
         Notes
         -----
@@ -48,9 +53,9 @@ class SwarmVariable(uw.swarm.SwarmVariable):
 
         # open hdf5 file
         h5f = h5py.File(name=filename, mode="r", driver='mpio', comm=MPI.COMM_WORLD)
+        grp = h5f[group] if group else h5f
 
-
-        dset = h5f.get('data')
+        dset = grp.get('data')
         if dset == None:
             raise RuntimeError("Can't find 'data' in file '{}'.\n".format(filename))
 
@@ -64,45 +69,40 @@ class SwarmVariable(uw.swarm.SwarmVariable):
                                "the correct files.".format(particleGobalCount, dset.shape[0]))
 
         # for efficiency, we want to load swarmvariable data in the largest stride chunks possible.
-        # we need to determine where required data is contiguous.
-        # first construct an array of gradients. the required data is contiguous
-        # where the indices into the array are increasing by 1, ie have a gradient of 1.
-        gradIds = np.zeros_like(gIds)            # creates array of zeros of same size & type
-        if len(gIds) > 1:
-            gradIds[:-1] = gIds[1:] - gIds[:-1]  # forward difference type gradient
+        # we need to determine where required data is contiguous, ie where the indices
+        # into the array are increasing by 1. runs of at least 2 contiguous items are read
+        # as slices, consecutive isolated items are grouped and read using an index array.
+        reads = []
+        if len(gIds) > 0:
+            breaks = np.flatnonzero(np.diff(gIds) != 1) + 1
+            starts = np.concatenate(([0], breaks))
+            ends = np.concatenate((breaks, [len(gIds)]))
+            single = (ends - starts) == 1
+            # a read starts at each run and at the first of a series of isolated items
+            new_read = np.ones_like(single)
+            new_read[1:] = ~(single[1:] & single[:-1])
+            first = np.flatnonzero(new_read)
+            last = np.concatenate((first[1:], [len(starts)])) - 1
+            reads = zip(first, last)
 
         # note that we do only the first read into dset collective. this call usually
         # does the entire read, but if it doesn't we won't know how many calls will
         # be necessary, hence only collective calling the first.
         done_collective = False
-        guy = 0
-        while guy < len(gIds):
-            # do contiguous
-            start_guy = guy
-            while gradIds[guy]==1:  # count run of contiguous. note bounds check not required as last element of gradIds is always zero.
-                guy += 1
-            # copy contiguous chunk if found.. note that we are copying 'plus 1' items
-            if guy > start_guy:
-                if collective and not done_collective:
-                    with dset.collective:
-                        self.data[start_guy:guy+1] = dset[gIds[start_guy]:gIds[guy]+1]
-                        done_collective = True
-                else:
-                    self.data[start_guy:guy+1] = dset[gIds[start_guy]:gIds[guy]+1]
-                guy += 1
-
-            # do non-contiguous
-            start_guy = guy
-            while guy<len(gIds) and gradIds[guy]!=1:  # count run of non-contiguous
-                guy += 1
-            # copy non-contiguous items (if found) using index array slice
-            if guy > start_guy:
-                if collective and not done_collective:
-                    with dset.collective:
-                        self.data[start_guy:guy,:] = dset[gIds[start_guy:guy],:]
-                        done_collective = True
-                else:
-                    self.data[start_guy:guy,:] = dset[gIds[start_guy:guy],:]
+        for ii, jj in reads:
+            start_guy, end_guy = starts[ii], ends[jj]
+            if single[ii]:
+                # non-contiguous items: index array slice
+                selection = gIds[start_guy:end_guy]
+            else:
+                # contiguous chunk
+                selection = slice(gIds[start_guy], gIds[end_guy - 1] + 1)
+            if collective and not done_collective:
+                with dset.collective:
+                    self.data[start_guy:end_guy] = dset[selection, :]
+                    done_collective = True
+            else:
+                self.data[start_guy:end_guy] = dset[selection, :]
 
         # if we haven't entered a collective call, do so now to
         # avoid deadlock. we just do an empty read/write.
@@ -112,7 +112,7 @@ class SwarmVariable(uw.swarm.SwarmVariable):
 
         # get units
         try:
-            units = h5f.attrs["units"]
+            units = grp.attrs["units"]
         except KeyError:
             units = None
 
@@ -126,7 +126,8 @@ class SwarmVariable(uw.swarm.SwarmVariable):
         if units:
             self.data[:] = non_dimensionalise(self.data * units)
 
-    def save( self, filename, collective=False, units=None, time=None):
+    def save( self, filename, collective=False, units=None, time=None,
+              dtype=None, compression=None):
         """
         Save the swarm variable to disk.
 
@@ -138,6 +139,12 @@ class SwarmVariable(uw.swarm.SwarmVariable):
         swarmHandle :uw.utils.SavedFileData , optional
             The saved swarm file handle. If provided, a reference to the swarm file
             is made. Currently this doesn't provide any extra functionality.
+        dtype : numpy dtype, optional
+            The data type used in the file (defaults to the type of the
+            variable).
+        compression : str, optional
+            Compression filter: "gzip", "gzip:<level>" or "lzf".
+            Compressed datasets are always written collectively.
 
         Returns
         -------
@@ -207,13 +214,18 @@ class SwarmVariable(uw.swarm.SwarmVariable):
         for i in range(comm.rank):
             offset += procCount[i]
 
+        # parallel writes to filtered datasets must be collective
+        if compression:
+            collective = True
+
         # open parallel hdf5 file
         with h5py.File(name=filename, mode="w", driver='mpio', comm=MPI.COMM_WORLD) as h5f:
             # write the entire local swarm to the appropriate offset position
             globalShape = (particleGlobalCount, self.data.shape[1])
             dset = h5f.create_dataset("data",
                                        shape=globalShape,
-                                       dtype=self.data.dtype)
+                                       dtype=dtype if dtype else self.data.dtype,
+                                       **_compression_kwargs(compression, globalShape))
             fact = 1.0
             if units:
                 fact = dimensionalise(1.0, units=units).magnitude
@@ -224,6 +236,12 @@ class SwarmVariable(uw.swarm.SwarmVariable):
             else:
                 dset[offset:offset + swarm.particleLocalCount] = self.data[:] * fact
 
+        # bounding box of each process, used to load the swarm on
+        # a different number of processes.
+        bounds = None
+        if self is swarm.particleCoordinates:
+            bounds = proc_bounds(self.data[:] * fact)
+
         # let's reopen in serial to write the attrib.
         # not sure if this really is necessary.
         comm.Barrier()
@@ -231,6 +249,8 @@ class SwarmVariable(uw.swarm.SwarmVariable):
             with h5py.File(name=filename, mode="a") as h5f:
                 # attribute of the proc offsets - used for loading from checkpoint
                 h5f.attrs["proc_offset"] = procCount
+                if bounds is not None:
+                    h5f.attrs["proc_bounds"] = bounds
                 h5f.attrs['units'] = str(units)
                 h5f.attrs['time'] = str(time)
                 h5f.attrs["git commit"] = __git_revision__
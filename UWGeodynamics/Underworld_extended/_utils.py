@@ -1,5 +1,6 @@
 import os
 import h5py
+import numpy as np
 from underworld.utils._utils import _xdmfAttributeschema
 
 
@@ -46,12 +47,50 @@ def _swarmvarschema(varSavedData, varname):
     if dset is None:
         raise RuntimeError("Can't find 'data' in file '{}'.\n".format(varfilename))
     globalCount = len(dset)
+    dtype = dset.dtype
     h5f.close()
 
     dof_count = var.data.shape[1]
-    vartype, precision = _dtypes_to_xdmf[var.data.dtype.str]
-    variableType = "NumberType=\"{0}\" Precision=\"{1}\"".format(vartype, precision)
+    variableType = _xdmfnumbertype(dtype)
 
     out = _xdmfAttributeschema(varname, variableType, "Node", globalCount, dof_count, refName )
 
     return out
+
+
+def _xdmfnumbertype(dtype):
+    """ Return the xdmf NumberType and Precision of a numpy dtype """
+    vartype, precision = _dtypes_to_xdmf[np.dtype(dtype).str]
+    return "NumberType=\"{0}\" Precision=\"{1}\"".format(vartype, precision)
+
+
+def _retypeschema(schema, dtype):
+    """ Replace the float64 NumberType of a schema by the one of dtype
+
+    The Underworld schemas for meshes and mesh variables assume
+    that the data are saved as float64.
+    """
+    if dtype is None:
+        return schema
+    return schema.replace("NumberType=\"Float\" Precision=\"8\"",
+                          _xdmfnumbertype(dtype))
+
+
+def _compression_kwargs(compression, shape=None):
+    """ Return the h5py create_dataset arguments for a compression filter
+
+    Parameters
+    ----------
+    compression : str
+        "gzip", "gzip:<level>" or "lzf"
+    shape : tuple
+        Shape of the dataset. Empty datasets can not be
+        chunked and are not compressed.
+    """
+    if not compression or (shape is not None and not np.prod(shape)):
+        return {}
+    name, _, level = compression.partition(":")
+    kwargs = {"compression": name, "shuffle": True}
+    if level:
+        kwargs["compression_opts"] = int(level)
+    return kwargs
@@ -0,0 +1,645 @@
+from __future__ import print_function,  absolute_import
+import os
+import re
+import zlib
+import posixpath
+import atexit
+import threading
+import warnings
+import numpy as np
+import h5py
+import underworld as uw
+from mpi4py import MPI as _MPI
+from six.moves import queue
+from UWGeodynamics import dimensionalise
+from UWGeodynamics import UnitRegistry as u
+from UWGeodynamics.version import git_revision as __git_revision__
+from underworld.utils._utils import _xdmfAttributeschema
+from .Underworld_extended._utils import _xdmfnumbertype, _retypeschema
+from .Underworld_extended._utils import _compression_kwargs
+from .Underworld_extended._redistribute import proc_bounds
+from . import rcParams
+
+comm = _MPI.COMM_WORLD
+rank = comm.rank
+size = comm.size
+
+
+class _WriteRequest(object):
+    """ Snapshot of objects to be written to a h5 file """
+
+    def __init__(self, filename, chunked=False):
+        self.filename = filename
+        self.chunked = chunked
+        self.datasets = []
+        self.attrs = []
+        self.links = []
+
+    def add_dataset(self, name, shape, index, data, compression=None):
+        self.datasets.append((name, shape, index, data, compression))
+
+    def add_attr(self, name, value, group="/"):
+        self.attrs.append((group, name, value))
+
+    def add_link(self, name, target, filename=None):
+        """ Link name to target, in the file filename if given """
+        self.links.append((name, target, filename))
+
+    def dependencies(self):
+        """ Paths of the files the request links to """
+        paths = []
+        for name, target, filename in self.links:
+            if filename:
+                path = os.path.normpath(os.path.join(
+                    os.path.dirname(self.filename), filename))
+                if path not in paths:
+                    paths.append(path)
+        return paths
+
+
+def _chunks(shape, itemsize, nbytes=2**20):
+    """ Chunk shape for a (rows, columns) dataset, about nbytes per chunk """
+    if not shape[0]:
+        return None
+    rows = max(1, nbytes // (itemsize * shape[1]))
+    return (min(rows, shape[0]), shape[1])
+
+
+def write_request(request, comm=comm):
+    """ Write a request to disk
+
+    This must be called collectively by all processes.
+    """
+    if size > 1:
+        h5f = h5py.File(name=request.filename, mode="w",
+                        driver="mpio", comm=comm)
+    else:
+        h5f = h5py.File(name=request.filename, mode="w")
+
+    with h5f:
+        for name, shape, index, data, compression in request.datasets:
+            chunks = None
+            if request.chunked:
+                chunks = _chunks(shape, data.dtype.itemsize)
+            dset = h5f.create_dataset(
+                name, shape=shape, dtype=data.dtype, chunks=chunks,
+                **_compression_kwargs(compression, shape))
+            if isinstance(index, np.ndarray):
+                index = (index, slice(None))
+            if size > 1:
+                with dset.collective:
+                    dset[index] = data
+            elif data.size:
+                dset[index] = data
+        for group, name, value in request.attrs:
+            h5f.require_group(group).attrs[name] = value
+        for name, target, filename in request.links:
+            if filename:
+                h5f[name] = h5py.ExternalLink(filename, target)
+            else:
+                h5f[name] = h5py.SoftLink(target)
+
+
+def _digest(shape, index, data, compression):
+    """ Checksum of the local part of a dataset """
+    if isinstance(index, slice):
+        index = np.array([index.start, index.stop])
+    digest = zlib.crc32(repr((shape, str(data.dtype), compression)).encode())
+    digest = zlib.crc32(np.ascontiguousarray(index), digest)
+    return zlib.crc32(np.ascontiguousarray(data), digest)
+
+
+class IncrementalIndex(object):
+    """ Index of the datasets written by the previous checkpoints
+
+    Datasets are identified by the name of the file without the
+    checkpoint ID (velocityField-3.h5 -> velocityField) and their
+    path in the file. A dataset identical on all the processes to the
+    one written by a previous checkpoint is replaced by an external
+    link to it. The HDF5 library resolves the links when the file is
+    read, so that readers (restart, XDMF) are not affected.
+    """
+
+    def __init__(self):
+        self._sources = dict()
+
+    def reset(self):
+        self._sources = dict()
+
+    def apply(self, request):
+        """ Replace the unchanged datasets of request by links
+
+        This must be called collectively by all processes.
+        """
+        prefix = re.sub(r"-\d+\.h5$", "", request.filename)
+        datasets = []
+        for dataset in request.datasets:
+            name, shape, index, data, compression = dataset
+            key = (prefix, name)
+            digest = _digest(shape, index, data, compression)
+            previous = self._sources.get(key)
+            changed = int(previous is None or previous[0] != digest or
+                          previous[1] == request.filename)
+            if comm.allreduce(changed, op=_MPI.MAX):
+                datasets.append(dataset)
+                self._sources[key] = (digest, request.filename, name)
+            else:
+                source = os.path.relpath(previous[1],
+                                         os.path.dirname(request.filename))
+                request.add_link(name, previous[2], source)
+        request.datasets = datasets
+        return request
+
+
+def _scaled(data, fact=1.0, dtype=None, copy=True):
+    """ data * fact as dtype, a view of data if it needs
+    no conversion and copy is False """
+    dtype = dtype if dtype else data.dtype
+    if fact != 1.0:
+        return (data * fact).astype(dtype, copy=False)
+    return data.astype(dtype, copy=copy)
+
+
+def _unit_factor(units):
+    fact = 1.0
+    if units:
+        fact = dimensionalise(1.0, units=units).magnitude
+        if units == "degC":
+            fact = dimensionalise(1.0, units=u.degK).magnitude
+    return fact
+
+
+def output_policy(obj, name, lossless=False):
+    """ Return the dtype and compression used to save a variable
+
+    The policy is defined by the output.precision.<name> and
+    output.compression.<name> rcParams.
+
+    Parameters
+    ----------
+
+        obj : Mesh, MeshVariable, Swarm or SwarmVariable
+        name : name of the variable
+        lossless : (bool) if True, floating point data are saved with
+                   their own precision.
+
+    Integer data are only narrowed if all the values fit in the
+    requested type. This must be called collectively by all processes.
+    """
+    try:
+        precision = rcParams["output.precision." + name]
+    except KeyError:
+        precision = None
+
+    try:
+        compression = rcParams["output.compression." + name]
+    except KeyError:
+        compression = None
+
+    if isinstance(obj, uw.swarm.Swarm):
+        obj = obj.particleCoordinates
+
+    if not precision:
+        return None, compression
+
+    dtype = np.dtype(precision)
+    current = obj.data.dtype
+
+    if dtype.kind == "f":
+        if lossless or current.kind != "f":
+            dtype = None
+    elif current.kind not in "iu":
+        # Never truncate floating point values to integers
+        dtype = None
+    else:
+        local = np.array([-np.inf, -np.inf])
+        if obj.data.size:
+            local = np.array([-obj.data.min(), obj.data.max()], dtype=float)
+        glob = np.zeros_like(local)
+        comm.Allreduce(local, glob, op=_MPI.MAX)
+        if -glob[0] < np.iinfo(dtype).min or glob[1] > np.iinfo(dtype).max:
+            warnings.warn("""The values of {0} do not fit in {1},
+                          the variable is saved with type {2}""".format(
+                              name, dtype, current))
+            dtype = None
+
+    return dtype, compression
+
+
+def _stage_mesh(mesh, request, group, units=None, time=None,
+                dtype=None, compression=None, copy=True):
+    fact = _unit_factor(units)
+    if units:
+        request.add_attr("units", str(units), group)
+    request.add_attr("dimensions", mesh.dim, group)
+    request.add_attr("mesh resolution", mesh.elementRes, group)
+    request.add_attr("max", tuple([fact*x for x in mesh.maxCoord]), group)
+    request.add_attr("min", tuple([fact*x for x in mesh.minCoord]), group)
+    request.add_attr("regular", mesh._cself.isRegular, group)
+    request.add_attr("elementType", mesh.elementType, group)
+    request.add_attr("time", str(time), group)
+    request.add_attr("git commit", __git_revision__, group)
+
+    local = mesh.nodesLocal
+    request.add_dataset(posixpath.join(group, "vertices"),
+                        (mesh.nodesGlobal, mesh.data.shape[1]),
+                        _scaled(mesh.data_nodegId[0:local], copy=copy),
+                        _scaled(mesh.data[0:local], fact, dtype, copy),
+                        compression)
+
+    local = mesh.elementsLocal
+    request.add_dataset(posixpath.join(group, "en_map"),
+                        (mesh.elementsGlobal, mesh.data_elementNodes.shape[1]),
+                        _scaled(mesh.data_elgId[0:local], copy=copy),
+                        _scaled(mesh.data_elementNodes[0:local], copy=copy),
+                        compression)
+
+
+def _stage_meshvariable(variable, request, group, units=None, time=None,
+                        dtype=None, compression=None, copy=True):
+    mesh = variable.mesh
+    fact = _unit_factor(units)
+    if units:
+        request.add_attr("units", str(units), group)
+    if time:
+        request.add_attr("time", str(time), group)
+    request.add_attr("git commit", __git_revision__, group)
+    request.add_attr("elementType", np.string_(mesh.elementType), group)
+
+    local = mesh.nodesLocal
+    if units == "degC":
+        data = variable.data[0:local] * fact
+        data -= 273.15
+        data = data.astype(dtype if dtype else variable.data.dtype)
+    else:
+        data = _scaled(variable.data[0:local], fact, dtype, copy)
+    request.add_dataset(posixpath.join(group, "data"),
+                        (mesh.nodesGlobal, variable.data.shape[1]),
+                        _scaled(mesh.data_nodegId[0:local], copy=copy),
+                        data, compression)
+
+
+def _stage_swarmvariable(variable, request, group, units=None, time=None,
+                         dtype=None, compression=None, copy=True):
+    swarm = variable.swarm
+    procCount = comm.allgather(swarm.particleLocalCount)
+    offset = int(np.sum(procCount[:rank]))
+
+    request.add_attr("proc_offset", procCount, group)
+    if variable is swarm.particleCoordinates:
+        request.add_attr("proc_bounds",
+                         proc_bounds(variable.data[:] * _unit_factor(units)),
+                         group)
+    request.add_attr("units", str(units), group)
+    request.add_attr("time", str(time), group)
+    request.add_attr("git commit", __git_revision__, group)
+
+    request.add_dataset(posixpath.join(group, "data"),
+                        (int(np.sum(procCount)), variable.data.shape[1]),
+                        slice(offset, offset + swarm.particleLocalCount),
+                        _scaled(variable.data, _unit_factor(units), dtype,
+                                copy),
+                        compression)
+
+
+def stage(obj, filename, units=None, time=None, request=None, group="/",
+          dtype=None, compression=None, copy=True):
+    """ Copy the data of obj into a staging buffer
+
+    Parameters
+    ----------
+
+        obj : Mesh, MeshVariable, Swarm or SwarmVariable
+        filename : h5 file the data will be written to
+        units : units used for output
+        time : Model time
+        request : add the data to an existing request
+        group : h5 group the data is written to
+        dtype : data type used in the file
+        compression : compression filter (see output_policy)
+        copy : if False, the data which needs no conversion is not
+               copied. The request must then be written before the
+               data changes.
+
+    Returns the write request and a uw.utils.SavedFileData handle
+    to be used for the XDMF schemas once the file is written.
+
+    This must be called collectively by all processes.
+    """
+    if request is None:
+        request = _WriteRequest(filename)
+
+    if isinstance(obj, uw.swarm.Swarm):
+        _stage_swarmvariable(obj.particleCoordinates, request, group,
+                             units, time, dtype, compression, copy)
+    elif isinstance(obj, uw.swarm.SwarmVariable):
+        _stage_swarmvariable(obj, request, group, units, time,
+                             dtype, compression, copy)
+    elif isinstance(obj, uw.mesh.FeMesh):
+        _stage_mesh(obj, request, group, units, time, dtype, compression,
+                    copy)
+    else:
+        _stage_meshvariable(obj, request, group, units, time,
+                            dtype, compression, copy)
+    return request, uw.utils.SavedFileData(obj, filename)
+
+
+def _regroup(schema, filename, dataset, group):
+    """ Point the HDF references of a XDMF schema to a group """
+    if not group or group == "/":
+        return schema
+    refName = os.path.basename(filename)
+    return schema.replace("{0}:/{1}".format(refName, dataset),
+                          "{0}:/{1}/{2}".format(refName, group, dataset))
+
+
+def _hdfpath(filename, group, dataset):
+    path = posixpath.join("/", group if group else "", dataset)
+    return "{0}:{1}".format(os.path.basename(filename), path)
+
+
+def xdmf_mesh_grid(handle, meshname, time, group, fields=()):
+    """ XDMF grid for a mesh stored in group and its fields
+
+    Parameters
+    ----------
+
+        handle : SavedFileData of the mesh
+        meshname : name of the grid
+        time : Model time
+        group : h5 group of the mesh
+        fields : list of (SavedFileData, name, group, dtype) of the fields
+    """
+    out = uw.utils._spacetimeschema(handle, meshname, time)
+    out = _regroup(out, handle.filename, "vertices", group)
+    out = _regroup(out, handle.filename, "en_map", group)
+    for field, name, field_group, dtype in fields:
+        schema = _retypeschema(uw.utils._fieldschema(field, name), dtype)
+        out += _regroup(schema, field.filename, "data", field_group)
+    out += "</Grid>\n"
+    return out
+
+
+def xdmf_swarm_grid(handle, swarmname, time, group, count, variables=()):
+    """ XDMF grid for a swarm stored in group and its variables
+
+    Parameters
+    ----------
+
+        handle : SavedFileData of the swarm
+        swarmname : name of the grid
+        time : Model time
+        group : h5 group of the swarm ("/" or None for the root)
+        count : global number of particles
+        variables : list of (SavedFileData, name, group, dtype)
+                    of the variables
+
+    The sizes and types are taken from the saved objects and the
+    write policies: the h5 files are not read.
+    """
+    dim = handle.pyobj.mesh.dim
+
+    out = "<Grid Name=\"{0}\" GridType=\"Uniform\">\n".format(swarmname)
+    out += "\n\t<Time Value=\"{0}\" />\n\n".format(time)
+    out += "\t<Topology Type=\"POLYVERTEX\" NodesPerElement=\"{0}\"> </Topology>\n".format(count)
+    out += "\t\t<Geometry Type=\"{0}\">\n".format("XY" if dim == 2 else "XYZ")
+    out += "\t\t\t<DataItem Format=\"HDF\" NumberType=\"Float\" Precision=\"8\" Dimensions=\"{0} {1}\">{2}</DataItem>\n".format(count, dim, _hdfpath(handle.filename, group, "data"))
+    out += "\t\t</Geometry>\n"
+
+    for variable, name, var_group, dtype in variables:
+        data = variable.pyobj.data
+        variableType = _xdmfnumbertype(dtype if dtype else data.dtype)
+        schema = _xdmfAttributeschema(name, variableType, "Node", count,
+                                      data.shape[1],
+                                      os.path.basename(variable.filename))
+        out += _regroup(schema, variable.filename, "data", var_group)
+    out += "</Grid>\n"
+    return out
+
+
+_step_marker = re.compile(r"<!-- step (-?\d+) -->\n")
+
+
+class XDMFCollection(object):
+    """ Temporal collection of XDMF grids in a single file
+
+    Each checkpoint appends its grid to the collection so that a whole
+    run can be opened at once in Paraview. The footer is rewritten at
+    each append, the file is never read back except once per run to
+    discard the steps written by a previous run (restart from an
+    earlier step).
+
+    The collection is written by process 0 only.
+    """
+
+    _footer = "</Grid>\n</Domain>\n</Xdmf>\n"
+
+    def __init__(self, filename, name):
+        """
+        Parameters
+        ----------
+
+            filename : path of the XDMF file
+            name : name of the temporal collection
+        """
+        self.filename = filename
+        self.name = name
+        self._checked = False
+
+    def _header(self):
+        out = uw.utils._xdmfheader()
+        out += ("<Grid Name=\"{0}\" GridType=\"Collection\" "
+                "CollectionType=\"Temporal\">\n".format(self.name))
+        return out
+
+    def _truncate(self, step):
+        """ Remove the grids of the steps >= step and the footer """
+        with open(self.filename, "r") as f:
+            content = f.read()
+        end = content.rfind(self._footer)
+        markers = list(_step_marker.finditer(content))
+        if end < 0 and markers:
+            # The previous run stopped while appending a grid
+            end = markers[-1].start()
+        for match in markers:
+            if int(match.group(1)) >= step:
+                end = min(end, match.start())
+                break
+        if end < 0:
+            end = len(self._header())
+        with open(self.filename, "w") as f:
+            f.write(content[:end])
+
+    def append(self, step, grid):
+        """ Append the grid of a step to the collection
+
+        Parameters
+        ----------
+
+            step : checkpoint ID
+            grid : XDMF grid (see xdmf_mesh_grid and xdmf_swarm_grid)
+        """
+        entry = "<!-- step {0} -->\n".format(step) + grid + self._footer
+
+        if not os.path.exists(self.filename):
+            with open(self.filename, "w") as f:
+                f.write(self._header() + entry)
+            self._checked = True
+            return
+
+        if not self._checked:
+            self._truncate(step)
+            self._checked = True
+            with open(self.filename, "a") as f:
+                f.write(entry)
+            return
+
+        with open(self.filename, "r+b") as f:
+            f.seek(-len(self._footer), os.SEEK_END)
+            f.write(entry.encode("utf-8"))
+
+
+def xdmf_collection(outputDir, name, collections=None):
+    """ Return the XDMF temporal collection outputDir/XDMF.<name>.xmf
+
+    Parameters
+    ----------
+
+        outputDir : output directory
+        name : name of the collection
+        collections : Optional, dictionary {filename: collection} of the
+                      collections of a run (Model). A new collection
+                      discards the steps written by a previous run when
+                      it is first appended to.
+    """
+    filename = os.path.join(outputDir, "XDMF." + name + ".xmf")
+    if collections is None:
+        return XDMFCollection(filename, name)
+    if filename not in collections:
+        collections[filename] = XDMFCollection(filename, name)
+    return collections[filename]
+
+
+def write_xdmf(outputDir, name, step, grid, single=None, collections=None):
+    """ Write the XDMF grid of a checkpoint
+
+    Parameters
+    ----------
+
+        outputDir : output directory
+        name : name of the output stream ("fields", "swarms"...)
+        step : checkpoint ID
+        grid : XDMF grid(s) of the checkpoint
+        single : filename of the per-checkpoint XDMF file, only used when
+                 the checkpoint.xdmf.collection rcParam is False.
+        collections : Optional, collections of the run
+                      (see xdmf_collection)
+
+    Returns the path of the XDMF file written.
+    """
+    if rcParams["checkpoint.xdmf.collection"]:
+        collection = xdmf_collection(outputDir, name, collections)
+        collection.append(step, grid)
+        return collection.filename
+
+    if single is None:
+        single = "XDMF." + name + "." + str(step).zfill(5) + ".xmf"
+    filename = os.path.join(outputDir, single)
+    with open(filename, "w") as xdmfFH:
+        xdmfFH.write(uw.utils._xdmfheader() + grid + "</Domain>\n</Xdmf>\n")
+    return filename
+
+
+class AsyncCheckpointWriter(object):
+    """ Write staged checkpoint data in a background thread
+
+    Checkpoints are submitted as a list of write requests (staged copies
+    of the data) and an optional function run on process 0 once all the
+    files are written (XDMF files).
+
+    Only serial runs use a background thread. Under MPI the writes are
+    synchronous: the h5 files are written collectively (mpio driver)
+    and h5py serialises all the calls to the library with a global
+    lock, so that a collective write from a thread can deadlock with a
+    h5 call of the main thread of another process. The requests are
+    then written when they are submitted, which all the processes do at
+    the same point of the step, and the data does not need to be
+    copied before (see copy).
+
+    No h5 operation should happen on the main thread while the writer
+    is busy: call wait() before.
+    """
+
+    def __init__(self):
+        self._error = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self.comm = comm
+
+        self.threaded = size == 1
+        if not self.threaded:
+            return
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def copy(self):
+        """ True if the data must be copied when staged """
+        return self.threaded
+
+    def _write(self, request):
+        write_request(request, self.comm)
+
+    def _process(self, requests, finalize):
+        for request in requests:
+            self._write(request)
+        if finalize and rank == 0:
+            finalize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._process(*item)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def submit(self, requests, finalize=None):
+        """ Queue a list of write requests
+
+        Parameters
+        ----------
+
+            requests : list of write requests (see stage)
+            finalize : function called on process 0 after the writes
+        """
+        if self._thread is None:
+            self._process(requests, finalize)
+            return
+        self._queue.put((requests, finalize))
+
+    def wait(self):
+        """ Block until all the submitted requests are written """
+        if self._thread is not None:
+            self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        """ Write the pending requests and stop the writer """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
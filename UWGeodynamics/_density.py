@@ -2,9 +2,10 @@ from __future__ import print_function,  absolute_import
 import underworld.function as fn
 from UWGeodynamics import non_dimensionalise as nd
 from UWGeodynamics import UnitRegistry as u
+from ._parameters import Parameters
 
 
-class Density(object):
+class Density(Parameters):
 
     def __init__(self):
         self.temperatureField = None
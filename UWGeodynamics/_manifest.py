@@ -0,0 +1,176 @@
+from __future__ import print_function,  absolute_import
+import os
+import json
+from collections import OrderedDict
+
+
+class CheckpointManifest(object):
+    """ Append-only index of the outputs of a Model
+
+    Each output (fields, swarms, single file checkpoint or tracers)
+    is recorded once written as a JSON line in outputDir/checkpoints.jsonl:
+
+        {"step": 3, "time": "1.5 megayear", "kind": "swarms",
+         "files": ["swarm-3.h5", ...], "variables": ["swarm", ...]}
+
+    Records can carry a "metadata" dictionary (the groups of the merged
+    passive tracers for example) and the list of the files of earlier
+    steps they depend on ("depends", the files an incremental
+    checkpoint links to).
+
+    A record for a step discards the records of the later steps: they
+    belong to a previous run that was restarted from an earlier step
+    (or started again from scratch). It also replaces the records of
+    the same step, except the records of other kinds written just
+    before it (the fields, swarms and tracers of one checkpoint).
+
+    Writing the manifest is done by process 0 only.
+    """
+
+    filename = "checkpoints.jsonl"
+
+    def __init__(self, outputDir):
+        self.outputDir = outputDir
+        self.path = os.path.join(outputDir, self.filename)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, step, time, kind, files, variables=(), metadata=None,
+               depends=()):
+        """ Record an output
+
+        Parameters
+        ----------
+
+            step : checkpoint ID
+            time : model time (Quantity or float)
+            kind : "fields", "swarms", "checkpoint" or "tracers"
+            files : list of files written (relative to outputDir)
+            variables : list of variables saved
+            metadata : Optional, dictionary stored with the record
+            depends : Optional, list of the files of earlier steps
+                      needed to read the files written
+        """
+        record = OrderedDict([
+            ("step", int(step)),
+            ("time", str(time)),
+            ("kind", kind),
+            ("files", [os.path.relpath(path, self.outputDir)
+                       for path in files]),
+            ("variables", list(variables))])
+        if metadata:
+            record["metadata"] = metadata
+        if depends:
+            record["depends"] = [os.path.relpath(path, self.outputDir)
+                                 for path in depends]
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with open(self.path, "ab+") as f:
+            # Start a new line if the last record was truncated
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.seek(0, os.SEEK_END)
+            f.write(line)
+            f.flush()
+
+    def records(self):
+        """ Return the records of the current run, in order """
+        records = []
+        if not self.exists():
+            return records
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Truncated line (the run stopped while writing)
+                    continue
+                records = self._replace(records, record)
+        return records
+
+    @staticmethod
+    def _replace(records, record):
+        """ Add record to records, discarding the records it replaces """
+        step = record["step"]
+        # Records of the same checkpoint
+        checkpoint = []
+        for old in reversed(records):
+            if old["step"] != step or old["kind"] == record["kind"]:
+                break
+            checkpoint.insert(0, old)
+        return ([old for old in records if old["step"] < step] +
+                checkpoint + [record])
+
+    def entries(self):
+        """ Return an OrderedDict {step: entry} merging the records
+        of each step, sorted by step """
+        entries = dict()
+        for record in self.records():
+            entry = entries.setdefault(record["step"], {
+                "step": record["step"], "time": None, "kinds": [],
+                "files": [], "variables": [], "depends": [],
+                "metadata": {}})
+            entry["time"] = record["time"]
+            entry["metadata"].update(record.get("metadata", {}))
+            for key, value in (("kinds", [record["kind"]]),
+                               ("files", record["files"]),
+                               ("variables", record["variables"]),
+                               ("depends", record.get("depends", []))):
+                entry[key] += [item for item in value
+                               if item not in entry[key]]
+        return OrderedDict(sorted(entries.items()))
+
+    def steps(self, required=None):
+        """ Return the sorted list of steps
+
+        Parameters
+        ----------
+
+            required : list of variables, only the steps for which
+                       all the variables were saved are returned.
+        """
+        required = set(required if required else [])
+        return [step for step, entry in self.entries().items()
+                if required.issubset(entry["variables"])]
+
+    def entry(self, step):
+        """ Return the entry of step or None """
+        return self.entries().get(step)
+
+    def dependencies(self, step):
+        """ Return the paths of the files of earlier steps step
+        depends on """
+        entry = self.entry(step)
+        if not entry:
+            return []
+        return [os.path.join(self.outputDir, path)
+                for path in entry["depends"]]
+
+    def files(self, steps=None):
+        """ Return the paths of the files written at steps
+        (default to all the steps)
+
+        Files shared between steps (the mesh saved once for all the
+        steps for example) or which other steps depend on (see append)
+        are only returned when all the steps referencing them are in
+        steps: the files returned can be deleted without breaking the
+        other steps.
+        """
+        entries = self.entries()
+        kept = set()
+        if steps is not None:
+            for step, entry in entries.items():
+                if step not in steps:
+                    kept.update(entry["files"])
+                    kept.update(entry["depends"])
+        paths = []
+        for step, entry in entries.items():
+            if steps is None or step in steps:
+                paths += [os.path.join(self.outputDir, path)
+                          for path in entry["files"]
+                          if path not in kept and
+                          os.path.join(self.outputDir, path) not in paths]
+        return paths
@@ -10,6 +10,7 @@ from ._rheology import ConstantViscosity
 from ._density import ConstantDensity
 from pint.errors import DimensionalityError
 from ._density import LinearDensity
+from ._parameters import Parameters
 
 _dim_density = {'[mass]': 1.0, '[length]': -3.0}
 _dim_diffusivity = {'[length]': 2.0, '[time]': -1.0}
@@ -21,11 +22,20 @@ _dim_rate = {'[time]': -1.0}
 
 
 
-class Material(object):
+class Material(Parameters):
     """ Material class object """
 
     _ids = count(0)
 
+    # Attributes the Model function graphs depend on (see Parameters)
+    _parameters = (
+        "index", "_viscosity", "_initial_viscosity", "_plasticity",
+        "elasticity", "_density", "compressibility", "diffusivity",
+        "capacity", "radiogenicHeatProd", "minViscosity", "maxViscosity",
+        "stressLimiter", "melt", "solidus", "liquidus", "latentHeatFusion",
+        "meltExpansion", "meltFractionLimit", "viscosityChange",
+        "viscosityChangeX1", "viscosityChangeX2")
+
     @u.check([None, None, _dim_density, _dim_diffusivity, _dim_capacity,
               _dim_radiogenicHeatProduction, None, None, None, _dim_viscosity,
               _dim_viscosity, _dim_stress, _dim_rate, None, None, None,
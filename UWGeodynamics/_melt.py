@@ -4,9 +4,10 @@ from UWGeodynamics import UnitRegistry as u
 from UWGeodynamics import dimensionalise
 import json
 from copy import copy
+from ._parameters import Parameters
 
 
-class _Polynom(object):
+class _Polynom(Parameters):
 
     def __init__(self, A1, A2=0., A3=0., A4=0.):
 
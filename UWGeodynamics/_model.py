@@ -1,9 +1,11 @@
 from __future__ import print_function, absolute_import
 import os
 import sys
+import posixpath
 from collections import OrderedDict
 import numpy as np
 import h5py
+import six
 import underworld as uw
 import underworld.function as fn
 from underworld.function.exception import SafeMaths as Safe
@@ -16,8 +18,11 @@ from UWGeodynamics import non_dimensionalise as nd
 from UWGeodynamics import UnitRegistry as u
 from .lithopress import Lithostatic_pressure
 from ._utils import PressureSmoother, PassiveTracers
+from ._utils import MergedPassiveTracers, PassiveTracerGroup
+from ._utils import PhaseChange
 from ._rheology import Viscosity_limiter, Stress_limiter
 from ._material import Material
+from ._parameters import changed, changes
 from ._visugrid import Visugrid
 from ._boundary_conditions import TemperatureBCs, HeatFlowBCs
 from ._boundary_conditions import StressBCs, VelocityBCs
@@ -27,11 +32,25 @@ from .Underworld_extended import FeMesh_Cartesian
 from .Underworld_extended import Swarm
 from .Underworld_extended import MeshVariable
 from .Underworld_extended import SwarmVariable
-from .Underworld_extended._utils import _swarmvarschema
+from .Underworld_extended._utils import _retypeschema
 from datetime import datetime
 from .version import full_version
 from ._freesurface import FreeSurfaceProcessor
 from ._remeshing import ReMesher
+from ._nonlinear import AndersonMixing, EisenstatWalker, _global_norm
+from ._timers import Timers
+from ._projection import BatchedProjector
+from ._swarm_update import SwarmUpdatePipeline
+from ._manifest import CheckpointManifest
+from ._checkpoint_writer import AsyncCheckpointWriter
+from ._checkpoint_writer import IncrementalIndex
+from ._checkpoint_writer import stage as _stage
+from ._checkpoint_writer import _WriteRequest
+from ._checkpoint_writer import output_policy as _output_policy
+from ._checkpoint_writer import write_request as _write_request
+from ._checkpoint_writer import xdmf_mesh_grid as _xdmf_mesh_grid
+from ._checkpoint_writer import xdmf_swarm_grid as _xdmf_swarm_grid
+from ._checkpoint_writer import write_xdmf as _write_xdmf
 
 comm = _MPI.COMM_WORLD
 rank = comm.rank
@@ -168,6 +187,8 @@ class Model(Material):
 
         self.mesh_variables = OrderedDict()
         self.swarm_variables = OrderedDict()
+        self._lazy_swarm_variables = OrderedDict()
+        self._lazy_attributes = dict()
         self.restart_variables = OrderedDict()
 
         # Add common mesh variables
@@ -201,6 +222,14 @@ class Model(Material):
         self.step = 0
         self.nlstep = 0
         self._dt = None
+        self._dt_reason = None
+        self.timestep_controller = None
+        self.timers = Timers()
+        self._checkpoint_writer = None
+        self._checkpoint_index = IncrementalIndex()
+        self._verticalVelocityField = None
+        # XDMF temporal collections of the run (see write_xdmf)
+        self._xdmf_collections = dict()
 
         self.materials = list(materials) if materials is not None else list()
         self.materials.append(self)
@@ -235,6 +264,7 @@ class Model(Material):
         # An ordered dict is required to ensure that all threads process
         # the same swarm at a time.
         self.passive_tracers = OrderedDict()
+        self._merged_tracers = OrderedDict()
 
         # Visualisation
         self._visugrid = visugrid
@@ -252,9 +282,18 @@ class Model(Material):
         self._temperature = None
         self.DiffusivityFn = None
         self.HeatProdFn = None
+        self._advdiff = None
+        self._advdiff_key = None
+        self._advdiff_fns = None
         self._freeSurface = False
         self._mesh_saved = False
         self._remesher = None
+
+        # Function graphs cache (see Model._cached_fn)
+        self._fn_cache = dict()
+        self._fn_state = None
+        self._fn_version = 0
+
         self._initialize()
 
         self._viscosity_processor = _ViscosityFunction(self)
@@ -269,6 +308,19 @@ class Model(Material):
 
         self.add_mesh_variable("tractionField", nodeDofCount=self.mesh.dim)
 
+        # Projection cache (see Model._update_projections)
+        self._projection_cache = dict()
+        self._state_version = 0
+        # Key of the state the swarm variables holding a function
+        # were last evaluated at (see Model._evaluate_on_swarm)
+        self._evaluated = dict()
+
+        # The projections and the swarm update pipeline are bound to
+        # the swarm: they are created again when the swarm is replaced
+        # (restart).
+        self._swarm_projections = BatchedProjector(self.mesh, self.swarm)
+        self._swarm_update = SwarmUpdatePipeline(self.swarm)
+
         self.swarm_advector = uw.systems.SwarmAdvector(
             swarm=self.swarm,
             velocityField=self.velocityField,
@@ -292,9 +344,6 @@ class Model(Material):
                                 restart_variable=True, init_value=self.index)
         self.add_swarm_variable("plasticStrain", dataType="double", count=1,
                                 restart_variable=True)
-        self.add_swarm_variable("_viscosityField", dataType="double", count=1)
-        self.add_swarm_variable("_densityField", dataType="double", count=1)
-        self.add_swarm_variable("meltField", dataType="double", count=1)
         self.add_swarm_variable("timeField", dataType="double", count=1,
                                 restart_variable=True)
         self.timeField.data[...] = 0.0
@@ -305,12 +354,27 @@ class Model(Material):
         else:
             stress_dim = 3
 
+        # Optional Swarm Variables, allocated on first use
+        self.add_swarm_variable("_viscosityField", dataType="double",
+                                count=1, lazy=True)
+        self.add_swarm_variable("_densityField", dataType="double",
+                                count=1, lazy=True)
+        self.add_swarm_variable("meltField", dataType="double", count=1,
+                                lazy=True)
         self.add_swarm_variable("_previousStressField", dataType="double",
-                                count=stress_dim)
+                                count=stress_dim, lazy=True)
         self.add_swarm_variable("_stressTensor", dataType="double",
-                                count=stress_dim, projected="submesh")
+                                count=stress_dim, projected="submesh",
+                                lazy=True)
         self.add_swarm_variable("_stressField", dataType="double",
-                                count=1, projected="submesh")
+                                count=1, projected="submesh", lazy=True)
+
+    def __setattr__(self, name, value):
+        previous = self.__dict__.get(name)
+        super(Model, self).__setattr__(name, value)
+        # The fields the function graphs are wired to
+        if name in _model_fn_attributes and previous is not value:
+            changed()
 
     def __getitem__(self, name):
         """__getitem__
@@ -328,9 +392,51 @@ class Model(Material):
         Returns
         -------
             Attribute of the Model instance.
-            self.__dict__[name]
         """
-        return self.__dict__[name]
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __getattr__(self, name):
+        """__getattr__
+
+        Allocate the optional swarm variables (and their projection
+        mesh variables and projectors) on first access.
+        See add_swarm_variable(lazy=True).
+        """
+        lazy = self.__dict__.get("_lazy_attributes")
+        if not lazy or name not in lazy:
+            raise AttributeError(
+                "'%s' object has no attribute '%s'" %
+                (type(self).__name__, name))
+        self._allocate_swarm_variables([name])
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def _allocate_swarm_variables(self, names):
+        """ Allocate the deferred swarm variables in names
+
+        Names can be the name of the variable, its key in
+        swarm_variables, its projection or its projector.
+        Other names are ignored.
+        Allocation is collective: all the processes must call it
+        with the same names.
+        """
+        lazy = self.__dict__.get("_lazy_attributes")
+        if not lazy:
+            return
+        for name in names:
+            variable = lazy.get(name)
+            if variable not in self._lazy_swarm_variables:
+                continue
+            kwargs = self._lazy_swarm_variables.pop(variable)
+            for key in [key for key, value in lazy.items()
+                        if value == variable]:
+                del lazy[key]
+            self.add_swarm_variable(variable, **kwargs)
 
     def _repr_html_(self):
         """_repr_html_
@@ -400,42 +506,140 @@ class Model(Material):
 
         """
 
+        # A new run (or a restart) starts new XDMF collections
+        self._xdmf_collections = dict()
         if not step:
             return
         restartDir = restartDir if restartDir else self.outputDir
         if not os.path.exists(restartDir):
             return
-        if not os.listdir(restartDir):
+        if (not CheckpointManifest(restartDir).exists() and
+                not os.listdir(restartDir)):
             return
+        if self._checkpoint_writer:
+            self._checkpoint_writer.wait()
+        self._checkpoint_index.reset()
         _RestartFunction(self, restartDir).restart(step)
 
+    def _get_checkpoint_writer(self):
+        """ Return the asynchronous checkpoint writer or None """
+        if not rcParams["checkpoint.async"]:
+            return None
+        if not self._checkpoint_writer:
+            self._checkpoint_writer = AsyncCheckpointWriter()
+        return self._checkpoint_writer
+
     def checkpoint(self, checkpointID, variables=None,
                    time=None, outputDir=None):
         _CheckpointFunction(self).checkpoint_all(checkpointID, variables,
                                                  time, outputDir)
 
+    def _projection_key(self):
+        """ State of the model the projections are computed at
+
+        The step, nonlinear iteration, swarm state, function graph
+        version and a counter of the changes of the swarm variables
+        made by the Model (see _invalidate_projections). Direct
+        writes to the data of the swarm variables are not tracked.
+        """
+        return (self.step, self.nlstep, self.swarm.stateId,
+                self._fn_version, self._state_version,
+                rcParams["averaging.method"])
+
+    def _invalidate_projections(self):
+        """ Mark the projected fields as out of date
+
+        Called when the solution or the swarm variables change:
+        after a solve, a time step or a change of the materials.
+        Call it after writing directly to the data of a swarm variable.
+        """
+        self._state_version += 1
+
+    def _evaluate_on_swarm(self, variable, function):
+        """ Evaluate the function called function into the swarm
+        variable, unless the variable already holds its values at the
+        current state (see _projection_key).
+        """
+        if self._evaluated.get(variable) == self._projection_key():
+            return
+        values = getattr(self, function).evaluate(self.swarm)
+        getattr(self, variable).data[...] = values
+        self._evaluated[variable] = self._projection_key()
+
+    # proj* fields computed by the batched swarm projector:
+    # name: (swarm variable, function evaluated on the swarm or None)
+    _projections = OrderedDict([
+        ("projMaterialField", ("materialField", None)),
+        ("projPlasticStrain", ("plasticStrain", None)),
+        ("projTimeField", ("timeField", None)),
+        ("projMeltField", ("meltField", None)),
+        ("projViscosityField", ("_viscosityField", "_viscosityFn")),
+        ("projDensityField", ("_densityField", "_densityFn")),
+        ("projStressTensor", ("_stressTensor", "_stressFn")),
+        ("projStressField", ("_stressField", "_stressInvariantFn"))])
+
+    def _update_projections(self, names):
+        """ Project the proj* fields in names that are out of date
+
+        Swarm variables holding a function are evaluated first.
+        The out of date fields are then projected together so that
+        the Voronoi weights are only computed once.
+        Names that are not proj* fields are ignored.
+        """
+        names = [name for name in names if name in self._projections]
+        # Building the functions can change the key
+        functions = dict((name, getattr(self, self._projections[name][1]))
+                         for name in names if self._projections[name][1])
+        key = self._projection_key()
+
+        stale = []
+        for name in names:
+            # The decision is taken collectively so that all the
+            # processes solve the projections together.
+            if comm.allreduce(int(self._projection_cache.get(name) != key),
+                              op=_MPI.MAX):
+                stale.append(name)
+        if not stale:
+            return
+
+        variables = []
+        for name in stale:
+            variable = self._projections[name][0]
+            if name in functions:
+                getattr(self, variable).data[...] = functions[name].evaluate(
+                    self.swarm)
+            variables.append(variable)
+        self._swarm_projections.solve(variables)
+
+        # The key is recorded once the projections are done
+        key = self._projection_key()
+        for name in stale:
+            self._projection_cache[name] = key
+            if name in functions:
+                self._evaluated[self._projections[name][0]] = key
+
     @property
     def projMaterialField(self):
         """ Material field projected on the mesh """
-        self._materialFieldProjector.solve()
+        self._update_projections(["projMaterialField"])
         return self._projMaterialField
 
     @property
     def projPlasticStrain(self):
         """ Plastic Strain Field projected on the mesh """
-        self._plasticStrainProjector.solve()
+        self._update_projections(["projPlasticStrain"])
         return self._projPlasticStrain
 
     @property
     def projTimeField(self):
         """ Time Field projected on the mesh """
-        self._timeFieldProjector.solve()
+        self._update_projections(["projTimeField"])
         return self._projTimeField
 
     @property
     def projMeltField(self):
         """ Melt Field projected on the mesh """
-        self._meltFieldProjector.solve()
+        self._update_projections(["projMeltField"])
         return self._projMeltField
 
     @property
@@ -459,36 +663,35 @@ class Model(Material):
     @property
     def projViscosityField(self):
         """ Viscosity Field projected on the mesh """
-        self.viscosityField.data[...] = self._viscosityFn.evaluate(self.swarm)
-        self._viscosityFieldProjector.solve()
+        self._update_projections(["projViscosityField"])
         return self._projViscosityField
 
     @property
     def viscosityField(self):
         """ Viscosity Field on particles """
-        self._viscosityField.data[:] = self._viscosityFn.evaluate(self.swarm)
+        self._evaluate_on_swarm("_viscosityField", "_viscosityFn")
         return self._viscosityField
 
     @property
     def projStressTensor(self):
         """ Stress Tensor on mesh """
-        self._stressTensor.data[...] = self._stressFn.evaluate(self.swarm)
-        self._stressTensorProjector.solve()
+        self._update_projections(["projStressTensor"])
         return self._projStressTensor
 
+    @property
+    def _stressInvariantFn(self):
+        return fn.tensor.second_invariant(self._stressFn)
+
     @property
     def projStressField(self):
         """ Second Invariant of the Stress tensor projected on the submesh"""
-        stress = fn.tensor.second_invariant(self._stressFn)
-        self._stressField.data[...] = stress.evaluate(self.swarm)
-        self._stressFieldProjector.solve()
+        self._update_projections(["projStressField"])
         return self._projStressField
 
     @property
     def projDensityField(self):
         """ Density Field projected on the mesh """
-        self.densityField.data[...] = self._densityFn.evaluate(self.swarm)
-        self._densityFieldProjector.solve()
+        self._update_projections(["projDensityField"])
         return self._projDensityField
 
     @property
@@ -625,6 +828,7 @@ class Model(Material):
         if not self.temperature:
             self.temperature = True
 
+        self._invalidate_advdiffSystem()
         self._temperatureBCs = TemperatureBCs(self, left=left, right=right,
                                               top=top, bottom=bottom,
                                               back=back, front=front,
@@ -714,6 +918,7 @@ class Model(Material):
         if not self.temperature:
             self.temperature = True
 
+        self._invalidate_advdiffSystem()
         self._heatFlowBCs = HeatFlowBCs(self, left=left, right=right,
                                         top=top, bottom=bottom,
                                         back=back, front=front)
@@ -726,6 +931,7 @@ class Model(Material):
     @temperatureBCs.setter
     def temperatureBCs(self, value):
         self._temperatureBCs = value
+        self._invalidate_advdiffSystem()
 
     @property
     def heatFlowBCs(self):
@@ -734,6 +940,7 @@ class Model(Material):
     @heatFlowBCs.setter
     def heatFlowBCs(self, value):
         self._heatFlowBCs = value
+        self._invalidate_advdiffSystem()
 
     @property
     def velocityBCs(self):
@@ -790,19 +997,19 @@ class Model(Material):
         else:
             self._temperature = False
 
-    @property
-    def _advdiffSystem(self):
-        """ Advection Diffusion System """
-
+    def _build_diffusivityFn(self):
+        """ Diffusivity Function Builder """
         DiffusivityMap = {}
         for material in self.materials:
             if material.diffusivity:
                 DiffusivityMap[material.index] = nd(material.diffusivity)
 
-        self.DiffusivityFn = fn.branching.map(fn_key=self.materialField,
-                                              mapping=DiffusivityMap,
-                                              fn_default=nd(self.diffusivity))
+        return fn.branching.map(fn_key=self.materialField,
+                                mapping=DiffusivityMap,
+                                fn_default=nd(self.diffusivity))
 
+    def _build_heatProdFn(self):
+        """ Heat Production Function Builder """
         HeatProdMap = {}
         for material in self.materials:
             if all([material.density,
@@ -815,36 +1022,95 @@ class Model(Material):
             else:
                 HeatProdMap[material.index] = 0.
 
-        self.HeatProdFn = fn.branching.map(fn_key=self.materialField,
-                                           mapping=HeatProdMap)
+        HeatProdFn = fn.branching.map(fn_key=self.materialField,
+                                      mapping=HeatProdMap)
 
         # Add Viscous dissipation Heating
         if rcParams["shear.heating"]:
             stress = fn.tensor.second_invariant(self._stressFn)
             strain = self.strainRate_2ndInvariant
-            self.HeatProdFn += stress * strain
+            HeatProdFn += stress * strain
+
+        return HeatProdFn
+
+    def _invalidate_advdiffSystem(self):
+        """ Force the Advection Diffusion System to be rebuilt """
+        self._advdiff = None
 
+    def _thermal_conditions(self):
+        """ Apply the thermal boundary conditions
+
+        Returns the list of conditions and a token identifying the
+        nodes they apply to.
+        """
         conditions = []
         conditions.append(self.temperatureBCs)
         if self._heatFlowBCs:
             conditions.append(self.heatFlowBCs)
-        
-        obj = uw.systems.AdvectionDiffusion(
-                method=rcParams["advection.diffusion.method"],
-                phiField=self.temperature,
-                phiDotField=self._temperatureDot,
-                velocityField=self.velocityField,
-                fn_diffusivity=self.DiffusivityFn,
-                fn_sourceTerm=self.HeatProdFn,
-                conditions=conditions
-        )
 
-        return obj
+        token = []
+        for bcs in (self._temperatureBCs, self._heatFlowBCs):
+            if bcs:
+                token.append(tuple(iset.data.tobytes() if iset else None
+                                   for iset in bcs._indices))
+        return conditions, tuple(token)
+
+    @property
+    def _advdiffSystem(self):
+        """ Advection Diffusion System
+
+        The system is built once and kept between steps. The diffusivity
+        and source term are updated in place, the system is only rebuilt
+        if the fields, the method or the nodes on which the boundary
+        conditions apply change.
+        """
+
+        if rcParams["shear.heating"]:
+            # The viscous dissipation reads the viscosity on the particles
+            self.viscosityField
+
+        self.DiffusivityFn = self._cached_fn("diffusivity",
+                                             self._build_diffusivityFn)
+        self.HeatProdFn = self._cached_fn("heat_production",
+                                          self._build_heatProdFn)
+
+        conditions, bcs_token = self._thermal_conditions()
+        key = (rcParams["advection.diffusion.method"],
+               id(self.temperature), id(self.velocityField), bcs_token)
+
+        # The nodes of the boundary conditions are local to each process:
+        # the system is rebuilt on all the processes if they changed on any.
+        changed = comm.allreduce(int(self._advdiff_key != key), op=_MPI.MAX)
+
+        if self._advdiff is not None and not changed:
+            obj = self._advdiff
+            diffusivity, source = self._advdiff_fns
+            if diffusivity is not self.DiffusivityFn or source is not self.HeatProdFn:
+                if not (_set_system_fn(obj, "fn_diffusivity", self.DiffusivityFn) and
+                        _set_system_fn(obj, "fn_sourceTerm", self.HeatProdFn)):
+                    self._invalidate_advdiffSystem()
+
+        if self._advdiff is None or changed:
+            self._advdiff = uw.systems.AdvectionDiffusion(
+                    method=rcParams["advection.diffusion.method"],
+                    phiField=self.temperature,
+                    phiDotField=self._temperatureDot,
+                    velocityField=self.velocityField,
+                    fn_diffusivity=self.DiffusivityFn,
+                    fn_sourceTerm=self.HeatProdFn,
+                    conditions=conditions
+            )
+            self._advdiff_key = key
+
+        self._advdiff_fns = (self.DiffusivityFn, self.HeatProdFn)
+        return self._advdiff
 
     @property
     def _buoyancyFn(self):
-        gravity = tuple([nd(val) for val in self.gravity])
-        return self._densityFn * gravity
+        def builder():
+            gravity = tuple([nd(val) for val in self.gravity])
+            return self._densityFn * gravity
+        return self._cached_fn("buoyancy", builder)
 
     @property
     def stokes_SLE(self):
@@ -1061,6 +1327,89 @@ class Model(Material):
         if reset:
             self.materialField.data[:] = self.index
 
+        mat = self._register_material(material, shape, name)
+        self._layout_materials([mat])
+        return mat
+
+    def add_materials(self, layout, reset=False):
+        """ Add several Materials to the Model
+
+        The material field is built in a single pass: the particles
+        tested against each shape are first selected with the bounding
+        box of the shape. The result is the same as calling add_material
+        for each (material, shape) pair, in order (a material overwrites
+        the materials added before it).
+
+        Parameters:
+        -----------
+            layout:
+                Ordered list of (material, shape) pairs. material can be
+                an UWGeodynamics material or a name.
+                See Model.add_material.
+            reset: (bool)
+                Reset the material Field before adding the new
+                materials. Default is False.
+
+        Returns:
+        --------
+            The list of materials, in the order of layout.
+
+        Example:
+        --------
+
+        >>> air, crust, mantle = Model.add_materials([
+        ...     ("Air", GEO.shapes.Layer(top=Model.top, bottom=0.)),
+        ...     ("Crust", GEO.shapes.Layer(top=0., bottom=-35. * u.km)),
+        ...     ("Mantle", GEO.shapes.Layer(top=-35. * u.km,
+        ...                                 bottom=Model.bottom))])
+        """
+
+        if reset:
+            self.materialField.data[:] = self.index
+
+        mats = []
+        for material, shape in layout:
+            if isinstance(material, six.string_types):
+                mats.append(self._register_material(None, shape, material))
+            else:
+                mats.append(self._register_material(material, shape))
+        self._layout_materials(mats)
+        return mats
+
+    def _layout_materials(self, mats):
+        """ Set the index of mats on the particles inside their shapes
+
+        The later materials overwrite the earlier ones. Shapes providing
+        a bounding_box are only evaluated on the particles inside
+        the box, other functions are evaluated on the whole swarm.
+        """
+        self._invalidate_projections()
+        coords = self.swarm.particleCoordinates.data
+        if not coords.shape[0]:
+            return
+        index = self.materialField.data[:, 0].copy()
+        for mat in mats:
+            if not mat.shape:
+                continue
+            if hasattr(mat.shape, "bounding_box"):
+                lower, upper = mat.shape.bounding_box(self.mesh.dim)
+                candidates = np.nonzero(
+                    np.all((coords >= lower) & (coords <= upper),
+                           axis=1))[0]
+                if not candidates.size:
+                    continue
+                inside = mat.shape.evaluate(coords[candidates])
+                candidates = candidates[inside.reshape(-1).astype(bool)]
+            else:
+                inside = mat.shape.evaluate(self.swarm)
+                candidates = np.nonzero(inside.reshape(-1))[0]
+            index[candidates] = mat.index
+        self.materialField.data[:, 0] = index
+
+    def _register_material(self, material=None, shape=None,
+                           name="unknown"):
+        """ Create the Material and add it to the list of materials """
+
         mat = material if material else Material()
         mat.name = material.name if (material and material.name) else name
 
@@ -1083,16 +1432,11 @@ class Model(Material):
         self.materials.append(mat)
         self.materials.reverse()
 
-        if mat.shape:
-            condition = [(mat.shape, mat.index), (True, self.materialField)]
-            func = fn.branching.conditional(condition)
-            self.materialField.data[:] = func.evaluate(self.swarm)
-
         return mat
 
     def add_swarm_variable(self, name, dataType="double", count=1,
                            init_value=0., projected="mesh",
-                           restart_variable=False, **kwargs):
+                           restart_variable=False, lazy=False, **kwargs):
         """Add a new swarm field to the model
 
         Parameters
@@ -1113,24 +1457,49 @@ class Model(Material):
                 "submesh"
             restart_variable: bool
                 specifies if the variable is needed for a restart.
+            lazy: bool
+                defer the allocation of the variable, of its projection
+                and of its projector until the variable is first
+                accessed. The first access must happen on all the
+                processes. Restart variables cannot be deferred.
 
         Returns
         -------
 
-            Swarm Variable
+            Swarm Variable (None if the allocation is deferred)
         """
 
-        newField = self.swarm.add_variable(dataType, count, **kwargs)
-        setattr(self, name, newField)
-        newField.data[...] = init_value
-        self.swarm_variables[name.strip("_")] = newField
-
         # Create mesh variable for projection
         if name.startswith("_"):
             proj_name = "_proj" + name[1].upper() + name[2:]
         else:
             proj_name = "_proj" + name[0].upper() + name[1:]
 
+        if name.startswith("_"):
+            projector_name = name + "Projector"
+        else:
+            projector_name = "_" + name + "Projector"
+
+        if lazy and not restart_variable:
+            kwargs.update(dataType=dataType, count=count,
+                          init_value=init_value, projected=projected)
+            self._lazy_swarm_variables[name] = kwargs
+            for key in (name, name.strip("_"), proj_name,
+                        proj_name.strip("_"), projector_name):
+                self._lazy_attributes[key] = name
+            # Drop a variable allocated on a previous swarm (restart)
+            for key in (name, proj_name, projector_name):
+                self.__dict__.pop(key, None)
+            self.swarm_variables.pop(name.strip("_"), None)
+            self.mesh_variables.pop(proj_name.strip("_"), None)
+            self._swarm_projections.projectors.pop(name, None)
+            return None
+
+        newField = self.swarm.add_variable(dataType, count, **kwargs)
+        setattr(self, name, newField)
+        newField.data[...] = init_value
+        self.swarm_variables[name.strip("_")] = newField
+
         if projected == "mesh":
             projected = self.add_mesh_variable(proj_name,
                                             nodeDofCount=count,
@@ -1141,14 +1510,7 @@ class Model(Material):
                                                dataType="double")
 
         # Create a projector
-        if name.startswith("_"):
-            projector_name = name + "Projector"
-        else:
-            projector_name = "_" + name + "Projector"
-        projector = uw.utils.MeshVariable_Projection(projected,
-                                                     newField,
-                                                     voronoi_swarm=self.swarm,
-                                                     type=0)
+        projector = self._swarm_projections.add(name, projected, newField)
         setattr(self, projector_name, projector)
 
         if restart_variable:
@@ -1219,8 +1581,93 @@ class Model(Material):
             self.restart_variables[name] = newField
         return newField
 
+    def memory_report(self):
+        """ Report the memory held by the swarm and mesh variables
+
+        Sizes are summed over the processes (the call is collective)
+        and printed by process 0 with the list of the optional swarm
+        variables which have not been allocated yet.
+
+        Returns
+        -------
+            OrderedDict {name: size in bytes}
+        """
+        report = OrderedDict()
+        report["mesh"] = self.mesh.data.nbytes
+        for name, field in self.mesh_variables.items():
+            report["mesh_variables/" + name] = field.data.nbytes
+        report["swarm"] = self.swarm.particleCoordinates.data.nbytes
+        for name, field in self.swarm_variables.items():
+            report["swarm_variables/" + name] = field.data.nbytes
+        for tracers in self._tracer_swarms():
+            report["tracers/" + tracers.name] = sum(
+                variable.data.nbytes for variable in tracers.variables)
+
+        local = np.array(list(report.values()), dtype="float64")
+        total = np.zeros_like(local)
+        comm.Allreduce(local, total, op=_MPI.SUM)
+        for idx, name in enumerate(report):
+            report[name] = int(total[idx])
+
+        if rank == 0:
+            width = max(len(name) for name in report)
+            for name, nbytes in report.items():
+                print("{0:<{1}} {2:>12.3f} MB".format(name, width,
+                                                      nbytes / 1024.**2))
+            print("{0:<{1}} {2:>12.3f} MB".format(
+                "Total", width, sum(report.values()) / 1024.**2))
+            if self._lazy_swarm_variables:
+                print("Not allocated: " +
+                      ", ".join(self._lazy_swarm_variables.keys()))
+            sys.stdout.flush()
+        return report
+
+    def _function_state(self):
+        """ Return a cheap description of what the function graphs
+        (viscosity, density, stress...) are built from: the number of
+        changes of the materials, rheologies and fields (see Parameters),
+        the relevant rcParams and whether the initial viscosities apply. """
+        processor = self._viscosity_processor
+        return (changes(),
+                tuple(id(material) for material in self.materials),
+                tuple(rcParams[key] for key in _rcParams_fn_keys),
+                self.nlstep == 0 and any([
+                    processor._use_initial_viscosity(material)
+                    for material in self.materials]))
+
+    def _invalidate_functions(self):
+        """ Force the function graphs to be rebuilt on next access """
+        self._fn_version += 1
+        self._fn_cache.clear()
+
+    def _cached_fn(self, name, builder):
+        """ Return the function graph called name.
+
+        The graph is only rebuilt (calling builder) when the version
+        counter has moved since it was last built. The counter is
+        incremented each time the materials, rheologies, relevant rcParams
+        or fields the graphs are wired to change.
+        """
+        state = self._function_state()
+        if state != self._fn_state:
+            self._fn_state = state
+            self._invalidate_functions()
+
+        version, func = self._fn_cache.get(name, (None, None))
+        if version != self._fn_version:
+            func = builder()
+            self._fn_cache[name] = (self._fn_version, func)
+            # Building the graph wires the handlers to the fields and
+            # may allocate the fields it reads
+            self._fn_state = self._function_state()
+        return func
+
     @property
     def _densityFn(self):
+        """Density Function"""
+        return self._cached_fn("density", self._build_densityFn)
+
+    def _build_densityFn(self):
         """Density Function Builder"""
         densityMap = {}
         for material in self.materials:
@@ -1270,22 +1717,37 @@ class Model(Material):
 
     @property
     def _viscosityFn(self):
-        return self._viscosity_processor.get_effective_eta(
-            rcParams["averaging.method"])
+        processor = self._viscosity_processor
+        eta = self._cached_fn("viscosity",
+                              lambda: processor.get_effective_eta(None))
+        averaging_scheme = rcParams["averaging.method"]
+        if averaging_scheme and averaging_scheme != 1:
+            # The averaged field is a projection, it must be refreshed.
+            return processor.average(eta, averaging_scheme)
+        return eta
 
     @property
     def _stressFn(self):
-        """Stress Function Builder"""
-        viscousStressFn = self._viscous_stressFn()
-        elasticStressFn = self._elastic_stressFn
-        return  viscousStressFn + elasticStressFn
+        """Stress Function"""
+        # The viscous stress reads the viscosity stored on the particles,
+        # which is only evaluated again when the state has changed
+        self._evaluate_on_swarm("_viscosityField", "_viscosityFn")
+
+        def builder():
+            return self._viscous_stressFn() + self._elastic_stressFn
+        return self._cached_fn("stress", builder)
 
     def _viscous_stressFn(self):
         """Viscous Stress Function Builder"""
-        return 2. * self.viscosityField * self.strainRate
+        return 2. * self._viscosityField * self.strainRate
 
     @property
     def _elastic_stressFn(self):
+        """ Elastic Stress Function """
+        return self._cached_fn("elastic_stress",
+                               self._build_elastic_stressFn)
+
+    def _build_elastic_stressFn(self):
         """ Elastic Stress Function Builder"""
         if any([material.elasticity for material in self.materials]):
             stressMap = {}
@@ -1307,27 +1769,114 @@ class Model(Material):
             elasticStressFn = [0.0] * 3 if self.mesh.dim == 2 else [0.0] * 6
             return elasticStressFn
 
-    def _update_stress_history(self, dt):
-        """Update Previous Stress Field"""
+    def _update_stress_history(self, dt, pipeline=None):
+        """Update Previous Stress Field
+
+        If a pipeline is given, the update is added to it
+        (see SwarmUpdatePipeline) """
         dt_e = []
         for material in self.materials:
             if material.elasticity:
                 dt_e.append(nd(material.elasticity.observation_time))
         dt_e = np.array(dt_e).min()
         phi = dt / dt_e
-        veStressFn_data = self._stressFn.evaluate(self.swarm)
-        self._previousStressField.data[:] *= (1. - phi)
-        self._previousStressField.data[:] += phi * veStressFn_data[:]
 
-    def _phaseChangeFn(self):
-        for material in self.materials:
-            if material.phase_changes:
-                for change in material.phase_changes:
-                    obj = change
-                    mask = obj.fn().evaluate(self.swarm)
-                    conds = ((mask == 1) &
-                             (self.materialField.data == material.index))
-                    self.materialField.data[conds] = obj.result
+        def update(values):
+            previousStress = self._previousStressField.data
+            previousStress *= (1. - phi)
+            values *= phi
+            previousStress += values
+
+        if pipeline is None:
+            update(self._stressFn.evaluate(self.swarm))
+            return
+
+        pipeline.add("stress", self._stressFn, update,
+                     count=self._previousStressField.data.shape[1],
+                     reads=["materialField", "plasticStrain", "meltField",
+                            "previousStressField"],
+                     writes=["previousStressField"])
+
+    def _phaseChangeFn(self, pipeline=None):
+        """ Apply the phase changes
+
+        If a pipeline is given, the changes are added to it
+        (see SwarmUpdatePipeline). The conditions of the changes are
+        evaluated before any change is applied, in a single pass, and
+        only on the particles which can belong to the source material
+        of the change when it is applied. Changes providing a
+        coordinate_mask (and not overriding PhaseChange.fn) are tested
+        on the coordinates of the particles of their source material
+        instead.
+        """
+        changes = [(material.index, change) for material in self.materials
+                   for change in material.phase_changes]
+        if not changes:
+            return
+
+        # Materials a particle may have at the start of the step
+        # to belong to the source material of each change
+        origins = dict()
+        sources = []
+        for index, change in changes:
+            source = origins.setdefault(index, set([index]))
+            sources.append(sorted(source))
+            origins.setdefault(change.result,
+                               set([change.result])).update(source)
+
+        functions = []
+        columns = []
+        for (index, change), source in zip(changes, sources):
+            if (change.coordinate_mask is not None and
+                    type(change).fn is PhaseChange.fn):
+                columns.append(None)
+                continue
+            # The mask is built from fn() which subclasses may override
+            mask = fn.branching.conditional([(change.fn() > 0.5, 1.),
+                                             (True, 0.)])
+            columns.append(len(functions))
+            functions.append(fn.branching.map(
+                fn_key=self.materialField,
+                mapping=dict((key, mask) for key in source),
+                fn_default=0.))
+
+        # The masks are packed in the bits of a few scalar functions
+        packed = SwarmUpdatePipeline.bitmask(functions)
+
+        def update(values=None):
+            if values is not None:
+                masks = SwarmUpdatePipeline.unpack(values, len(functions))
+            materialField = self.materialField.data[:, 0]
+            # Particles of each material at the start of the step
+            order = np.argsort(materialField, kind="mergesort")
+            keys = materialField[order]
+
+            def members(source):
+                return np.concatenate([
+                    order[np.searchsorted(keys, key, side="left"):
+                          np.searchsorted(keys, key, side="right")]
+                    for key in source])
+
+            for (index, change), source, column in zip(changes, sources,
+                                                       columns):
+                ids = members(source)
+                ids = ids[materialField[ids] == index]
+                if not ids.size:
+                    continue
+                if column is None:
+                    coords = self.swarm.particleCoordinates.data[ids]
+                    ids = ids[change.coordinate_mask(coords)]
+                else:
+                    ids = ids[masks[ids, column]]
+                materialField[ids] = change.result
+
+        run = pipeline is None
+        if run:
+            pipeline = SwarmUpdatePipeline(self.swarm)
+        pipeline.add("phase changes", packed or None, update,
+                     reads=["materialField"], writes=["materialField"])
+        if run:
+            pipeline.run()
 
     def solve_temperature_steady_state(self):
         """ Solve for steady state temperature
@@ -1339,16 +1888,8 @@ class Model(Material):
 
         if self.materials:
 
-            DiffusivityMap = {}
-            for material in self.materials:
-                if material.diffusivity:
-                    DiffusivityMap[material.index] = nd(material.diffusivity)
-
-            self.DiffusivityFn = fn.branching.map(
-                fn_key=self.materialField,
-                mapping=DiffusivityMap,
-                fn_default=nd(self.diffusivity)
-            )
+            self.DiffusivityFn = self._cached_fn("diffusivity",
+                                                 self._build_diffusivityFn)
 
             HeatProdMap = {}
             for material in self.materials:
@@ -1474,18 +2015,99 @@ class Model(Material):
             minIterations = rcParams["nonlinear.min.iterations"]
             maxIterations = rcParams["nonlinear.max.iterations"]
 
-        self.solver.solve(
-            nonLinearIterate=True,
-            nonLinearMinIterations=minIterations,
-            nonLinearMaxIterations=maxIterations,
-            callback_post_solve=self._callback_post_solve,
-            nonLinearTolerance=self._curTolerance)
+        if (rcParams["nonlinear.acceleration"] != "none" or
+                rcParams["nonlinear.eisenstat.walker"]):
+            with self.timers("nonlinear"):
+                self._accelerated_solve(minIterations, maxIterations)
+        else:
+            self.solver.solve(
+                nonLinearIterate=True,
+                nonLinearMinIterations=minIterations,
+                nonLinearMaxIterations=maxIterations,
+                callback_post_solve=self._callback_post_solve,
+                nonLinearTolerance=self._curTolerance)
 
         self._solution_exist.value = True
+        self._invalidate_projections()
 
         if rcParams["rebuild.solver"]:
             self._solver = False
 
+    def _accelerated_solve(self, minIterations, maxIterations):
+        """ Picard iterations driven from python
+
+        Each iteration is a linear Stokes solve followed by
+        the post solve callback. The iterates (velocity and pressure)
+        can be combined using Anderson mixing and the tolerance of the
+        linear solves can follow an Eisenstat-Walker schedule.
+        Convergence is measured as the relative change of the velocity
+        field between two iterations (L2 norm).
+        """
+
+        fields = [self.velocityField, self.pressureField]
+        mixer = None
+        if rcParams["nonlinear.acceleration"] == "anderson":
+            mixer = AndersonMixing(fields,
+                                   depth=rcParams["nonlinear.anderson.depth"],
+                                   damping=rcParams["nonlinear.anderson.damping"])
+
+        forcing = None
+        if rcParams["nonlinear.eisenstat.walker"]:
+            forcing = EisenstatWalker(
+                self.solver,
+                eta_min=rcParams["nonlinear.linear.min.tolerance"],
+                eta_max=rcParams["nonlinear.linear.max.tolerance"])
+            forcing.start()
+
+        nvel = self.velocityField.data[:self.mesh.nodesLocal].size
+        iterate = np.concatenate([
+            field.data[:field.mesh.nodesLocal].ravel() for field in fields])
+
+        try:
+            for iteration in range(1, maxIterations + 1):
+                with self.timers("stokes"):
+                    self.solver.solve(nonLinearIterate=False)
+                self._callback_post_solve()
+
+                update = np.concatenate([
+                    field.data[:field.mesh.nodesLocal].ravel()
+                    for field in fields])
+                vnorm = _global_norm(update[:nvel])
+                residual = _global_norm(update[:nvel] - iterate[:nvel])
+                if vnorm > 0.:
+                    residual /= vnorm
+
+                if rank == 0:
+                    print("Non linear solver - iteration {0}".format(
+                        iteration))
+                    print("    Residual: {0:.4e}, Tolerance: {1:.4e}".format(
+                        residual, self._curTolerance))
+                    sys.stdout.flush()
+
+                if iteration >= minIterations and residual < self._curTolerance:
+                    if rank == 0:
+                        print("Converged after {0} iterations".format(
+                            iteration))
+                        sys.stdout.flush()
+                    break
+
+                if forcing:
+                    forcing.update(residual)
+
+                if mixer:
+                    iterate = mixer.update(iterate, update)
+                    mixer.set_iterate(iterate)
+                else:
+                    iterate = update
+            else:
+                if rank == 0:
+                    print("Non linear solver did not converge after "
+                          "{0} iterations".format(maxIterations))
+                    sys.stdout.flush()
+        finally:
+            if forcing:
+                forcing.restore()
+
     def init_model(self, temperature=True, pressureField=True,
                    defaultStrainRate=1e-15 / u.second):
         """ Initialize the Temperature Field as steady state,
@@ -1597,37 +2219,12 @@ class Model(Material):
 
             self._pre_solve()
 
-            self.solve()
-
-            self._dt = 2.0 * rcParams["CFL"] * self.swarm_advector.get_max_dt()
-
-            if self.temperature:
-                # Only get a condition if using SUPG
-                if rcParams["advection.diffusion.method"] == "SUPG":
-                    supg_dt = self._advdiffSystem.get_max_dt()
-                    supg_dt *= 2.0 * rcParams["CFL"]
-                    self._dt = min(self._dt, supg_dt)
-
-            if duration:
-                self._dt = min(self._dt, ndduration - self._ndtime)
+            with self.timers("stokes"):
+                self.solve()
 
-            if user_dt:
-                self._dt = min(self._dt, user_dt)
-
-            check_dt = checkpointer.get_next_checkpoint_time()
-            if check_dt:
-                self._dt = min(self._dt, check_dt)
-
-            dte = []
-            for material in self.materials:
-                if material.elasticity:
-                    dte.append(nd(material.elasticity.observation_time))
-
-            if dte:
-                dte = np.array(dte).min()
-                # Cap dt for observation time, dte / 3.
-                if dte and self._dt > (dte / 3.):
-                    self._dt = dte / 3.
+            with self.timers("timestep"):
+                self._dt, self._dt_reason = self._get_dt(
+                    ndduration, user_dt, checkpointer)
 
             comm.Barrier()
 
@@ -1637,20 +2234,95 @@ class Model(Material):
             self.stepDone += 1
             self._ndtime += self._dt
 
-            checkpointer.checkpoint()
+            with self.timers("checkpoint"):
+                checkpointer.checkpoint()
+
+            if rcParams["timers"]:
+                self._report_timers(output_dt_units)
 
             if rank == 0:
                 string = """Step: {0:5d} Model Time: {1:6.1f} dt: {2:6.1f} ({3})\n""".format(
                     self.stepDone, _adjust_time_units(self.time),
                     _adjust_time_units(self._dt),
                     datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                if self.timestep_controller:
+                    string += """      dt limited by: {0}\n""".format(
+                        self._dt_reason)
                 sys.stdout.write(string)
                 sys.stdout.flush()
 
             self._post_solve()
 
+        # Make sure all the checkpoints are on disk before returning
+        checkpointer.wait()
+
         return 1
 
+    def _report_timers(self, units):
+        """ Write the timers of the last step as a JSON line """
+        filename = rcParams["timers.filename"]
+        if filename and not os.path.isabs(filename):
+            filename = os.path.join(self.outputDir, filename)
+        self.timers.report(filename,
+                           step=self.step,
+                           time=self.time.to(units).magnitude,
+                           dt=dimensionalise(self._dt, units).magnitude,
+                           units=str(units),
+                           nlstep=self.nlstep)
+
+    def _get_dt(self, ndduration=None, user_dt=None, checkpointer=None):
+        """ Get the next timestep
+
+        Returns the timestep (non-dimensional) and the name of the
+        constraint that limited it.
+        """
+
+        dt = 2.0 * rcParams["CFL"] * self.swarm_advector.get_max_dt()
+        reason = "CFL"
+
+        if self.temperature:
+            # Only get a condition if using SUPG
+            if rcParams["advection.diffusion.method"] == "SUPG":
+                supg_dt = self._advdiffSystem.get_max_dt()
+                supg_dt *= 2.0 * rcParams["CFL"]
+                if supg_dt < dt:
+                    dt, reason = supg_dt, "SUPG"
+
+        controller = self.timestep_controller
+        if controller:
+            controller_dt = controller.get_dt(self)
+            if controller_dt and (not controller.cfl_limit or controller_dt < dt):
+                dt, reason = controller_dt, "controller"
+
+        constraints = []
+        if ndduration:
+            constraints.append((ndduration - self._ndtime, "duration"))
+
+        if user_dt:
+            constraints.append((user_dt, "user"))
+
+        if checkpointer:
+            check_dt = checkpointer.get_next_checkpoint_time()
+            if check_dt:
+                constraints.append((check_dt, "checkpoint"))
+
+        dte = []
+        for material in self.materials:
+            if material.elasticity:
+                dte.append(nd(material.elasticity.observation_time))
+
+        if dte:
+            dte = np.array(dte).min()
+            # Cap dt for observation time, dte / 3.
+            if dte:
+                constraints.append((dte / 3., "elasticity"))
+
+        for value, name in constraints:
+            if value < dt:
+                dt, reason = value, name
+
+        return dt, reason
+
     def _pre_solve(self):
         """ Entry point for functions to be run before attempting a solve """
         for key, val in self.pre_solve_functions.items():
@@ -1667,21 +2339,23 @@ class Model(Material):
             val()
 
     def _callback_post_solve(self):
-        if rcParams["surface.pressure.normalization"]:
-            self._calibrate_pressureField()
-        if rcParams["pressure.smoothing"]:
-            self.pressSmoother.smooth()
-        if self._isostasy:
-            self._isostasy.solve()
-        for material in self.materials:
-            if material.viscosity:
-                material.viscosity.firstIter.value = False
-        for key, val in self.callback_functions.items():
-            if not callable(val):
-                raise ValueError("""The function {0} must be
-                                 callable""".format(key))
-        self._solution_exist.value = True
-        self.nlstep += 1
+        with self.timers("nonlinear"):
+            if rcParams["surface.pressure.normalization"]:
+                self._calibrate_pressureField()
+            if rcParams["pressure.smoothing"]:
+                self.pressSmoother.smooth()
+            if self._isostasy:
+                with self.timers("isostasy"):
+                    self._isostasy.solve()
+            for material in self.materials:
+                if material.viscosity:
+                    material.viscosity.firstIter.value = False
+            for key, val in self.callback_functions.items():
+                if not callable(val):
+                    raise ValueError("""The function {0} must be
+                                     callable""".format(key))
+            self._solution_exist.value = True
+            self.nlstep += 1
 
     def _update(self):
         """ Update Function
@@ -1693,65 +2367,100 @@ class Model(Material):
         """
 
         dt = self._dt
-
-        # Heal plastic strain
-        if any([material.healingRate for material in self.materials]):
-            healingRates = {}
-            for material in self.materials:
-                healingRates[material.index] = nd(material.healingRate)
-            HealingRateFn = fn.branching.map(fn_key=self.materialField,
-                                             mapping=healingRates)
-
-            plasticStrainIncHealing = dt * HealingRateFn.evaluate(self.swarm)
-            self.plasticStrain.data[:] -= plasticStrainIncHealing
-            self.plasticStrain.data[self.plasticStrain.data < 0.] = 0.
-
-        # Increment plastic strain
-        _isYielding = self._viscosity_processor._isYielding
-        plasticStrainIncrement = dt * _isYielding.evaluate(self.swarm)
-        self.plasticStrain.data[:] += plasticStrainIncrement
-
-        if any([material.melt for material in self.materials]):
-            # Calculate New meltField
-            self.update_melt_fraction()
+        timers = self.timers
+
+        pipeline = self._swarm_update
+
+        with timers("other"):
+            # Heal plastic strain
+            if any([material.healingRate for material in self.materials]):
+                healingRates = {}
+                for material in self.materials:
+                    healingRates[material.index] = float(
+                        nd(material.healingRate))
+                HealingRateFn = fn.branching.map(fn_key=self.materialField,
+                                                 mapping=healingRates)
+
+                def heal(values):
+                    plasticStrain = self.plasticStrain.data
+                    values *= dt
+                    plasticStrain -= values
+                    np.maximum(plasticStrain, 0., out=plasticStrain)
+
+                pipeline.add("healing", HealingRateFn, heal,
+                             reads=["materialField"],
+                             writes=["plasticStrain"])
+
+            # Increment plastic strain
+            def increment(values):
+                values *= dt
+                self.plasticStrain.data[...] += values
+
+            pipeline.add("yielding", self._viscosity_processor._isYielding,
+                         increment,
+                         reads=["materialField", "plasticStrain", "meltField"],
+                         writes=["plasticStrain"])
+
+            if any([material.melt for material in self.materials]):
+                # Calculate New meltField
+                pipeline.add("melt", self._get_melt_fraction(),
+                             self._set_melt_fraction,
+                             reads=["materialField"], writes=["meltField"])
+
+            pipeline.run()
 
         # Solve for temperature
         if self.temperature:
-            self._advdiffSystem.integrate(dt)
-
-        if self._advector:
-            self.swarm_advector.integrate(dt)
-            self._advector.advect_mesh(dt)
-        elif self._freeSurface:
-            self.swarm_advector.integrate(dt, update_owners=False)
-            self._freeSurface.solve(dt)
-            self.swarm.update_particle_owners()
-        else:
-            # Integrate Swarms in time
-            self.swarm_advector.integrate(dt, update_owners=True)
+            with timers("thermal"):
+                self._advdiffSystem.integrate(dt)
+
+        with timers("advection"):
+            if self._advector:
+                self.swarm_advector.integrate(dt)
+                self._advector.advect_mesh(dt)
+            elif self._freeSurface:
+                self.swarm_advector.integrate(dt, update_owners=False)
+                self._freeSurface.solve(dt)
+                self.swarm.update_particle_owners()
+            else:
+                # Integrate Swarms in time
+                self.swarm_advector.integrate(dt, update_owners=True)
 
-        # Update stress
-        if any([material.elasticity for material in self.materials]):
-            self._update_stress_history(dt)
+        with timers("other"):
+            # Update stress
+            if any([material.elasticity for material in self.materials]):
+                self._update_stress_history(dt, pipeline)
+                pipeline.run()
 
         if self.passive_tracers:
-            for key in self.passive_tracers:
-                self.passive_tracers[key].integrate(dt)
+            with timers("advection"):
+                if self._verticalVelocityField is not None:
+                    # The advectors synchronise the shadow nodes
+                    self._verticalVelocityField.data[:, -1] = (
+                        self.velocityField.data[:, -1])
+                for tracers in self._tracer_swarms():
+                    tracers.integrate(dt)
 
         # Do pop control
-        self.population_control.repopulate()
-        self.swarm.update_particle_owners()
+        with timers("popcontrol"):
+            self.population_control.repopulate()
+            self.swarm.update_particle_owners()
 
         if self.surfaceProcesses:
-            self.surfaceProcesses.solve(dt)
+            with timers("surface"):
+                self.surfaceProcesses.solve(dt)
 
-        # Update Time Field
-        self.timeField.data[...] += dt
+        with timers("other"):
+            # Update Time Field
+            self.timeField.data[...] += dt
 
-        if self._visugrid:
-            self._visugrid.advect(dt)
+            if self._visugrid:
+                self._visugrid.advect(dt)
 
-        self._phaseChangeFn()
+        with timers("phase_changes"):
+            self._phaseChangeFn()
+
+        self._invalidate_projections()
 
     def mesh_advector(self, axis):
         """ Initialize the mesh advector
@@ -1779,6 +2488,12 @@ class Model(Material):
                 Model (default to True)
             centroids : if a list of centroids is provided, the pattern defined
                 by the vertices is reproduced around each centroid.
+            zOnly : (bool)
+                Advect the tracers along the vertical axis only.
+
+        If rcParams["tracers.merged"] is True, the tracers are added
+        as a group of a swarm shared by all the groups with the same
+        options and a PassiveTracerGroup view is returned.
 
         example:
         --------
@@ -1825,16 +2540,7 @@ class Model(Material):
         if centroids and not isinstance(centroids, list):
             centroids = list(centroids)
 
-        if not centroids:
-
-            tracers = PassiveTracers(self.mesh,
-                                     self.velocityField,
-                                     name=name,
-                                     particleEscape=particleEscape,
-                                     zOnly=zOnly)
-            tracers.add_particles_with_coordinates(vertices)
-
-        else:
+        if centroids:
             x = np.array(vertices[0])[..., np.newaxis] + np.array(centroids[0]).ravel()
             y = np.array(vertices[1])[..., np.newaxis] + np.array(centroids[1]).ravel()
             vertices = [x.ravel(), y.ravel()]
@@ -1843,18 +2549,68 @@ class Model(Material):
                 z = np.array(vertices[2])[..., np.newaxis]  + np.array(centroids[2]).ravel()
                 vertices = [x.ravel(), y.ravel(), z.ravel()]
 
+        if rcParams["tracers.merged"]:
+            tracers = self._merged_passive_tracers(
+                particleEscape, zOnly).add_group(name)
+        else:
             tracers = PassiveTracers(self.mesh,
                                      self.velocityField,
                                      name=name,
                                      particleEscape=particleEscape,
-                                     zOnly=zOnly)
-            tracers.add_particles_with_coordinates(vertices)
+                                     zOnly=zOnly,
+                                     verticalVelocityField=(
+                                         self._vertical_velocity()
+                                         if zOnly else None))
+        tracers.add_particles_with_coordinates(vertices)
 
         self.passive_tracers[name] = tracers
         setattr(self, name.lower() + "_tracers", tracers)
 
         return tracers
 
+    def _merged_passive_tracers(self, particleEscape, zOnly):
+        """ Return the swarm holding the merged groups of tracers
+        with the given options (see rcParams["tracers.merged"]) """
+        key = (bool(particleEscape), bool(zOnly))
+        if key not in self._merged_tracers:
+            name = "tracers"
+            if zOnly:
+                name = "zonly_" + name
+            if not particleEscape:
+                name = "confined_" + name
+            self._merged_tracers[key] = MergedPassiveTracers(
+                self.mesh, self.velocityField, name=name,
+                particleEscape=particleEscape, zOnly=zOnly,
+                verticalVelocityField=(self._vertical_velocity()
+                                       if zOnly else None))
+        return self._merged_tracers[key]
+
+    def _vertical_velocity(self):
+        """ Mesh variable advecting the tracers moving along the
+        vertical only (zOnly)
+
+        It is shared by all the tracers of the Model. Its horizontal
+        components are 0 and its vertical component is copied from
+        the velocity field once per step, before the tracers are
+        advected.
+        """
+        if self._verticalVelocityField is None:
+            self._verticalVelocityField = uw.mesh.MeshVariable(
+                self.mesh, nodeDofCount=self.mesh.dim)
+            self._verticalVelocityField.data[...] = 0.
+        return self._verticalVelocityField
+
+    def _tracer_swarms(self):
+        """ Return the swarms holding the passive tracers: one swarm
+        per group of tracers, or the swarms of the merged groups """
+        swarms = []
+        for tracers in self.passive_tracers.values():
+            if isinstance(tracers, PassiveTracerGroup):
+                tracers = tracers.tracers
+            if not any(tracers is swarm for swarm in swarms):
+                swarms.append(tracers)
+        return swarms
+
     def _get_melt_fraction(self):
         """ Melt Fraction function
 
@@ -1883,7 +2639,10 @@ class Model(Material):
     def update_melt_fraction(self):
         """ Calculate New meltField """
         meltFraction = self._get_melt_fraction()
-        self.meltField.data[:] = meltFraction.evaluate(self.swarm)
+        self._set_melt_fraction(meltFraction.evaluate(self.swarm))
+
+    def _set_melt_fraction(self, values):
+        self.meltField.data[...] = values
 
     def _get_dynamic_heating(self, material):
         """ Calculate additional heating source due to melt
@@ -1956,6 +2715,15 @@ class Model(Material):
                                   self.velocityField)
 
 
+# Attributes of the Model the function graphs depend on.
+_model_fn_attributes = (
+    "gravity", "_temperature", "frictionalBCs", "swarm", "materialField",
+    "pressureField", "velocityField", "plasticStrain", "meltField",
+    "_viscosityField", "_previousStressField")
+
+_rcParams_fn_keys = ("rheologies.combine.method", "shear.heating")
+
+
 _html_global = OrderedDict()
 _html_global["Number of Elements"] = "elementRes"
 _html_global["length"] = "length"
@@ -2271,6 +3039,7 @@ class _CheckpointFunction(object):
         self.checkpoint_times = checkpoint_times
         self.restart_checkpoint = restart_checkpoint
         self.outputDir = Model.outputDir
+        self.writer = Model._get_checkpoint_writer()
 
         if checkpoint_interval or checkpoint_times:
             self.checkpoint_all()
@@ -2284,21 +3053,87 @@ class _CheckpointFunction(object):
             ((self.step_type is "step") and
              (Model.stepDone == self.next_checkpoint))):
 
+            # Backpressure: only one asynchronous checkpoint in flight.
+            self.wait()
+
             Model.checkpointID += 1
+            self.next_checkpoint += self.checkpoint_interval
+            save_swarms = Model.checkpointID % self.restart_checkpoint == 0
+
+            if rcParams["checkpoint.layout"] == "single":
+                self.checkpoint_container(checkpointID=Model.checkpointID,
+                                          swarms=save_swarms)
+                return
+
+            # Save Tracers first: they are written synchronously
+            # and the previous asynchronous checkpoint must be done.
+            self.checkpoint_tracers(checkpointID=Model.checkpointID)
             # Save Mesh Variables
             self.checkpoint_fields(checkpointID=Model.checkpointID)
-            # Save Tracers
-            self.checkpoint_tracers(checkpointID=Model.checkpointID)
-            self.next_checkpoint += self.checkpoint_interval
 
             comm.Barrier()
 
             # if it's time to checkpoint the swarm, do so.
-            if Model.checkpointID % self.restart_checkpoint == 0:
+            if save_swarms:
                 self.checkpoint_swarms(checkpointID=Model.checkpointID)
 
             comm.Barrier()
 
+    def wait(self):
+        """ Wait for the asynchronous writes to complete """
+        if self.writer:
+            self.writer.wait()
+
+    def _save(self, items, time, finalize):
+        """ Save a list of (object, filename, units, dtype, compression)
+
+        finalize is called on process 0 with the list of
+        file handles and the list of the files linked to once all the
+        files are written.
+
+        With incremental checkpoints, the datasets which have not
+        changed since the previous checkpoint are saved as links.
+        """
+        index = None
+        if rcParams["checkpoint.incremental"]:
+            index = self.Model._checkpoint_index
+
+        if self.writer or index:
+            # The data is only copied if it is written in the background
+            copy = bool(self.writer and self.writer.copy)
+            requests = []
+            handles = []
+            depends = []
+            for obj, filename, units, dtype, compression in items:
+                request, handle = _stage(obj, filename, units, time,
+                                         dtype=dtype, compression=compression,
+                                         copy=copy)
+                if index:
+                    index.apply(request)
+                    depends += [path for path in request.dependencies()
+                                if path not in depends]
+                requests.append(request)
+                handles.append(handle)
+            if self.writer:
+                self.writer.submit(requests,
+                                   lambda: finalize(handles, depends))
+                return
+            for request in requests:
+                _write_request(request)
+            if rank == 0:
+                finalize(handles, depends)
+            comm.Barrier()
+            return
+
+        handles = []
+        for obj, filename, units, dtype, compression in items:
+            handles.append(obj.save(filename, units=units, time=time,
+                                    dtype=dtype, compression=compression))
+            comm.Barrier()
+        if rank == 0:
+            finalize(handles, [])
+        comm.Barrier()
+
     def get_next_checkpoint_time(self):
 
         Model = self.Model
@@ -2352,11 +3187,150 @@ class _CheckpointFunction(object):
                 output directory
 
         """
+        if rcParams["checkpoint.layout"] == "single":
+            self.checkpoint_container(variables, variables, checkpointID,
+                                      time, outputDir)
+            return
+
         self.checkpoint_fields(variables, checkpointID, time, outputDir)
         self.checkpoint_swarms(variables, checkpointID, time, outputDir)
         self.checkpoint_tracers(tracers, checkpointID, time, outputDir)
         comm.Barrier()
 
+    def checkpoint_container(self, fields=None, swarm_fields=None,
+                             checkpointID=None, time=None, outputDir=None,
+                             swarms=True):
+        """ Save the mesh, fields, swarm and tracers in a single h5 file
+
+        The file (checkpoint-ID.h5) contains one group per object:
+        /mesh, /fields/<name>, /swarm, /swarm_variables/<name> and
+        /tracers/<name>. A single XDMF file indexes its content.
+
+        Parameters
+        ----------
+
+        fields : A list of mesh/field variables to be saved.
+        swarm_fields : A list of swarm variables to be saved.
+        checkpointID : Checkpoint ID
+        time : Model time at checkpoint
+        outputDir : output directory
+        swarms : (bool) save the swarm and swarm variables.
+
+        """
+
+        Model = self.Model
+
+        if not fields:
+            fields = rcParams["default.outputs"]
+        fields = list(OrderedDict.fromkeys(fields))
+        Model._update_projections(fields)
+
+        if not swarm_fields:
+            swarm_fields = Model.restart_variables
+        Model._allocate_swarm_variables(swarm_fields)
+
+        if not checkpointID:
+            checkpointID = Model.checkpointID
+
+        outputDir = self.create_output_directory(outputDir)
+
+        time = time if time else Model.time
+        if isinstance(time, u.Quantity) and self.output_units:
+            time = time.to(self.output_units)
+
+        filename = os.path.join(outputDir, "checkpoint-%s.h5" % checkpointID)
+        request = _WriteRequest(filename, chunked=True)
+        copy = bool(self.writer and self.writer.copy)
+
+        def add(obj, group, units=None, lossless=True):
+            name = posixpath.basename(group)
+            dtype, compression = _output_policy(obj, name, lossless)
+            handle = _stage(obj, filename, units, time, request, group,
+                            dtype, compression, copy)[1]
+            return handle, name, group, dtype
+
+        mH = add(Model.mesh, "mesh", u.kilometers)[0]
+        variables = ["mesh"]
+
+        handles = []
+        for field in fields:
+            if field == "temperature" and not Model.temperature:
+                continue
+            if field in Model.mesh_variables.keys():
+                field = str(field)
+                try:
+                    units = rcParams[field + ".SIunits"]
+                except KeyError:
+                    units = None
+                handles.append(add(getattr(Model, field),
+                                   "fields/" + field, units,
+                                   field in Model.restart_variables))
+                request.add_link("fields/%s/mesh" % field, "/mesh")
+                variables.append(field)
+
+        string = _xdmf_mesh_grid(mH, "mesh", time, "mesh", handles)
+
+        if swarms:
+            sH = add(Model.swarm, "swarm", u.kilometers)[0]
+            variables.append("swarm")
+            handles = []
+            for field in swarm_fields:
+                if field in Model.swarm_variables.keys():
+                    field = str(field)
+                    try:
+                        units = rcParams[field + ".SIunits"]
+                    except KeyError:
+                        units = None
+                    handles.append(add(getattr(Model, field),
+                                       "swarm_variables/" + field, units))
+                    variables.append(field)
+            string += _xdmf_swarm_grid(sH, "swarm", time, "swarm",
+                                       Model.swarm.particleGlobalCount,
+                                       handles)
+
+        for tracer in Model._tracer_swarms():
+            group = "tracers/" + tracer.name
+            tH = add(tracer, group + "/swarm", u.kilometers)[0]
+            handles = [add(obj, group + "/" + name)
+                       for name, obj in tracer._index_variables()]
+            for name, attrs in tracer._index_attrs().items():
+                for attr, value in attrs.items():
+                    request.add_attr(attr, value, group + "/" + name)
+            for field in tracer.tracked_field:
+                obj = getattr(tracer, field["name"])
+                if not field["timeIntegration"]:
+                    obj.data[...] = field["value"].evaluate(tracer)
+                handles.append(add(obj, group + "/" + field["name"],
+                                   field["units"]))
+            string += _xdmf_swarm_grid(tH, tracer.name, time, group + "/swarm",
+                                       tracer.particleGlobalCount, handles)
+        names, metadata = self._tracers_manifest()
+        variables += names
+
+        if rcParams["checkpoint.xdmf.collection"]:
+            string = ("<Grid Name=\"checkpoint-{0}\" GridType=\"Collection\" "
+                      "CollectionType=\"Spatial\">\n".format(checkpointID) +
+                      string + "</Grid>\n")
+
+        def write_xdmf():
+            xdmf = _write_xdmf(outputDir, "checkpoint", checkpointID, string,
+                               collections=Model._xdmf_collections)
+            CheckpointManifest(outputDir).append(
+                checkpointID, time, "checkpoint", [filename, xdmf], variables,
+                metadata, request.dependencies())
+
+        if rcParams["checkpoint.incremental"]:
+            Model._checkpoint_index.apply(request)
+
+        if self.writer:
+            self.writer.submit([request], write_xdmf)
+            return
+
+        _write_request(request)
+        if rank == 0:
+            write_xdmf()
+        comm.Barrier()
+
     def checkpoint_fields(self, fields=None, checkpointID=None,
                           time=None, outputDir=None):
         """ Save the mesh and the mesh variables to outputDir
@@ -2375,6 +3349,8 @@ class _CheckpointFunction(object):
 
         if not fields:
             fields = rcParams["default.outputs"]
+        fields = list(OrderedDict.fromkeys(fields))
+        Model._update_projections(fields)
 
         if not checkpointID:
             checkpointID = Model.checkpointID
@@ -2385,35 +3361,27 @@ class _CheckpointFunction(object):
         if isinstance(time, u.Quantity) and self.output_units:
             time = time.to(self.output_units)
 
+        items = []
+        mH = None
+
         if Model._advector or Model._freeSurface:
             mesh_name = 'mesh-%s' % checkpointID
             mesh_prefix = os.path.join(outputDir, mesh_name)
-            mH = Model.mesh.save('%s.h5' % mesh_prefix,
-                                 units=u.kilometers,
-                                 time=time)
+            items.append((Model.mesh, '%s.h5' % mesh_prefix, u.kilometers) +
+                         _output_policy(Model.mesh, "mesh", lossless=True))
         elif not Model._mesh_saved:
             mesh_name = 'mesh'
             mesh_prefix = os.path.join(outputDir, mesh_name)
-            mH = Model.mesh.save('%s.h5' % mesh_prefix,
-                                 units=u.kilometers,
-                                 time=time)
+            items.append((Model.mesh, '%s.h5' % mesh_prefix, u.kilometers) +
+                         _output_policy(Model.mesh, "mesh", lossless=True))
             Model._mesh_saved = True
         else:
             mesh_name = 'mesh'
             mesh_prefix = os.path.join(outputDir, mesh_name)
             mH = uw.utils.SavedFileData(Model.mesh, '%s.h5' % mesh_prefix)
 
-        if rank == 0:
-            filename = "XDMF.fields." + str(checkpointID).zfill(5) + ".xmf"
-            filename = os.path.join(outputDir, filename)
-
-            # First write the XDMF header
-            string = uw.utils._xdmfheader()
-            string += uw.utils._spacetimeschema(mH, mesh_name,
-                                                time)
-
-        comm.Barrier()
-
+        names = []
+        dtypes = []
         for field in fields:
             if field == "temperature" and not Model.temperature:
                 continue
@@ -2425,24 +3393,38 @@ class _CheckpointFunction(object):
                 except KeyError:
                     units = None
 
-                # Save the h5 file and write the field schema for
-                # each one of the field variables
                 obj = getattr(Model, field)
                 file_prefix = os.path.join(outputDir, field + '-%s' % checkpointID)
-                handle = obj.save('%s.h5' % file_prefix, units=units,
-                                  time=time)
-                if rank == 0:
-                    string += uw.utils._fieldschema(handle, field)
-            comm.Barrier()
+                policy = _output_policy(
+                    obj, field, lossless=field in Model.restart_variables)
+                items.append((obj, '%s.h5' % file_prefix, units) + policy)
+                names.append(field)
+                dtypes.append(policy[0])
 
-        if rank == 0:
-            # Write the footer to the xmf
-            string += uw.utils._xdmffooter()
+        def write_xdmf(handles, depends):
+            mesh_handle = mH
+            if mesh_handle is None:
+                mesh_handle, handles = handles[0], handles[1:]
+
+            string = uw.utils._spacetimeschema(mesh_handle, mesh_name, time)
+
+            # Write the field schema for each one of the field variables
+            for handle, field, dtype in zip(handles, names, dtypes):
+                string += _retypeschema(
+                    uw.utils._fieldschema(handle, field), dtype)
+            string += "</Grid>\n"
 
             # Write the string to file - only proc 0
-            with open(filename, "w") as xdmfFH:
-                xdmfFH.write(string)
-        comm.Barrier()
+            filename = _write_xdmf(outputDir, "fields", checkpointID, string,
+                                   collections=Model._xdmf_collections)
+
+            CheckpointManifest(outputDir).append(
+                checkpointID, time, "fields",
+                [mesh_handle.filename] +
+                [item[1] for item in items if item[0] is not Model.mesh] +
+                [filename], ["mesh"] + names, depends=depends)
+
+        self._save(items, time, write_xdmf)
 
     def checkpoint_swarms(self, fields=None, checkpointID=None, time=None,
                           outputDir=None):
@@ -2461,6 +3443,7 @@ class _CheckpointFunction(object):
 
         if not fields:
             fields = Model.restart_variables
+        Model._allocate_swarm_variables(fields)
 
         if not checkpointID:
             checkpointID = Model.checkpointID
@@ -2473,20 +3456,10 @@ class _CheckpointFunction(object):
 
         swarm_name = 'swarm-%s.h5' % checkpointID
 
-        sH = Model.swarm.save(os.path.join(outputDir,
-                              swarm_name),
-                              units=u.kilometers,
-                              time=time)
-
-        if rank == 0:
-            filename = "XDMF.swarms." + str(checkpointID).zfill(5) + ".xmf"
-            filename = os.path.join(outputDir, filename)
-
-            # First write the XDMF header
-            string = uw.utils._xdmfheader()
-            string += uw.utils._swarmspacetimeschema(sH, swarm_name,
-                                                     time)
-        comm.Barrier()
+        items = [(Model.swarm, os.path.join(outputDir, swarm_name),
+                  u.kilometers) +
+                 _output_policy(Model.swarm, "swarm", lossless=True)]
+        names = []
 
         for field in fields:
             if field in Model.swarm_variables.keys():
@@ -2496,26 +3469,33 @@ class _CheckpointFunction(object):
                 except KeyError:
                     units = None
 
-                # Save the h5 file and write the field schema for
-                # each one of the field variables
                 obj = getattr(Model, field)
                 file_prefix = os.path.join(outputDir,
                                            field + '-%s' % checkpointID)
-                handle = obj.save('%s.h5' % file_prefix,
-                                  units=units, time=time)
-                if rank == 0:
-                    string += _swarmvarschema(handle, field)
-                comm.Barrier()
+                items.append((obj, '%s.h5' % file_prefix, units) +
+                             _output_policy(obj, field, lossless=True))
+                names.append(field)
 
-        if rank == 0:
-            # Write the footer to the xmf
-            string += uw.utils._xdmffooter()
+        # The sizes are known before the files are written,
+        # the XDMF file does not need to read them back.
+        count = Model.swarm.particleGlobalCount
+
+        def write_xdmf(handles, depends):
+            variables = [(handle, field, None, item[3]) for handle, field, item
+                         in zip(handles[1:], names, items[1:])]
+            string = _xdmf_swarm_grid(handles[0], swarm_name, time, None,
+                                      count, variables)
 
             # Write the string to file - only proc 0
-            with open(filename, "w") as xdmfFH:
-                xdmfFH.write(string)
+            filename = _write_xdmf(outputDir, "swarms", checkpointID, string,
+                                   collections=Model._xdmf_collections)
 
-        comm.Barrier()
+            CheckpointManifest(outputDir).append(
+                checkpointID, time, "swarms",
+                [item[1] for item in items] + [filename], ["swarm"] + names,
+                depends=depends)
+
+        self._save(items, time, write_xdmf)
 
     @u.check([None, None, None, "[time]", None])
     def checkpoint_tracers(self, tracers=None, checkpointID=None,
@@ -2550,11 +3530,30 @@ class _CheckpointFunction(object):
 
         # Checkpoint passive tracers and associated tracked fields
         if Model.passive_tracers:
-            for (dump, item) in Model.passive_tracers.items():
-                item.save(outputDir, checkpointID, time)
+            # h5 collective writes can not happen while the
+            # asynchronous writer is busy.
+            self.wait()
+            files = []
+            for item in Model._tracer_swarms():
+                files += item.save(outputDir, checkpointID, time,
+                                   collections=Model._xdmf_collections)
+
+            if rank == 0:
+                names, metadata = self._tracers_manifest()
+                CheckpointManifest(outputDir).append(
+                    checkpointID, time, "tracers", files, names, metadata)
 
         comm.Barrier()
 
+    def _tracers_manifest(self):
+        """ Names of the swarms of tracers saved (base names of the files)
+        and the metadata recording the groups of the merged swarms """
+        swarms = self.Model._tracer_swarms()
+        groups = dict((swarm.name, list(swarm.groups)) for swarm in swarms
+                      if isinstance(swarm, MergedPassiveTracers))
+        return ([swarm.name for swarm in swarms],
+                {"groups": groups} if groups else None)
+
 
 class _RestartFunction(object):
 
@@ -2562,6 +3561,7 @@ class _RestartFunction(object):
 
         self.Model = Model
         self.restartDir = restartDir
+        self.manifest = CheckpointManifest(restartDir)
 
         comm.Barrier()
 
@@ -2592,11 +3592,21 @@ class _RestartFunction(object):
         if step not in indices:
             raise ValueError("Cannot find step in specified folder")
 
-        # Get time from swarm-%.h5 file
+        # Get time from the manifest or from the swarm-%.h5 file
         if rank == 0:
-            swarm_file = os.path.join(self.restartDir, "swarm-%s.h5" % step)
-            with h5py.File(swarm_file, "r") as h5f:
-                Model._ndtime = nd(u.Quantity(h5f.attrs.get("time")))
+            container = self.get_container(step)
+            entry = self.manifest.entry(step)
+            if entry:
+                time = entry["time"]
+            elif container:
+                with h5py.File(container, "r") as h5f:
+                    time = h5f["swarm"].attrs.get("time")
+            else:
+                swarm_file = os.path.join(self.restartDir,
+                                          "swarm-%s.h5" % step)
+                with h5py.File(swarm_file, "r") as h5f:
+                    time = h5f.attrs.get("time")
+            Model._ndtime = nd(u.Quantity(time))
         else:
             Model._ndtime = None
 
@@ -2637,22 +3647,59 @@ class _RestartFunction(object):
         return
 
     def find_available_steps(self):
+        """ Return the sorted list of the steps the Model can be
+        restarted from
 
-        # Look for step with swarm available
-        indices = [int(os.path.splitext(filename)[0].split("-")[-1])
-                   for filename in os.listdir(self.restartDir) if "-" in
-                   filename]
-        indices.sort()
-        return indices
+        The steps are read from the checkpoint manifest when it exists
+        (only the steps for which all the restart variables were saved
+        are returned). Otherwise the restart directory is scanned.
+        The lookup is done on process 0 only.
+        """
+        Model = self.Model
+
+        if rank == 0:
+            if self.manifest.exists():
+                required = ["mesh", "swarm"] + list(Model.restart_variables)
+                required += [tracer.name
+                             for tracer in Model._tracer_swarms()]
+                indices = self.manifest.steps(required)
+            else:
+                # Look for step with swarm available
+                indices = [int(os.path.splitext(filename)[0].split("-")[-1])
+                           for filename in os.listdir(self.restartDir)
+                           if "-" in filename]
+                indices.sort()
+        else:
+            indices = None
+
+        return comm.bcast(indices, root=0)
+
+    def get_container(self, step):
+        """ Return the path to the single file checkpoint of step
+        or None if the checkpoint uses one file per field """
+        path = os.path.join(self.restartDir, "checkpoint-%s.h5" % step)
+        if os.path.exists(path):
+            return path
+        return None
+
+    def get_mesh_file(self, step):
+        """ Return the path to the mesh file of step (one file per
+        field layout) """
+        if self.Model._advector:
+            return os.path.join(self.restartDir, 'mesh-%s.h5' % step)
+        return os.path.join(self.restartDir, "mesh.h5")
 
     def reload_mesh(self, step):
 
         Model = self.Model
+        container = self.get_container(step)
 
-        if Model._advector:
-            Model.mesh.load(os.path.join(self.restartDir, 'mesh-%s.h5' % step))
+        # The mesh and the mesh variables are interpolated if the
+        # checkpoint was saved with a different resolution.
+        if container:
+            Model.mesh.load(container, group="mesh", interpolate=True)
         else:
-            Model.mesh.load(os.path.join(self.restartDir, "mesh.h5"))
+            Model.mesh.load(self.get_mesh_file(step), interpolate=True)
 
         if rank == 0:
             now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -2663,7 +3710,12 @@ class _RestartFunction(object):
 
         Model = self.Model
         Model.swarm = Swarm(mesh=Model.mesh, particleEscape=True)
-        Model.swarm.load(os.path.join(self.restartDir, 'swarm-%s.h5' % step))
+        container = self.get_container(step)
+        if container:
+            Model.swarm.load(container, group="swarm")
+        else:
+            Model.swarm.load(os.path.join(self.restartDir,
+                                          'swarm-%s.h5' % step))
 
         if rank == 0:
             now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -2674,10 +3726,26 @@ class _RestartFunction(object):
 
         Model = self.Model
 
+        container = self.get_container(step)
+
         for field in Model.restart_variables:
             obj = getattr(Model, field)
-            path = os.path.join(self.restartDir, field + "-%s.h5" % step)
-            obj.load(str(path))
+            if container:
+                if field in Model.mesh_variables.keys():
+                    group = "fields/" + field
+                else:
+                    group = "swarm_variables/" + field
+                if field in Model.mesh_variables.keys():
+                    obj.load(container, group=group, interpolate=True)
+                else:
+                    obj.load(container, group=group)
+            else:
+                path = os.path.join(self.restartDir, field + "-%s.h5" % step)
+                if field in Model.mesh_variables.keys():
+                    obj.load(str(path), interpolate=True,
+                             meshFilename=self.get_mesh_file(step))
+                else:
+                    obj.load(str(path))
             if rank == 0:
                 now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 print("{0} loaded".format(field) + '(' + now + ')')
@@ -2687,28 +3755,92 @@ class _RestartFunction(object):
 
         Model = self.Model
 
-        for key, tracer in Model.passive_tracers.items():
+        container = self.get_container(step)
+
+        for tracer in Model._tracer_swarms():
             fname = tracer.name + '-%s.h5' % step
             fpath = os.path.join(self.restartDir, fname)
+            group = "/"
+            paths = dict((name, os.path.join(
+                self.restartDir, tracer.name + '_' + name + '-%s.h5' % step))
+                for name, _ in tracer._index_variables())
+            igroups = dict((name, "/") for name in paths)
+            if container:
+                fpath = container
+                group = "tracers/%s/swarm" % tracer.name
+                paths = dict((name, container) for name in paths)
+                igroups = dict((name, "tracers/%s/%s" % (tracer.name, name))
+                               for name in paths)
 
             with h5py.File(fpath, "r", driver="mpio", comm=comm) as h5f:
 
-                vertices = h5f["data"].value * u.Quantity(h5f.attrs["units"])
+                h5g = h5f[group]
+                vertices = h5g["data"][()] * u.Quantity(h5g.attrs["units"])
                 vertices = [vertices[:, dim] for dim in range(Model.mesh.dim)]
-                obj = PassiveTracers(Model.mesh,
-                                     Model.velocityField,
-                                     tracer.name,
-                                     zOnly=tracer.zOnly,
-                                     particleEscape=tracer.particleEscape)
-                obj.add_particles_with_coordinates(vertices)
 
-            attr_name = tracer.name.lower() + "_tracers"
-            setattr(Model, attr_name, obj)
-            Model.passive_tracers[key] = obj
+            # Keep the identity of the tracers (and their group)
+            indices = dict()
+            saved_groups = None
+            for name, path in paths.items():
+                if os.path.exists(path):
+                    with h5py.File(path, "r", driver="mpio",
+                                   comm=comm) as h5f:
+                        h5g = h5f[igroups[name]]
+                        indices[name] = h5g["data"][()].ravel()
+                        if name == "group_id" and "groups" in h5g.attrs:
+                            saved_groups = [
+                                val.decode("utf-8")
+                                if isinstance(val, bytes) else str(val)
+                                for val in h5g.attrs["groups"]]
+
+            if isinstance(tracer, MergedPassiveTracers):
+                obj = MergedPassiveTracers(
+                    Model.mesh, Model.velocityField, tracer.name,
+                    zOnly=tracer.zOnly,
+                    particleEscape=tracer.particleEscape,
+                    verticalVelocityField=Model._vertical_velocity()
+                    if tracer.zOnly else None)
+                for name in tracer.groups:
+                    view = obj.add_group(name)
+                    setattr(Model, name.lower() + "_tracers", view)
+                    Model.passive_tracers[name] = view
+                Model._merged_tracers[(tracer.particleEscape,
+                                       tracer.zOnly)] = obj
+                if saved_groups and "group_id" in indices:
+                    # Match the groups by name, drop the groups which
+                    # are not defined anymore
+                    lookup = np.array([obj.groups[name].index
+                                       if name in obj.groups else -1
+                                       for name in saved_groups])
+                    group_ids = lookup[indices["group_id"]]
+                    keep = group_ids >= 0
+                    vertices = [val[keep] for val in vertices]
+                    indices = dict((name, val[keep])
+                                   for name, val in indices.items())
+                    indices["group_id"] = group_ids[keep]
+                obj.add_particles_with_coordinates(
+                    vertices, global_indices=indices.get("global_index"),
+                    group=indices.get("group_id", 0))
+                names = list(tracer.groups)
+            else:
+                obj = PassiveTracers(
+                    Model.mesh, Model.velocityField, tracer.name,
+                    zOnly=tracer.zOnly,
+                    particleEscape=tracer.particleEscape,
+                    verticalVelocityField=Model._vertical_velocity()
+                    if tracer.zOnly else None)
+                obj.add_particles_with_coordinates(
+                    vertices, global_indices=indices.get("global_index"))
+
+                attr_name = tracer.name.lower() + "_tracers"
+                setattr(Model, attr_name, obj)
+                Model.passive_tracers[tracer.name] = obj
+                names = [tracer.name]
 
             if rank == 0:
                 now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                print("{0} loaded".format(tracer.name) + '(' + now  + ')')
+                for name in names:
+                    print("{0} loaded".format(name) + '(' + now  + ')')
                 sys.stdout.flush()
 
     def restart_badlands(self, step):
@@ -2765,6 +3897,20 @@ class _RestartFunction(object):
             sys.stdout.flush()
 
 
+def _set_system_fn(system, name, value):
+    """ Set the function name on an Underworld system in place.
+
+    Returns False if the system (or the system it wraps) does not
+    provide a setter for name.
+    """
+    for obj in (system, getattr(system, "_system", None)):
+        prop = getattr(type(obj), name, None)
+        if isinstance(prop, property) and prop.fset:
+            setattr(obj, name, value)
+            return True
+    return False
+
+
 def _get_output_units(*args):
     from pint import UndefinedUnitError
     for arg in args:
@@ -0,0 +1,166 @@
+from __future__ import print_function,  absolute_import
+import warnings
+import numpy as np
+from mpi4py import MPI as _MPI
+
+comm = _MPI.COMM_WORLD
+rank = comm.rank
+size = comm.size
+
+
+def _local_data(field):
+    """ Return the part of the field data owned by the local process """
+    return field.data[:field.mesh.nodesLocal]
+
+
+def _global_norm(array):
+    local = np.array([np.sum(array**2)])
+    glob = np.zeros(1)
+    comm.Allreduce(local, glob, op=_MPI.SUM)
+    return np.sqrt(glob[0])
+
+
+class AndersonMixing(object):
+    """ Anderson acceleration of a fixed point (Picard) iteration
+
+    Given the iterate x_k and the result of the Picard update g(x_k),
+    the next iterate is a combination of the last depth updates that
+    minimises the norm of the residual f = g(x) - x.
+    """
+
+    def __init__(self, fields, depth=5, damping=1.0):
+        """
+        Parameters
+        ----------
+
+            fields : list of MeshVariables forming the iterate.
+            depth : Number of previous iterates used in the mixing.
+            damping : Relaxation parameter (1.0 means no damping).
+        """
+        self.fields = fields
+        self.depth = depth
+        self.damping = damping
+        self.reset()
+
+    def reset(self):
+        self._previous_f = None
+        self._previous_g = None
+        self._dF = list()
+        self._dG = list()
+
+    def get_iterate(self):
+        """ Return the current iterate as a flat array """
+        return np.concatenate([_local_data(field).ravel()
+                               for field in self.fields])
+
+    def set_iterate(self, x):
+        """ Copy the flat array x into the fields """
+        start = 0
+        for field in self.fields:
+            data = _local_data(field)
+            data[...] = x[start:start + data.size].reshape(data.shape)
+            start += data.size
+            field.syncronise()
+
+    def update(self, x, g):
+        """ Return the next iterate
+
+        Parameters
+        ----------
+
+            x : iterate before the Picard update
+            g : iterate after the Picard update
+        """
+        f = g - x
+
+        if self._previous_f is not None:
+            self._dF.append(f - self._previous_f)
+            self._dG.append(g - self._previous_g)
+            if len(self._dF) > self.depth:
+                self._dF.pop(0)
+                self._dG.pop(0)
+
+        self._previous_f = f
+        self._previous_g = g
+
+        if not self._dF:
+            return x + self.damping * f
+
+        dF = np.array(self._dF).T
+        dG = np.array(self._dG).T
+
+        # Normal equations of the least square problem, assembled
+        # over all the processes.
+        local = np.zeros((dF.shape[1], dF.shape[1] + 1))
+        local[:, :-1] = np.dot(dF.T, dF)
+        local[:, -1] = np.dot(dF.T, f)
+        glob = np.zeros_like(local)
+        comm.Allreduce(local, glob, op=_MPI.SUM)
+
+        A, b = glob[:, :-1], glob[:, -1]
+        A += 1e-12 * np.trace(A) * np.eye(A.shape[0])
+        gamma = np.linalg.lstsq(A, b, rcond=None)[0]
+
+        new = g - np.dot(dG, gamma)
+        if self.damping != 1.0:
+            new -= (1.0 - self.damping) * (f - np.dot(dF, gamma))
+        return new
+
+
+class EisenstatWalker(object):
+    """ Eisenstat-Walker forcing term for the inner (linear) solves
+
+    The relative tolerance of the linear Stokes solve is loosened
+    when the non-linear residual is large and tightened as the
+    non-linear iteration converges (Eisenstat and Walker, 1996,
+    choice 2).
+    """
+
+    def __init__(self, solver, eta_min=1e-6, eta_max=1e-1,
+                 gamma=0.9, alpha=2.0):
+        self.solver = solver
+        self.eta_min = eta_min
+        self.eta_max = eta_max
+        self.gamma = gamma
+        self.alpha = alpha
+        self.eta = eta_max
+        self._previous_residual = None
+        self._saved = None
+
+    @property
+    def _options(self):
+        return self.solver.options.scr
+
+    def start(self):
+        """ Save the user tolerance and apply the initial forcing term """
+        try:
+            self._saved = self._options.ksp_rtol
+        except AttributeError:
+            warnings.warn("""Can not set the linear solver tolerance,
+                          the Eisenstat-Walker schedule is disabled""")
+            self._saved = None
+            return
+        self.eta = self.eta_max
+        self._previous_residual = None
+        self._options.ksp_rtol = self.eta
+
+    def update(self, residual):
+        """ Update the forcing term from the non-linear residual """
+        if self._saved is None:
+            return
+
+        if self._previous_residual:
+            eta = self.gamma * (residual / self._previous_residual)**self.alpha
+            # Safeguard against a too rapid decrease of eta
+            safeguard = self.gamma * self.eta**self.alpha
+            if safeguard > 0.1:
+                eta = max(eta, safeguard)
+            self.eta = min(max(eta, self.eta_min), self.eta_max)
+
+        self._previous_residual = residual
+        self._options.ksp_rtol = self.eta
+
+    def restore(self):
+        """ Restore the user tolerance """
+        if self._saved is not None:
+            self._options.ksp_rtol = self._saved
@@ -0,0 +1,39 @@
+from __future__ import print_function,  absolute_import
+import underworld.function as fn
+
+_missing = object()
+
+# Number of changes of the parameters since the start
+_changes = [0]
+
+
+def changes():
+    """ Number of changes of the parameters (see Parameters) """
+    return _changes[0]
+
+
+def changed():
+    """ Count a change of the parameters """
+    _changes[0] += 1
+
+
+class Parameters(object):
+    """ Base class of the objects holding the parameters the Model
+    function graphs are built from (materials, rheologies, densities...)
+
+    Setting one of the attributes listed in _parameters (all the
+    attributes if None) to a new value counts as a change, unless the
+    value is an Underworld function: the fields are set by the Model
+    itself when it builds the graphs. The Model rebuilds its graphs
+    when the number of changes has moved (see Model._cached_fn).
+    """
+
+    _parameters = None
+
+    def __setattr__(self, name, value):
+        previous = self.__dict__.get(name, _missing)
+        super(Parameters, self).__setattr__(name, value)
+        if previous is value or isinstance(value, fn.Function):
+            return
+        if self._parameters is None or name in self._parameters:
+            changed()
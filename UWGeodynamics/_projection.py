@@ -0,0 +1,103 @@
+from __future__ import print_function,  absolute_import
+from collections import OrderedDict
+import underworld as uw
+import underworld.libUnderworld as libUnderworld
+
+
+def _assemble(projector):
+    """ Assemble the force vector of a projector onto its mesh variable """
+    fvector = projector._fvector._cself
+    libUnderworld.StgFEM.ForceVector_Zero(fvector)
+    libUnderworld.StgFEM.ForceVector_GlobalAssembly_General(fvector)
+    libUnderworld.StgFEM.SolutionVector_UpdateSolutionOntoNodes(fvector)
+
+
+class BatchedProjector(object):
+    """ Weighted average projection of several functions in one pass
+
+    A weighted average projection (MeshVariable_Projection with type=0)
+    computes u_a = int(F N_a) / int(N_a). When each variable has its own
+    projector, the Voronoi cells of the swarm are rebuilt and int(N_a)
+    is assembled again for every variable. The batch rebuilds the
+    Voronoi cells and assembles int(N_a) once per target mesh, then
+    assembles int(F N_a) for each of the variables.
+
+    Constructor must be called collectively by all processes.
+    """
+
+    def __init__(self, mesh, voronoi_swarm=None):
+        """
+        Parameters
+        ----------
+
+            mesh : The FeMesh the integration is done over.
+            voronoi_swarm : Optional. Swarm used for the Voronoi
+                            integration. If None, Gauss integration is
+                            used.
+        """
+        self.mesh = mesh
+        self.swarm = voronoi_swarm
+        self.projectors = OrderedDict()
+        self._weights = OrderedDict()
+
+    def add(self, name, meshVariable, fn):
+        """ Add the projection of fn onto meshVariable to the batch
+
+        Parameters
+        ----------
+
+            name : name of the projection in the batch.
+            meshVariable : MeshVariable defined on the mesh or
+                           its subMesh.
+            fn : Function to project.
+
+        Returns the MeshVariable_Projection object. Its solve method
+        can still be used to project the variable on its own.
+        """
+        if meshVariable.mesh not in (self.mesh,
+                                     getattr(self.mesh, "subMesh", None)):
+            raise ValueError("""{0} must be defined on the mesh of
+                             the batch or on its subMesh""".format(name))
+
+        projector = uw.utils.MeshVariable_Projection(
+            meshVariable, fn, voronoi_swarm=self.swarm, type=0)
+        self.projectors[name] = projector
+
+        key = id(meshVariable.mesh)
+        if key not in self._weights:
+            weights = uw.mesh.MeshVariable(meshVariable.mesh, nodeDofCount=1)
+            self._weights[key] = uw.utils.MeshVariable_Projection(
+                weights, 1.0, voronoi_swarm=self.swarm, type=0)
+        return projector
+
+    def update_weights(self):
+        """ Update the integration points and assemble int(N_a) """
+        if self.swarm:
+            self.swarm._voronoi_swarm.repopulate()
+        for projector in self._weights.values():
+            _assemble(projector)
+
+    def solve(self, names=None, update_weights=True):
+        """ Project the functions onto the mesh variables
+
+        Parameters
+        ----------
+
+            names : list of projections to solve, default to all the
+                    projections in the batch.
+            update_weights : If False, the weights from the previous
+                             call are used. Only valid if neither the
+                             mesh nor the swarm have changed since.
+        """
+        if names is None:
+            names = list(self.projectors.keys())
+
+        if update_weights:
+            self.update_weights()
+
+        for name in names:
+            projector = self.projectors[name]
+            variable = projector._meshVariable
+            weights = self._weights[id(variable.mesh)]._meshVariable
+            _assemble(projector)
+            variable.data[:] = variable.data[:] / weights.data[:]
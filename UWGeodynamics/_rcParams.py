@@ -15,6 +15,12 @@ rcParams =  {
     "initial.nonlinear.max.iterations": [500, validate_int],
     "nonlinear.min.iterations": [2, validate_int],
     "nonlinear.max.iterations": [500, validate_int],
+    "nonlinear.acceleration": ["none", validate_nonlinear_acceleration],
+    "nonlinear.anderson.depth": [5, validate_int],
+    "nonlinear.anderson.damping": [1.0, validate_float],
+    "nonlinear.eisenstat.walker": [False, validate_bool],
+    "nonlinear.linear.min.tolerance": [1e-6, validate_float],
+    "nonlinear.linear.max.tolerance": [1e-1, validate_float],
 
     "default.outputs" : [["temperature",
                           "pressureField",
@@ -24,11 +30,17 @@ rcParams =  {
                           "projTimeField",
                           "projMaterialField",
                           "projViscosityField",
-                          "projStressField",
                           "projMeltField",
                           "projPlasticStrain",
                           "projDensityField"], validate_stringlist],
 
+    "checkpoint.async": [False, validate_bool],
+    "checkpoint.layout": ["files", validate_checkpoint_layout],
+    "checkpoint.incremental": [False, validate_bool],
+    "checkpoint.xdmf.collection": [False, validate_bool],
+
+    "tracers.merged": [False, validate_bool],
+
     "swarm.particles.per.cell.2D": [40, validate_int],
     "swarm.particles.per.cell.3D": [120, validate_int],
 
@@ -52,6 +64,9 @@ rcParams =  {
     "projDensityField.SIunits" : [u.kilogram / u.metre**3, validate_quantity],
     "projTimeField.SIunits" : [u.megayears, validate_quantity],
 
+    "timers": [False, validate_bool],
+    "timers.filename": ["timers.json", validate_path],
+
     "shear.heating": [False, validate_bool],
     "surface.pressure.normalization": [True, validate_bool],
     "pressure.smoothing": [True, validate_bool],
@@ -60,3 +75,26 @@ rcParams =  {
     "averaging.method": ["arithmetic", validate_averaging]
 }
 
+# Output precision and compression policy (applied at write time).
+# Restart variables are always saved without loss of precision.
+for _field in ["mesh",
+               "swarm",
+               "temperature",
+               "pressureField",
+               "strainRateField",
+               "velocityField",
+               "projStressField",
+               "projStressTensor",
+               "projTimeField",
+               "projMaterialField",
+               "projViscosityField",
+               "projMeltField",
+               "projPlasticStrain",
+               "projDensityField",
+               "materialField",
+               "plasticStrain",
+               "timeField",
+               "meltField"]:
+    rcParams["output.precision." + _field] = [None, validate_precision]
+    rcParams["output.compression." + _field] = [None, validate_compression]
+
@@ -9,6 +9,7 @@ from UWGeodynamics import UnitRegistry as u
 from UWGeodynamics import non_dimensionalise as nd
 from copy import copy
 from collections import OrderedDict
+from ._parameters import Parameters
 
 ABC = abc.ABCMeta('ABC', (object,), {})
 
@@ -125,7 +126,7 @@ class Stress_limiter(Limiter):
         super(Stress_limiter, self).__init__(stress, max_value=max_stress)
 
 
-class Rheology(ABC):
+class Rheology(Parameters, ABC):
     """Rheology Base Class"""
 
     def __init__(self, pressureField=None, strainRateInvariantField=None,
@@ -150,7 +151,7 @@ class Rheology(ABC):
         pass
 
 
-class DruckerPrager(object):
+class DruckerPrager(Parameters):
     """The Drucker Prager yield criterion class.
 
     The yield strength
@@ -0,0 +1,182 @@
+from __future__ import print_function,  absolute_import
+import numpy as np
+import underworld.function as fn
+
+
+class SwarmUpdatePipeline(object):
+    """ Evaluate the functions of several swarm updates in one pass
+
+    Each stage registers a function and an update called with the
+    values of the function on the particles. The functions of the
+    stages of a pass are joined into a single vector function, which
+    is evaluated in one traversal of the swarm, and the updates then
+    work in place on views of the array returned, in the order the
+    stages were added.
+
+    The values of a pass are evaluated before any update is applied.
+    A stage which reads a swarm variable written by a previous stage of
+    the pass starts a new pass.
+
+    Underworld builds vector functions as sums of constant vectors
+    times scalars, the cost per particle grows with the square of the
+    number of columns. Several masks can be packed in a single column
+    (see bitmask) to keep the vector short.
+
+    Example
+    -------
+
+    >>> pipeline = SwarmUpdatePipeline(Model.swarm)
+    >>> def increment(values):
+    ...     values *= dt
+    ...     Model.plasticStrain.data[...] += values
+    >>> pipeline.add("yielding", isYieldingFn, increment,
+    ...              reads=["plasticStrain"], writes=["plasticStrain"])
+    >>> pipeline.run()
+    """
+
+    def __init__(self, swarm):
+        self.swarm = swarm
+        self._stages = []
+        self._joined = dict()
+
+    def add(self, name, function, update, count=1, reads=(), writes=()):
+        """ Add a stage to the pipeline
+
+        Parameters
+        ----------
+
+            name : name of the stage
+            function : Underworld function evaluated on the swarm, a
+                       list of scalar functions filling one column each
+                       or None for a stage with no function.
+            update : callable, called with the (nParticles, count) array
+                     of the values of the function (no argument if
+                     function is None). The array can be modified in place.
+            count : number of components of the function.
+            reads : names of the swarm variables the function depends on.
+            writes : names of the swarm variables modified by update.
+        """
+        if isinstance(function, (list, tuple)):
+            function = [fn.Function.convert(item) for item in function]
+            count = len(function)
+        elif function is not None:
+            function = fn.Function.convert(function)
+        self._stages.append((name, function, update, count,
+                             set(reads), set(writes)))
+
+    @staticmethod
+    def _passes(stages):
+        """ Split the stages into passes """
+        passes = [[]]
+        written = set()
+        for stage in stages:
+            if stage[4] & written:
+                passes.append([])
+                written = set()
+            passes[-1].append(stage)
+            written |= stage[5]
+        return [stages for stages in passes if stages]
+
+    @staticmethod
+    def bitmask(masks):
+        """ Scalar functions packing the masks (functions returning
+        1. or 0.)
+
+        Bit i of the values of the functions is set where masks[i] is 1.
+        Each function packs up to 52 masks (the bits exactly represented
+        by a double); use unpack to recover the masks. Each mask adds
+        one scalar term.
+        """
+        functions = []
+        for first in range(0, len(masks), 52):
+            packed = None
+            for bit, mask in enumerate(masks[first:first + 52]):
+                term = float(2**bit) * fn.Function.convert(mask)
+                packed = term if packed is None else packed + term
+            functions.append(packed)
+        return functions
+
+    @staticmethod
+    def unpack(values, count):
+        """ Boolean (nParticles, count) array of the masks packed
+        in the columns of values by bitmask """
+        values = np.asarray(values).reshape((values.shape[0], -1))
+        masks = np.zeros((values.shape[0], count), dtype=bool)
+        for comp in range(count):
+            packed = values[:, comp // 52].astype(np.int64)
+            masks[:, comp] = (packed >> (comp % 52)) & 1
+        return masks
+
+    @staticmethod
+    def _components(stage):
+        """ Scalar functions of the columns of a stage """
+        function, count = stage[1], stage[3]
+        if isinstance(function, list):
+            return function
+        if count == 1:
+            return [function]
+        return [function[comp] for comp in range(count)]
+
+    def _join(self, stages, joined):
+        """ Vector function of the columns of the stages
+
+        The functions joined in the previous run are reused if the
+        stages have the same functions. """
+        functions = []
+        for stage in stages:
+            if isinstance(stage[1], list):
+                functions += stage[1]
+            elif stage[1] is not None:
+                functions.append(stage[1])
+        functions = tuple(functions)
+        if not functions:
+            return None
+        key = tuple(id(function) for function in functions)
+        if key in self._joined:
+            joined[key] = self._joined[key]
+            return joined[key][1]
+        components = [component for stage in stages
+                      if stage[1] is not None
+                      for component in self._components(stage)]
+        if len(components) == 1:
+            function = components[0]
+        else:
+            function = fn.Function.convert(components)
+        # The functions are kept so that their ids are not reused
+        joined[key] = (functions, function)
+        return function
+
+    def _evaluate(self, stages, joined):
+        """ Evaluate the functions of the stages in a single traversal
+        of the swarm. Returns the values and the columns of each stage """
+        columns = []
+        ncols = 0
+        for stage in stages:
+            if stage[1] is None:
+                columns.append(None)
+                continue
+            columns.append(slice(ncols, ncols + stage[3]))
+            ncols += stage[3]
+        function = self._join(stages, joined)
+        if function is None:
+            return None, columns
+        values = function.evaluate(self.swarm)
+        return values.reshape((values.shape[0], ncols)), columns
+
+    def run(self):
+        """ Evaluate the stages and apply the updates, then clear
+        the pipeline """
+        passes, self._stages = self._passes(self._stages), []
+        joined = dict()
+        for stages in passes:
+            values, columns = self._evaluate(stages, joined)
+            for stage, column in zip(stages, columns):
+                update = stage[2]
+                if column is None:
+                    update()
+                else:
+                    update(values[:, column])
+        self._joined = joined
+
+    def __len__(self):
+        return len(self._stages)
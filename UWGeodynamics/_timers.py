@@ -0,0 +1,139 @@
+from __future__ import print_function,  absolute_import
+import sys
+import json
+from collections import OrderedDict
+import numpy as np
+from mpi4py import MPI as _MPI
+
+comm = _MPI.COMM_WORLD
+rank = comm.rank
+size = comm.size
+
+
+class _Phase(object):
+
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.timers.start(self.name)
+        return self
+
+    def __exit__(self, *args):
+        self.timers.stop()
+        return False
+
+
+class Timers(object):
+    """ Wall-clock timers for the phases of the Model run loop
+
+    The time spent in each phase is accumulated over a timestep.
+    At the end of the step, the minimum, maximum and average times
+    across processes are reduced and written as a single JSON line.
+
+    All the phases are always reported (with zero time if not
+    executed) so that the reductions match on all processes.
+    Phases can be nested, the time of a phase does not include the
+    time of the phases nested in it: the stokes phase is the time
+    spent in the linear solves, the nonlinear phase the rest of the
+    non-linear iterations (viscosity updates, callbacks, mixing) and
+    the isostasy phase the isostasy solves. The phases therefore add
+    up to the duration of the step.
+    """
+
+    phases = ("stokes", "nonlinear", "timestep", "advection", "popcontrol",
+              "thermal", "surface", "phase_changes", "isostasy", "checkpoint",
+              "other")
+
+    def __init__(self):
+        self.last = None
+        self._running = list()
+        self.reset()
+
+    def __call__(self, name):
+        """ Return a context manager timing the phase name
+
+        Example
+        -------
+
+        >>> with Model.timers("stokes"):
+        ...     Model.solve()
+
+        """
+        if name not in self.phases:
+            raise ValueError("""{0} is not a valid phase, valid phases
+                             are {1}""".format(name, self.phases))
+        return _Phase(self, name)
+
+    def add(self, name, value):
+        self._times[name] += value
+
+    def start(self, name):
+        """ Start the phase name, the enclosing phase is paused """
+        now = _MPI.Wtime()
+        if self._running:
+            parent = self._running[-1]
+            self.add(parent[0], now - parent[1])
+        self._running.append([name, now])
+
+    def stop(self):
+        """ Stop the last phase started, the enclosing phase resumes """
+        now = _MPI.Wtime()
+        name, start = self._running.pop()
+        self.add(name, now - start)
+        if self._running:
+            self._running[-1][1] = now
+
+    def reset(self):
+        self._times = OrderedDict((name, 0.) for name in self.phases)
+
+    def reduce(self):
+        """ Reduce the timers across processes
+
+        Returns an OrderedDict {phase: {"min", "max", "avg"}}
+        """
+        local = np.array(list(self._times.values()))
+        tmin = np.zeros_like(local)
+        tmax = np.zeros_like(local)
+        tsum = np.zeros_like(local)
+        comm.Allreduce(local, tmin, op=_MPI.MIN)
+        comm.Allreduce(local, tmax, op=_MPI.MAX)
+        comm.Allreduce(local, tsum, op=_MPI.SUM)
+
+        result = OrderedDict()
+        for idx, name in enumerate(self.phases):
+            result[name] = OrderedDict([("min", tmin[idx]),
+                                        ("max", tmax[idx]),
+                                        ("avg", tsum[idx] / size)])
+        return result
+
+    def report(self, filename=None, **kwargs):
+        """ Reduce the timers and write a JSON line
+
+        Parameters
+        ----------
+
+            filename : File the line is appended to. If None the line is
+                       printed on the standard output.
+            kwargs : Additional entries (step, time, ...) written
+                     with the timers.
+
+        The timers are reset after the report.
+        """
+
+        record = OrderedDict(kwargs)
+        record["nprocs"] = size
+        record["phases"] = self.reduce()
+        self.last = record
+        self.reset()
+
+        if rank == 0:
+            line = json.dumps(record)
+            if filename:
+                with open(filename, "a") as f:
+                    f.write(line + "\n")
+            else:
+                print(line)
+                sys.stdout.flush()
+        return record
@@ -0,0 +1,147 @@
+from __future__ import print_function,  absolute_import
+import abc
+import numpy as np
+from UWGeodynamics import non_dimensionalise as nd
+from mpi4py import MPI as _MPI
+
+comm = _MPI.COMM_WORLD
+rank = comm.rank
+size = comm.size
+
+ABC = abc.ABCMeta('ABC', (object,), {})
+
+
+class TimeStepController(ABC):
+    """ Base class for timestep controllers
+
+    A controller is attached to a Model (Model.timestep_controller) and
+    is called by Model.run_for after each solve. It proposes the next
+    timestep (non-dimensional) or returns None to fall back on the
+    default rule.
+    """
+
+    def __init__(self, min_dt=None, max_dt=None, cfl_limit=True):
+        """
+        Parameters
+        ----------
+
+            min_dt : Minimum timestep ([Time])
+            max_dt : Maximum timestep ([Time])
+            cfl_limit : (bool) If True, the advective (CFL) and SUPG
+                        timesteps remain upper bounds for the timestep.
+        """
+        self.min_dt = min_dt
+        self.max_dt = max_dt
+        self.cfl_limit = cfl_limit
+
+    def clip(self, dt):
+        """ Clip dt to [min_dt, max_dt] """
+        if self.min_dt is not None:
+            dt = max(dt, nd(self.min_dt))
+        if self.max_dt is not None:
+            dt = min(dt, nd(self.max_dt))
+        return dt
+
+    @abc.abstractmethod
+    def get_dt(self, Model):
+        pass
+
+    def reset(self):
+        pass
+
+
+class PIController(TimeStepController):
+    """ Proportional-Integral timestep controller
+
+    The relative change of the solution between two consecutive solves is
+    used as an error estimate and the timestep is adjusted so that
+    this change stays close to a target tolerance:
+
+        dt_new = safety * dt * (tol / err)**kI * (err_prev / err)**kP
+
+    The ratio dt_new / dt is bounded by the growth and shrink limits.
+    """
+
+    def __init__(self, tolerance=1e-2, measure="velocity", kI=0.3, kP=0.4,
+                 safety=0.9, growth=2.0, shrink=0.2, min_dt=None,
+                 max_dt=None, cfl_limit=True):
+        """
+        Parameters
+        ----------
+
+            tolerance : Target relative change of the solution per step.
+            measure : Field used to measure the change,
+                      "velocity" or "strainRate".
+            kI : Integral gain.
+            kP : Proportional gain.
+            safety : Safety factor.
+            growth : Maximum ratio between two consecutive timesteps.
+            shrink : Minimum ratio between two consecutive timesteps.
+            min_dt : Minimum timestep ([Time])
+            max_dt : Maximum timestep ([Time])
+            cfl_limit : (bool) If True, the advective (CFL) and SUPG
+                        timesteps remain upper bounds for the timestep.
+
+        Example
+        -------
+
+        >>> import UWGeodynamics as GEO
+        >>> Model = GEO.Model()
+        >>> Model.timestep_controller = GEO.PIController(tolerance=1e-2)
+
+        """
+
+        super(PIController, self).__init__(min_dt, max_dt, cfl_limit)
+
+        if measure not in ["velocity", "strainRate"]:
+            raise ValueError("""measure must be 'velocity' or 'strainRate'""")
+
+        self.tolerance = tolerance
+        self.measure = measure
+        self.kI = kI
+        self.kP = kP
+        self.safety = safety
+        self.growth = growth
+        self.shrink = shrink
+        self.reset()
+
+    def reset(self):
+        self._previous = None
+        self._previous_error = None
+        self.error = None
+
+    def _get_field(self, Model):
+        if self.measure == "velocity":
+            return Model.velocityField.data
+        return Model.strainRateField.data
+
+    def _relative_change(self, new, old):
+        local = np.array([0., 0.])
+        if new.size:
+            local[0] = np.abs(new - old).max()
+            local[1] = np.abs(new).max()
+        glob = np.zeros(2)
+        comm.Allreduce(local, glob, op=_MPI.MAX)
+        if glob[1] == 0.:
+            return 0.
+        return glob[0] / glob[1]
+
+    def get_dt(self, Model):
+        """ Return the proposed timestep or None """
+
+        field = np.copy(self._get_field(Model))
+        previous, self._previous = self._previous, field
+
+        if previous is None or previous.shape != field.shape or not Model._dt:
+            return None
+
+        error = max(self._relative_change(field, previous), 1e-12)
+        self.error = error
+
+        factor = self.safety * (self.tolerance / error)**self.kI
+        if self._previous_error:
+            factor *= (self._previous_error / error)**self.kP
+        self._previous_error = error
+
+        factor = min(max(factor, self.shrink), self.growth)
+        return self.clip(Model._dt * factor)
@@ -2,13 +2,12 @@ from __future__ import print_function,  absolute_import
 import numpy as np
 import underworld as uw
 import underworld.function as fn
-import h5py
 import os
 import operator as op
+from collections import OrderedDict
 from UWGeodynamics import non_dimensionalise as nd
 from UWGeodynamics import dimensionalise
 from UWGeodynamics import UnitRegistry as u
-from .Underworld_extended._utils import _swarmvarschema
 from .Underworld_extended import Swarm
 from scipy import spatial
 from mpi4py import MPI as _MPI
@@ -18,6 +17,16 @@ rank = comm.rank
 size = comm.size
 
 class PhaseChange(object):
+    """ Change the particles of a material for which fn() is 1 into
+    the material of index result
+
+    Subclasses can override fn(). coordinate_mask is only used when
+    fn() is not overridden.
+    """
+
+    # Optional numpy test of the particle coordinates equivalent
+    # to condition, used instead of evaluating condition on the swarm.
+    coordinate_mask = None
 
     def __init__(self, condition, result):
         self.condition = condition
@@ -32,9 +41,14 @@ class WaterFill(PhaseChange):
 
     def __init__(self, sealevel, water_material=None):
 
+        self.sealevel = sealevel
         self.condition = fn.input()[1] < nd(sealevel)
         self.result = water_material.index
 
+    def coordinate_mask(self, coords):
+        """ True for the coordinates below sea level """
+        return coords[:, 1] < nd(self.sealevel)
+
 
 class PressureSmoother(object):
 
@@ -59,7 +73,21 @@ class PressureSmoother(object):
 class PassiveTracers(Swarm):
 
     def __init__(self, mesh, velocityField, name=None,
-                 particleEscape=True, zOnly=False):
+                 particleEscape=True, zOnly=False,
+                 verticalVelocityField=None):
+        """
+        Parameters
+        ----------
+
+            verticalVelocityField : Optional, mesh variable holding the
+                                    vertical component of velocityField
+                                    (horizontal components at 0) used
+                                    to advect the tracers when zOnly is
+                                    True. It must be updated by the
+                                    caller before each integration.
+                                    Default to a variable owned by the
+                                    tracers and updated by integrate.
+        """
 
         super(PassiveTracers, self).__init__(mesh,
                                              particleEscape=particleEscape)
@@ -69,19 +97,52 @@ class PassiveTracers(Swarm):
                                        self.velocityField.fn_gradient[2])
         self.particleEscape = particleEscape
         self.zOnly = zOnly
+        self._verticalVelocityField = verticalVelocityField
+        self._updateVerticalVelocity = verticalVelocityField is None
 
         self.tracked_field = list()
 
-    def _global_indices(self):
-        indices = np.arange(self.particleLocalCount)
-        ranks = np.repeat(rank, self.particleLocalCount)
-        pairs = np.array(list(zip(ranks, indices)), dtype=[("a", np.int32),
-                                                           ("b", np.int32)])
-        # Get rank
+        # Global index (64 bits) of the tracers. It is carried by the
+        # particles when they migrate and is never recomputed.
         self.global_index = self.add_variable(dataType="long", count=1)
-        self.global_index.data[:, 0] = pairs.view(np.int64)
-
-    def add_particles_with_coordinates(self, vertices, **kwargs):
+        self._next_global_index = 0
+
+    def _global_indices(self, local, global_indices=None):
+        """ Set the global index of the particles added
+
+        Parameters
+        ----------
+
+            local : local index of each point passed to
+                    add_particles_with_coordinates (-1 if not added
+                    on this process)
+            global_indices : global index of each point, default to
+                             the position of the point after the points
+                             added previously.
+
+        The points are the same on all the processes: the index of a
+        point does not depend on the process it ends up on.
+        """
+        if global_indices is None:
+            global_indices = self._next_global_index + np.arange(len(local))
+        global_indices = np.asarray(global_indices, dtype=np.int64).ravel()
+        if len(global_indices):
+            self._next_global_index = max(self._next_global_index,
+                                          int(global_indices.max()) + 1)
+        added = local >= 0
+        self.global_index.data[local[added], 0] = global_indices[added]
+
+    def add_particles_with_coordinates(self, vertices, global_indices=None,
+                                       **kwargs):
+        """ Add tracers
+
+        Parameters
+        ----------
+
+            vertices : list of the coordinates along each axis
+            global_indices : Optional, global index of each tracer
+                             (used when reloading tracers).
+        """
 
         for dim, _ in enumerate(vertices):
             vertices[dim] = nd(vertices[dim])
@@ -94,24 +155,39 @@ class PassiveTracers(Swarm):
         vals = super(PassiveTracers,
                      self).add_particles_with_coordinates(points,
                                                           **kwargs)
+        if self.zOnly:
+            velocityField = self._vertical_velocity()
+        else:
+            velocityField = self.velocityField
         self.advector = uw.systems.SwarmAdvector(
             swarm=self,
-            velocityField=self.velocityField, order=2)
+            velocityField=velocityField, order=2)
 
-        self._global_indices()
+        self._global_indices(np.asarray(vals), global_indices)
         return vals
 
+    def _vertical_velocity(self):
+        """ Mesh variable advecting the tracers when zOnly is True
+
+        Its horizontal components are 0, the vertical component
+        is copied from velocityField before each advection (by
+        integrate, unless the variable was given to the constructor).
+        The velocityField itself is never modified.
+        """
+        if self._verticalVelocityField is None:
+            self._verticalVelocityField = uw.mesh.MeshVariable(
+                self.velocityField.mesh,
+                nodeDofCount=self.velocityField.nodeDofCount)
+            self._verticalVelocityField.data[...] = 0.
+        return self._verticalVelocityField
+
     def integrate(self, dt, **kwargs):
         """ Integrate swarm velocity in time """
-        if self.zOnly:
-            saved_velocities = np.copy(self.velocityField.data)
-            self.velocityField.data[:, :-1] = 0.
-            self.velocityField.syncronise()
-            self.advector.integrate(dt, **kwargs)
-            self.velocityField.data[...] = saved_velocities
-            self.velocityField.syncronise()
-        else:
-            self.advector.integrate(dt, **kwargs)
+        if self.zOnly and self._updateVerticalVelocity:
+            # The advector synchronises the shadow nodes
+            self._vertical_velocity().data[:, -1] = (
+                self.velocityField.data[:, -1])
+        self.advector.integrate(dt, **kwargs)
 
         # Integrate tracked field variables over time
         for field in self.tracked_field:
@@ -125,6 +201,14 @@ class PassiveTracers(Swarm):
                 else:
                     obj.data[...] += field["value"].evaluate(self) * dt
 
+    def _index_variables(self):
+        """ (name, variable) of the variables identifying the tracers """
+        return [("global_index", self.global_index)]
+
+    def _index_attrs(self):
+        """ {name: {attribute: value}} saved with the index variables """
+        return dict()
+
     def add_tracked_field(self, value, name, units, dataType, count=1,
                           overwrite=True, timeIntegration=False):
         """ Add a field to be tracked """
@@ -157,8 +241,15 @@ class PassiveTracers(Swarm):
         svar.data[...] = 0.
         setattr(self, name, svar)
 
-    def save(self, outputDir, checkpointID, time):
-        """ Save to h5 and create an xdmf file for each tracked field """
+    def save(self, outputDir, checkpointID, time, collections=None):
+        """ Save to h5 and create an xdmf file for each tracked field
+
+        collections are the XDMF collections of the run (see write_xdmf).
+        Returns the list of files written.
+        """
+
+        # Imported here as the writer needs the rcParams
+        from ._checkpoint_writer import xdmf_swarm_grid, write_xdmf
 
         # Save the swarm
         swarm_fname = self.name + '-%s.h5' % checkpointID
@@ -166,24 +257,17 @@ class PassiveTracers(Swarm):
 
         sH = super(PassiveTracers, self).save(
             swarm_fpath, units=u.kilometers, time=time)
-
-        if rank == 0:
-            filename = self.name + '-%s.xdmf' % checkpointID
-            filename = os.path.join(outputDir, filename)
-
-            # First write the XDMF header
-            string = uw.utils._xdmfheader()
-            string += uw.utils._swarmspacetimeschema(sH, swarm_fname, time)
-
         comm.Barrier()
 
         # Save global index
-        file_prefix = os.path.join(
-            outputDir, self.name + '_global_index-%s' % checkpointID)
-        handle = self.global_index.save('%s.h5' % file_prefix)
-
-        if rank == 0:
-            string += _swarmvarschema(handle, "global_index")
+        files = [swarm_fpath]
+        variables = []
+        for name, obj in self._index_variables():
+            file_prefix = os.path.join(
+                outputDir, self.name + '_' + name + '-%s' % checkpointID)
+            handle = obj.save('%s.h5' % file_prefix)
+            files.append(handle.filename)
+            variables.append((handle, name, None, None))
         comm.Barrier()
 
         # Save each tracked field
@@ -197,31 +281,198 @@ class PassiveTracers(Swarm):
             if not field["timeIntegration"]:
                 obj.data[...] = field["value"].evaluate(self)
             handle = obj.save('%s.h5' % file_prefix, units=field["units"])
+            files.append(handle.filename)
+            variables.append((handle, field["name"], None, None))
 
-            if rank == 0:
-                # Add attribute to xdmf file
-                string += _swarmvarschema(handle, field["name"])
+        # The global number of particles is known without reading back
+        # the swarm file
+        globalCount = self.particleGlobalCount
 
-        comm.Barrier()
+        filename = None
+        if rank == 0:
+            string = xdmf_swarm_grid(sH, swarm_fname, time, None,
+                                     globalCount, variables)
+            filename = write_xdmf(outputDir, self.name, checkpointID, string,
+                                  single=self.name + '-%s.xdmf' % checkpointID,
+                                  collections=collections)
+        filename = comm.bcast(filename, root=0)
+
+        files.append(filename)
+        return files
+
+
+class MergedPassiveTracers(PassiveTracers):
+    """ Several groups of passive tracers stored in a single swarm
+
+    The group of each tracer is stored in the group_id variable
+    (16 bits). The groups are advected together and saved in a single
+    set of files (group_id being saved with the global index). The
+    names of the groups are stored in the "groups" attribute of the
+    group_id file, in the order of their ids.
+
+    Each group is accessed through a PassiveTracerGroup view.
+    Tracked fields are tracked on all the groups: they are added to the
+    merged swarm, not to the views.
+    """
+
+    def __init__(self, mesh, velocityField, name="tracers",
+                 particleEscape=True, zOnly=False,
+                 verticalVelocityField=None):
+
+        super(MergedPassiveTracers, self).__init__(
+            mesh, velocityField, name=name,
+            particleEscape=particleEscape, zOnly=zOnly,
+            verticalVelocityField=verticalVelocityField)
+
+        self.group_id = self.add_variable(dataType="short", count=1)
+        self.groups = OrderedDict()
+
+    def add_group(self, name):
+        """ Add a group of tracers, returns its PassiveTracerGroup """
+        if name in self.groups:
+            raise ValueError("{0} tracers already exist".format(name))
+        group = PassiveTracerGroup(self, name, len(self.groups))
+        self.groups[name] = group
+        return group
+
+    def add_particles_with_coordinates(self, vertices, global_indices=None,
+                                       group=0, **kwargs):
+        """ Add tracers
+
+        Parameters
+        ----------
+
+            vertices : list of the coordinates along each axis
+            global_indices : Optional, global index of each tracer
+                             (used when reloading tracers).
+            group : id of the group of the tracers, or id of each
+                    tracer.
+        """
+        vals = super(MergedPassiveTracers,
+                     self).add_particles_with_coordinates(
+                         vertices, global_indices=global_indices, **kwargs)
+        local = np.asarray(vals)
+        group = np.broadcast_to(np.asarray(group, dtype=np.int16),
+                                local.shape)
+        added = local >= 0
+        self.group_id.data[local[added], 0] = group[added]
+        return vals
+
+    def _index_variables(self):
+        return (super(MergedPassiveTracers, self)._index_variables() +
+                [("group_id", self.group_id)])
 
-        # get swarm parameters - serially read from hdf5 file to get size
+    def _index_attrs(self):
+        # The names of the groups, in the order of their ids
+        return {"group_id": {"groups": [name.encode("utf-8")
+                                        for name in self.groups]}}
 
+    def save(self, outputDir, checkpointID, time, collections=None):
+        """ Save to h5 and create an xdmf file for each tracked field
+
+        Returns the list of files written.
+        """
+        files = super(MergedPassiveTracers, self).save(
+            outputDir, checkpointID, time, collections=collections)
         if rank == 0:
-            with h5py.File(name=swarm_fpath, mode="r") as h5f:
-                dset = h5f.get('data')
-                if dset is None:
-                    raise RuntimeError("Can't find 'data' in file '{}'.\n".format(swarm_fname))
-                globalCount = len(dset)
-                dim = self.mesh.dim
-
-            # Write the footer to the xmf
-            string += uw.utils._xdmffooter()
-
-            # Write the string to file - only proc 0
-            xdmfFH = open(filename, "w")
-            xdmfFH.write(string)
-            xdmfFH.close()
+            import h5py
+            path = os.path.join(
+                outputDir, self.name + '_group_id-%s.h5' % checkpointID)
+            with h5py.File(path, "a") as h5f:
+                h5f.attrs.update(self._index_attrs()["group_id"])
         comm.Barrier()
+        return files
+
+
+class _GroupData(object):
+    """ Data of the tracers of a group in a variable of the merged swarm """
+
+    def __init__(self, group, variable):
+        self.group = group
+        self.variable = variable
+
+    @property
+    def data(self):
+        """ Read-only copy of the data of the tracers of the group
+
+        Modify the data through the variable of the merged swarm. """
+        data = self.variable.data[self.group.mask]
+        data.setflags(write=False)
+        return data
+
+
+class PassiveTracerGroup(object):
+    """ View of a group of tracers stored in a MergedPassiveTracers swarm
+
+    The data properties return read-only copies restricted to the tracers
+    of the group (local to the process).
+    """
+
+    def __init__(self, tracers, name, index):
+        self.tracers = tracers
+        self.name = name
+        self.index = index
+
+    @property
+    def zOnly(self):
+        return self.tracers.zOnly
+
+    @property
+    def particleEscape(self):
+        return self.tracers.particleEscape
+
+    @property
+    def tracked_field(self):
+        return self.tracers.tracked_field
+
+    @property
+    def mask(self):
+        """ Local mask of the tracers of the group in the merged swarm """
+        return self.tracers.group_id.data[:, 0] == self.index
+
+    @property
+    def particleLocalCount(self):
+        return int(np.count_nonzero(self.mask))
+
+    @property
+    def particleGlobalCount(self):
+        return comm.allreduce(self.particleLocalCount, op=_MPI.SUM)
+
+    @property
+    def particleCoordinates(self):
+        return _GroupData(self, self.tracers.particleCoordinates)
+
+    @property
+    def data(self):
+        return self.particleCoordinates.data
+
+    @property
+    def global_index(self):
+        return _GroupData(self, self.tracers.global_index)
+
+    def add_particles_with_coordinates(self, vertices, global_indices=None,
+                                       **kwargs):
+        """ Add tracers to the group (see PassiveTracers) """
+        return self.tracers.add_particles_with_coordinates(
+            vertices, global_indices=global_indices, group=self.index,
+            **kwargs)
+
+    def add_tracked_field(self, value, name, *args, **kwargs):
+        """ Tracked fields can not be added to a group """
+        raise ValueError("""{0} would be tracked on all the groups of
+                         tracers, add it to the merged swarm instead
+                         ({1}.tracers.add_tracked_field)""".format(
+                             name, self.name))
+
+    def __getattr__(self, name):
+        tracers = self.__dict__.get("tracers")
+        if tracers is not None:
+            for field in tracers.tracked_field:
+                if field["name"] == name:
+                    return _GroupData(self, getattr(tracers, name))
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" %
+            (type(self).__name__, name))
 
 
 class Balanced_InflowOutflow(object):
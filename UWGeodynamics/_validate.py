@@ -136,5 +136,50 @@ def validate_averaging(s):
 
     return options[s]
 
+
+def validate_nonlinear_acceleration(s):
+    options = ["none", "anderson"]
+    s = str(s).lower()
+    if s not in options:
+        raise ValueError(
+            """{0} is not a valid option, valid options are {1}""".format(
+                s, options))
+    return s
+
+
+def validate_checkpoint_layout(s):
+    options = ["files", "single"]
+    if s not in options:
+        raise ValueError(
+            """{0} is not a valid option, valid options are {1}""".format(
+                s, options))
+    return s
+
+
+def validate_precision(s):
+    options = ["float32", "float64", "int8", "int16", "int32", "int64"]
+    if s is None or str(s).lower() == "none":
+        return None
+    if s not in options:
+        raise ValueError(
+            """{0} is not a valid option, valid options are {1}""".format(
+                s, options))
+    return s
+
+
+def validate_compression(s):
+    if s is None or str(s).lower() == "none":
+        return None
+    s = str(s).lower()
+    name, _, level = s.partition(":")
+    if name not in ["gzip", "lzf"]:
+        raise ValueError(
+            """{0} is not a valid compression, valid options are
+            'gzip', 'gzip:<level>' or 'lzf'""".format(s))
+    if level and (name != "gzip" or level not in [str(i) for i in range(10)]):
+        raise ValueError(
+            """{0} is not a valid compression level""".format(s))
+    return s
+
 validate_stringlist = _listify_validator(six.text_type)
 validate_stringlist.__doc__ = 'return a list'
@@ -5,6 +5,7 @@ import underworld as uw
 import underworld.function as fn
 import numpy as np
 from mpi4py import MPI
+from UWGeodynamics._projection import BatchedProjector
 
 comm = MPI.COMM_WORLD
 size = comm.Get_size()
@@ -38,11 +39,13 @@ class Lithostatic_pressure(fn.Function):
 
         self.lithostatic_field_nodes = uw.mesh.MeshVariable(self.mesh, nodeDofCount=1)
         self.lithostatic_field = uw.mesh.MeshVariable(self.mesh.subMesh, nodeDofCount=1)
-        self.Cell2Nodes = uw.utils.MeshVariable_Projection(
-            self.lithostatic_field_nodes, self.lithostatic_field, type=0)
+        # Both projections share the weights of the mesh nodes
+        self.projections = BatchedProjector(self.mesh)
+        self.Cell2Nodes = self.projections.add(
+            "pressure", self.lithostatic_field_nodes, self.lithostatic_field)
         # Create Utilities
         self.DensityVar = uw.mesh.MeshVariable(self.mesh, nodeDofCount=1)
-        self.projectorDensity = uw.utils.MeshVariable_Projection(self.DensityVar, self._densityFn, type=0 )
+        self.projectorDensity = self.projections.add("density", self.DensityVar, self._densityFn)
 
         if not self.mesh.elementType.upper() in supported_elem_mesh:
             raise ValueError("Unsupported element: {0}".format(self.mesh.elementType))
@@ -64,7 +67,7 @@ class Lithostatic_pressure(fn.Function):
 
     def _lithoPressure2D(self):
 
-        self.projectorDensity.solve()
+        self.projections.solve(["density"])
 
         # Get Dimension of the global domain
         ncol, nrow = self.mesh.elementRes
@@ -131,13 +134,13 @@ class Lithostatic_pressure(fn.Function):
         self.lithostatic_field.data[:] = local_pressure
         self.lithostatic_field.syncronise()
 
-        self.Cell2Nodes.solve()
+        self.projections.solve(["pressure"], update_weights=False)
 
         return self.lithostatic_field_nodes
 
     def _lithoPressure3D(self):
 
-        self.projectorDensity.solve()
+        self.projections.solve(["density"])
 
         # Get Dimension of the global domain
         nx, ny, nz = self.mesh.elementRes
@@ -222,6 +225,6 @@ class Lithostatic_pressure(fn.Function):
         self.lithostatic_field.data[:] = local_pressure
         self.lithostatic_field.syncronise()
 
-        self.Cell2Nodes.solve()
+        self.projections.solve(["pressure"], update_weights=False)
 
         return self.lithostatic_field_nodes
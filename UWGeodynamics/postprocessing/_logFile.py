@@ -1,68 +1,261 @@
+import re
+import time as _time
+import numpy as np
+
+# Lines of interest in a non linear block: (key, pattern, token, type)
+_KEYS = [
+    ("Pressure Solve times", "pressure solve", 3, float),
+    ("Final V Solve times", "final v solve", 4, float),
+    ("Total BSSCR times", "total bsscr linear solve time", 5, float),
+    ("Residuals", ("converged", "residual", "tolerance"), 5,
+     lambda val: float(val[:-1])),
+    ("Iterations", "non linear solver - iteration", -1, int),
+    ("Solution Time", "solution time", 5, float)]
+
+# A single search rejects the lines which are not of interest
+_CANDIDATE = re.compile(
+    "pressure solve|final v solve|total bsscr linear solve time|"
+    "residual|non linear solver - iteration|solution time",
+    re.IGNORECASE)
+
+
+def _empty_data():
+    return dict((key, []) for key, _, _, _ in _KEYS)
+
+
+def _parse_line(line, data):
+    """ Add the values found in a line of a non linear block to data """
+    if not _CANDIDATE.search(line):
+        return
+    lower = line.lower()
+    tokens = None
+    for key, patterns, pos, func in _KEYS:
+        if isinstance(patterns, tuple):
+            found = all(pattern in lower for pattern in patterns)
+        else:
+            found = patterns in lower
+        if found:
+            tokens = tokens if tokens else line.split()
+            data[key].append(func(tokens[pos]))
+
+
+class LogParser(object):
+    """ Single pass parser of the non linear blocks of a log
+
+    Lines are fed one at a time, a block is returned as soon as
+    it is complete (its "Converged" line has been read).
+    """
+
+    def __init__(self):
+        self.data = None
+        self.lines = None
+
+    def feed(self, line):
+        """ Parse a line, returns the block it completes
+        (NonLinearBlock) or None """
+        if self.data is None:
+            if "Non linear solver" not in line:
+                return None
+            self.data = _empty_data()
+            self.lines = []
+        _parse_line(line, self.data)
+        self.lines.append(line)
+        if "Converged" in line:
+            block = self.pending()
+            self.data, self.lines = None, None
+            return block
+        return None
+
+    def pending(self):
+        """ Block being parsed (None if outside a block) """
+        if self.data is None:
+            return None
+        return NonLinearBlock("".join(self.lines), self.data)
+
+    def copy(self):
+        """ Copy of the parser, in the same state """
+        parser = LogParser()
+        if self.data is not None:
+            parser.data = dict((key, list(val))
+                               for key, val in self.data.items())
+            parser.lines = list(self.lines)
+        return parser
+
+
+def iter_blocks(filename, follow=False, interval=1.0):
+    """ Yield the data of the non linear blocks of a log file
+
+    Parameters
+    ----------
+
+        filename : path of the log file
+        follow : if True, wait for new lines once the end of the file
+                 is reached (tail -f), else the last block is yielded
+                 even if it has not converged.
+        interval : time (s) between two reads when following the file.
+    """
+    parser = LogParser()
+    with open(filename, "r") as f:
+        partial = ""
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    break
+                _time.sleep(interval)
+                continue
+            if not line.endswith("\n") and follow:
+                # The line is still being written
+                partial += line
+                continue
+            block = parser.feed(partial + line)
+            partial = ""
+            if block is not None:
+                yield block.data
+    block = parser.pending()
+    if block is not None:
+        yield block.data
 
 
 class NonLinearBlock(object):
-    def __init__(self, string):
-        self.string = string
-        self.data = dict()
-        self.data["Pressure Solve times"] = self.get_vals(["Pressure Solve"], 3)
-        self.data["Final V Solve times"] = self.get_vals(["Final V Solve"], 4)
-        self.data["Total BSSCR times"] = self.get_vals(["Total BSSCR Linear solve time"], 5)
-        self.data["Residuals"] = self.get_vals(["converged", "Residual", "Tolerance"], 5, func=str)
-        self.data["Residuals"] = [float(val[:-1]) for val in self.data["Residuals"]]
-        self.data["Iterations"] = self.get_vals(["Non linear solver - iteration"], -1, func=int)
-        self.data["Solution Time"] = self.get_vals(["solution time"], 5)
+    def __init__(self, string=None, data=None):
+        self.string = string if string else ""
+        if data is None:
+            data = _empty_data()
+            for line in self.string.splitlines():
+                _parse_line(line, data)
+        self.data = data
 
     def get_vals(self, FINDSTRING, pos, func=float):
         f = self.string.splitlines()
-        vals = [func(line.split()[pos]) for line in f if all([F.lower() in line.lower() for F in FINDSTRING])]
+        FINDSTRING = [F.lower() for F in FINDSTRING]
+        vals = []
+        for line in f:
+            lower = line.lower()
+            if all([F in lower for F in FINDSTRING]):
+                vals.append(func(line.split()[pos]))
         return vals
 
 
 class LogFile(object):
+    """ Solver statistics of a log file
+
+    The file is parsed in a single pass. update() parses the lines
+    added since the last call, which allows to monitor a running model.
+    """
+
     def __init__(self, filename):
         self.filename = filename
-        self.nonLinear_blocks = self.get_nonLinear_blocks()
-        self.pressure_solve_times = list()
-        for obj in self.nonLinear_blocks:
-            self.pressure_solve_times += obj.data["Pressure Solve times"]
-        self.finalV_solve_times = list()
-        for obj in self.nonLinear_blocks:
-            self.finalV_solve_times += obj.data["Final V Solve times"]
-        self.total_BSSCR_times = list()
-        for obj in self.nonLinear_blocks:
-            self.total_BSSCR_times += obj.data["Total BSSCR times"]
-        self.residuals = list()
-        for obj in self.nonLinear_blocks:
-            self.residuals += obj.data["Residuals"]
-        self.iterations = list()
-        for obj in self.nonLinear_blocks:
-            self.iterations.append(obj.data["Iterations"][-1])
-        self.solution_times = list()
-        for obj in self.nonLinear_blocks:
-            self.solution_times += obj.data["Solution Time"]
+        self._parser = LogParser()
+        self._offset = 0
+        self._tail = ""
+        self.get_nonLinear_blocks()
 
-    def get_nonLinear_blocks(self):
-        non_linear_blocks = list()
+    def update(self):
+        """ Parse the lines written since the last call
+
+        Returns the list of the new blocks completed. """
+        new = []
         with open(self.filename, "r") as f:
-            block = ""
-            inBlock = False
-            step = 0
-            for line in f:
-                if "Non linear solver" in line:
-                    inBlock = True
-                    step += 1
-                if inBlock:
-                    if "Converged" not in line:
-                        block += line
-                    else:
-                        block += line
-                        inBlock = False
-                        block = NonLinearBlock(block)
-                        non_linear_blocks.append(block)
-                        block = ""
-            # Process last potentially non-converged block
-            if block:
-                block = NonLinearBlock(block)
-                non_linear_blocks.append(block)
-        self.nonLinear_blocks = non_linear_blocks
+            f.seek(self._offset)
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    # Incomplete line (or end of the file), it is
+                    # read again at the next update
+                    self._tail = line
+                    break
+                self._offset = f.tell()
+                block = self._parser.feed(line)
+                if block is not None:
+                    new.append(block)
+        self._blocks += new
+        return new
+
+    def get_nonLinear_blocks(self):
+        self._blocks = []
+        self._parser = LogParser()
+        self._offset = 0
+        self._tail = ""
+        self.update()
         return self.nonLinear_blocks
+
+    @property
+    def nonLinear_blocks(self):
+        """ Blocks parsed, including the last one if it has
+        not converged yet
+
+        The last line of the file is parsed even if it does not end
+        with a newline. """
+        blocks = list(self._blocks)
+        parser = self._parser
+        if self._tail:
+            parser = parser.copy()
+            block = parser.feed(self._tail)
+            if block is not None:
+                blocks.append(block)
+        pending = parser.pending()
+        if pending is not None:
+            blocks.append(pending)
+        return blocks
+
+    @nonLinear_blocks.setter
+    def nonLinear_blocks(self, value):
+        self._blocks = list(value)
+
+    def _values(self, key):
+        out = list()
+        for obj in self.nonLinear_blocks:
+            out += obj.data[key]
+        return out
+
+    @property
+    def pressure_solve_times(self):
+        return self._values("Pressure Solve times")
+
+    @property
+    def finalV_solve_times(self):
+        return self._values("Final V Solve times")
+
+    @property
+    def total_BSSCR_times(self):
+        return self._values("Total BSSCR times")
+
+    @property
+    def residuals(self):
+        return self._values("Residuals")
+
+    @property
+    def iterations(self):
+        return [obj.data["Iterations"][-1] for obj in self.nonLinear_blocks
+                if obj.data["Iterations"]]
+
+    @property
+    def solution_times(self):
+        return self._values("Solution Time")
+
+    def to_arrays(self):
+        """ Returns a dict of numpy arrays with one value per block:
+        the number of iterations, the final residual and the total
+        solve times """
+        blocks = self.nonLinear_blocks
+
+        def last(key, dtype):
+            return np.array([obj.data[key][-1] if obj.data[key] else np.nan
+                             for obj in blocks], dtype=dtype)
+
+        def total(key):
+            return np.array([sum(obj.data[key]) for obj in blocks])
+
+        return {"Iterations": last("Iterations", float),
+                "Residual": last("Residuals", float),
+                "Pressure Solve time": total("Pressure Solve times"),
+                "Final V Solve time": total("Final V Solve times"),
+                "Total BSSCR time": total("Total BSSCR times"),
+                "Solution Time": total("Solution Time")}
+
+    def to_dataframe(self):
+        """ Returns a DataFrame with one row per non linear block
+        (see to_arrays) """
+        import pandas as pd
+        return pd.DataFrame(self.to_arrays())
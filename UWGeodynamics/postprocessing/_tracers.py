@@ -1,11 +1,25 @@
 import os, re, glob
+import numpy as np
 import h5py
+from multiprocessing import Pool, cpu_count
+from .._manifest import CheckpointManifest
 
 def find_swarm_files(folder, tracers_name):
+    manifest = CheckpointManifest(folder)
+    if manifest.exists():
+        indices = [step for step, entry in manifest.entries().items()
+                   if "tracers" in entry["kinds"] and
+                   tracers_name in entry["variables"]]
+        res = ["{0}-{1}.h5".format(tracers_name, index) for index in indices]
+        return res, indices
     res = [f for f in os.listdir(folder) if re.search(r'^'+tracers_name+'(-\d.*.h5)', f)]
-    res.sort()
     indices = [int(re.search(r'^'+tracers_name+'-(.+?)(.h5)$', f).group(1)) for f in res]
-    return res, indices
+    order = np.argsort(indices, kind="mergesort")
+    return [res[i] for i in order], [indices[i] for i in order]
+
+# Variables saved with the tracers which are not tracked fields
+_index_variables = ("global_index", "group_id")
+
 
 def find_tracked_fields(folder, tracers_name):
     """ Returns a list of field tracked by the tracers"""
@@ -13,57 +27,343 @@ def find_tracked_fields(folder, tracers_name):
     files = [os.path.split(file)[-1][len(tracers_name):] for file in files if "h5" in file]
     out = []
     for file in files:
-        match = re.search("^_(.+?)(-[0-9].h5)$", file)
-        if match:
+        match = re.search("^_(.+?)(-[0-9]+.h5)$", file)
+        if match and match.group(1) not in _index_variables:
             out.append(match.group(1))
     return list(set(out))
 
 def extract_global_indices(output_folder, tracers_name, index):
     global_index_file = """{0}_global_index-{1}.h5""".format(tracers_name, index)
     with h5py.File(os.path.join(output_folder, global_index_file), "r") as h5f:
-        global_indices = h5f["data"].value
+        global_indices = h5f["data"][()]
     return global_indices.ravel()
 
-def extract_tracers_data(output_folder, tracers_name, csv=True):
+def _parse_time(value):
+    """ Returns the magnitude and the units of a time attribute """
+    from UWGeodynamics import UnitRegistry as u
+    if isinstance(value, bytes):
+        value = value.decode()
+    try:
+        return float(value), None
+    except (TypeError, ValueError):
+        pass
+    try:
+        time = u.parse_expression(value)
+        return float(time.magnitude), str(time.units)
+    except Exception:
+        return np.nan, None
+
+
+def trajectory_index(global_indices):
+    """ Sorted global index -> row table of a checkpoint
+
+    Returns (ids, rows): the global indices sorted and the row of each
+    of them in the checkpoint files, so that the values of the tracers
+    ids in a file are values[rows] (a gather, see tracers_rows).
+    """
+    global_indices = np.asarray(global_indices).ravel()
+    rows = np.argsort(global_indices, kind="mergesort")
+    return global_indices[rows], rows
+
+
+def tracers_rows(index, ids):
+    """ Rows of the tracers ids in a checkpoint (-1 if missing)
+
+    Parameters
+    ----------
+
+        index : (ids, rows) of the checkpoint (see trajectory_index)
+        ids : global indices of the tracers
+    """
+    sorted_ids, rows = index
+    ids = np.asarray(ids)
+    if not len(sorted_ids):
+        return np.full(ids.shape, -1, dtype=rows.dtype)
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[pos] == ids, rows[pos], -1)
+
+
+def _read_index(args):
+    """ Read the global indices of one step, sorted """
+    output_folder, tracers_name, index = args
+    return np.unique(extract_global_indices(output_folder, tracers_name,
+                                            index))
+
+
+def _all_global_indices(output_folder, tracers_name, indices, pool):
+    """ Sorted global indices of all the tracers saved at indices
+
+    Tracers added after the first step are included. """
+    tasks = [(output_folder, tracers_name, index) for index in indices]
+    ids = np.empty(0, dtype=np.int64)
+    results = pool.imap(_read_index, tasks) if pool else map(_read_index, tasks)
+    for step_ids in results:
+        ids = np.union1d(ids, step_ids)
+    return ids
+
+
+def _read_step(args):
+    """ Read the tracers of one step: coordinates, global indices,
+    tracked fields and time """
+    output_folder, tracers_name, index, fields = args
+    out = {}
+    file = os.path.join(output_folder, "{0}-{1}.h5".format(tracers_name, index))
+    with h5py.File(file, "r") as h5f:
+        out["coords"] = h5f["data"][()]
+        out["time_attr"] = h5f.attrs.get("time")
+        out["time"] = _parse_time(out["time_attr"])
+    for field in ["global_index"] + fields:
+        file = "{0}_{1}-{2}.h5".format(tracers_name, field, index)
+        with h5py.File(os.path.join(output_folder, file), "r") as h5f:
+            out[field] = h5f["data"][()]
+    out["global_index"] = out["global_index"].ravel()
+    out["index"] = trajectory_index(out["global_index"])
+    return index, out
+
+
+def _read_steps(output_folder, tracers_name, indices, fields, pool,
+                chunksize):
+    """ Generator over the steps read by a pool of processes
+
+    Steps are read by chunks so that only chunksize steps are
+    held in memory at once. """
+    tasks = [(output_folder, tracers_name, index, fields) for index in indices]
+    if pool is None:
+        for task in tasks:
+            yield _read_step(task)
+        return
+    for start in range(0, len(tasks), chunksize):
+        for result in pool.map(_read_step, tasks[start:start + chunksize]):
+            yield result
+
+
+def _pool(processes):
+    return Pool(processes) if processes != 1 else None
+
+
+def _columns(dim):
+    return ["Coord1", "Coord2", "Coord3"][:dim]
+
+
+def extract_tracers_store(output_folder, tracers_name, filename=None,
+                          processes=None, chunksize=None):
+    """ Extract the tracers of a model to a single HDF5 store
+
+    The store has one dataset per column (Coord1, Coord2, Coord3 and
+    each tracked field) of shape (number of steps, number of tracers),
+    chunked so that both a trajectory and a step can be read
+    without loading the whole dataset (see TracersStore).
+    Tracer k is the tracer with the k-th smallest global index over
+    all the steps (tracers added during the run are included); tracers
+    missing from a step (e.g. out of the domain) are set to NaN.
+
+    Parameters
+    ----------
+
+        output_folder : Model output directory.
+        tracers_name : name of the passive tracers.
+        filename : path of the store, default to
+                   output_folder/<tracers_name>-trajectories.h5
+        processes : number of processes reading the tracers files,
+                    default to the number of CPUs.
+        chunksize : number of steps held in memory at once, default to
+                    4 times the number of processes.
+
+    Returns the path of the store.
+    """
+    swarm_files, indices = find_swarm_files(output_folder, tracers_name)
+    if not swarm_files:
+        raise ValueError("""Cannot find tracers {0}""".format(tracers_name))
+
+    if not filename:
+        filename = os.path.join(output_folder,
+                                tracers_name + "-trajectories.h5")
+
+    tracked_fields = sorted(find_tracked_fields(output_folder, tracers_name))
+
+    processes = processes if processes else cpu_count()
+    chunksize = chunksize if chunksize else 4 * processes
+    pool = _pool(processes)
+
+    try:
+        reference = _all_global_indices(output_folder, tracers_name,
+                                        indices, pool)
+        ntracers = len(reference)
+        nsteps = len(indices)
+
+        with h5py.File(filename, "w") as store:
+            store.attrs["tracers"] = tracers_name
+            store.create_dataset("step", data=np.array(indices, dtype="i8"))
+            store.create_dataset("global_index", data=reference)
+            time = store.create_dataset("time", (nsteps,), dtype="f8")
+
+            # HDF5 does not allow empty chunks, a store without
+            # tracers is left contiguous.
+            chunks = None
+            if nsteps and ntracers:
+                chunks = (min(nsteps, 64), min(ntracers, 4096))
+
+            def column(name, data):
+                if name not in store:
+                    shape = (nsteps, ntracers) + data.shape[1:]
+                    store.create_dataset(
+                        name, shape, dtype=data.dtype if data.dtype.kind == "f"
+                        else "f8",
+                        chunks=chunks + data.shape[1:] if chunks else None,
+                        fillvalue=np.nan)
+                return store[name]
+
+            steps = _read_steps(output_folder, tracers_name, indices,
+                                tracked_fields, pool, chunksize)
+            for row, (index, data) in enumerate(steps):
+                time[row], units = data["time"]
+                if units:
+                    time.attrs["units"] = units
+
+                # The tracers of the step, in the order of the store
+                ids, rows = data["index"]
+                pos = np.searchsorted(reference, ids)
+
+                coords = data["coords"]
+                values = [(name, coords[:, axis]) for axis, name in
+                          enumerate(_columns(coords.shape[1]))]
+                values += [(field, data[field][:, 0]
+                            if data[field].shape[1] == 1 else data[field])
+                           for field in tracked_fields]
+
+                for name, value in values:
+                    dset = column(name, value)
+                    full = np.full(dset.shape[1:], np.nan, dtype=dset.dtype)
+                    full[pos] = value[rows]
+                    dset[row] = full
+
+            store.attrs["columns"] = [name for name in store.keys()
+                                      if name not in ("step", "time",
+                                                      "global_index")]
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return filename
+
+
+class TracersStore(object):
+    """ Lazy access to the tracers extracted with extract_tracers_store
+
+    Only the part of the store needed by a query is read.
+
+    >>> store = TracersStore("tracers-trajectories.h5")
+    >>> store.trajectory(10)   # tracer 10 at every step
+    >>> store.at_step(25)      # all the tracers at step 25
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with h5py.File(filename, "r") as store:
+            self.steps = store["step"][()]
+            self.times = store["time"][()]
+            self.time_units = store["time"].attrs.get("units")
+            self.global_index = store["global_index"][()]
+            self.columns = [str(name) for name in store.attrs["columns"]]
+
+    def __len__(self):
+        return len(self.global_index)
+
+    def tracer(self, global_index):
+        """ Returns the tracer id of a global index """
+        tracer = np.searchsorted(self.global_index, global_index)
+        if (tracer == len(self) or
+                self.global_index[tracer] != global_index):
+            raise ValueError("""No tracer with global index {0}""".format(
+                global_index))
+        return int(tracer)
+
+    def _read(self, selection, columns):
+        import pandas as pd
+        columns = columns if columns else self.columns
+        out = {}
+        with h5py.File(self.filename, "r") as store:
+            for name in columns:
+                value = store[name][selection]
+                if value.ndim > 1:
+                    for comp in range(value.shape[1]):
+                        out["{0}_{1}".format(name, comp)] = value[:, comp]
+                else:
+                    out[name] = value
+        return pd.DataFrame(out)
+
+    def trajectory(self, tracer, columns=None):
+        """ Returns a DataFrame with the values of a tracer at each step
+
+        Parameters
+        ----------
+
+            tracer : tracer id (see tracer)
+            columns : list of columns, default to all the columns.
+        """
+        df = self._read((slice(None), tracer), columns)
+        df.insert(0, "Time", self.times)
+        df.insert(0, "FileIndex", self.steps)
+        return df
+
+    def at_step(self, step, columns=None):
+        """ Returns a DataFrame with the values of the tracers at a step
+
+        Parameters
+        ----------
+
+            step : checkpoint ID
+            columns : list of columns, default to all the columns.
+        """
+        rows = np.flatnonzero(self.steps == step)
+        if not len(rows):
+            raise ValueError("""Step {0} is not in the store""".format(step))
+        df = self._read((rows[0], slice(None)), columns)
+        df.insert(0, "TracerId", np.arange(len(self)))
+        df.insert(1, "global_index", self.global_index)
+        df.insert(2, "Time", self.times[rows[0]])
+        return df
+
+
+def extract_tracers_data(output_folder, tracers_name, csv=True,
+                         processes=None):
+    """ Returns a DataFrame with the tracers values at all the steps
+
+    The whole data is held in memory, use extract_tracers_store
+    for large number of tracers and steps.
+    """
     import pandas as pd
     swarm_files, indices = find_swarm_files(output_folder, tracers_name)
     if not swarm_files:
         raise ValueError("""Cannot find tracers {0}""".format(tracers_name))
 
-    tracked_fields = find_tracked_fields(output_folder, tracers_name)
-    global_indices = extract_global_indices(output_folder, tracers_name, 0)
-
-    id_dict = {}
-    id_ = 0
-    for index in global_indices:
-        id_dict[index] = id_
-        id_ += 1
-
-    default_columns = ["Coord1", "Coord2", "Coord3", "FileIndex", "TracerId"]
-    df = pd.DataFrame(columns=default_columns + tracked_fields)
-    for index in indices:
-        dftempo = pd.DataFrame(columns=default_columns + tracked_fields)
-        # Extract Coordinates
-        file = """{0}-{1}.h5""".format(tracers_name, index)
-        file = os.path.join(output_folder, file)
-        with h5py.File(file, "r") as h5f:
-            dftempo["Coord1"] = h5f["data"].value[:,0]
-            dftempo["Coord2"] = h5f["data"].value[:,1]
-            try:
-                dftempo["Coord3"] = h5f["data"].value[:,2]
-            except:
-                dftempo["Coord3"] = None
-            dftempo["FileIndex"] = index
-            dftempo["Time"] = h5f.attrs["time"]
-
-        for field in tracked_fields:
-            file = """{0}_{1}-{2}.h5""".format(tracers_name, field, index)
-            file = os.path.join(output_folder, file)
-            with h5py.File(file, "r") as h5f:
-                dftempo[field] = h5f["data"].value.ravel()
-
-        dftempo["TracerId"] = dftempo["global_index"].map(id_dict)
-        df = pd.concat([df, dftempo], ignore_index=True, sort=False)
+    tracked_fields = [field for field in
+                      find_tracked_fields(output_folder, tracers_name)
+                      if field != "global_index"]
+    processes = processes if processes else cpu_count()
+    pool = _pool(processes)
+    frames = []
+    try:
+        reference = _all_global_indices(output_folder, tracers_name,
+                                        indices, pool)
+        for index, data in _read_steps(output_folder, tracers_name, indices,
+                                       tracked_fields, pool, 4 * processes):
+            coords = data["coords"]
+            columns = {"Coord1": coords[:, 0], "Coord2": coords[:, 1],
+                       "Coord3": coords[:, 2] if coords.shape[1] > 2 else None,
+                       "FileIndex": index, "Time": data["time_attr"]}
+            for field in tracked_fields:
+                columns[field] = data[field].ravel()
+            columns["global_index"] = data["global_index"]
+            columns["TracerId"] = np.searchsorted(reference,
+                                                  data["global_index"])
+            frames.append(pd.DataFrame(columns))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    df = pd.concat(frames, ignore_index=True, sort=False)
 
     if csv:
         df.to_csv(tracers_name+".csv")
@@ -5,6 +5,25 @@ import underworld.function as fn
 from UWGeodynamics import non_dimensionalise as nd
 
 
+def _bounding_box(dim, extents):
+    """ Return the (lower, upper) corners of a box
+
+    extents is a dict {axis: (min, max)}, the other axes are unbounded.
+    The box is slightly enlarged so that it contains all the points
+    tested inside the shape despite rounding errors.
+    """
+    lower = np.full(dim, -np.inf)
+    upper = np.full(dim, np.inf)
+    for axis, (vmin, vmax) in extents.items():
+        if axis >= dim:
+            continue
+        vmin, vmax = float(nd(vmin)), float(nd(vmax))
+        pad = 1e-9 * (abs(vmin) + abs(vmax) + (vmax - vmin))
+        lower[axis] = vmin - pad
+        upper[axis] = vmax + pad
+    return lower, upper
+
+
 class Polygon(fn.Function):
     """Polygon Shape Class"""
 
@@ -29,6 +48,14 @@ class Polygon(fn.Function):
         super(Polygon, self).__init__(argument_fns=None)
         self._fncself = self._fn._fncself
 
+    def bounding_box(self, dim):
+        """ Return the (lower, upper) corners of the box containing
+        the shape (non-dimensional) """
+        xs = [x for x, y in self.vertices]
+        ys = [y for x, y in self.vertices]
+        return _bounding_box(dim, {0: (min(xs), max(xs)),
+                                   1: (min(ys), max(ys))})
+
 
 class HalfSpace(fn.Function):
     """ Class to define a HalfSpace
@@ -112,6 +139,11 @@ class Layer(fn.Function):
         super(Layer, self).__init__(argument_fns=None)
         self._fncself = self._fn._fncself
 
+    def bounding_box(self, dim):
+        """ Return the (lower, upper) corners of the box containing
+        the shape (non-dimensional) """
+        return _bounding_box(dim, {1: (self.bottom, self.top)})
+
 
 class Layer3D(fn.Function):
     """Layer3D"""
@@ -139,6 +171,11 @@ class Layer3D(fn.Function):
         super(Layer3D, self).__init__(argument_fns=None)
         self._fncself = self._fn._fncself
 
+    def bounding_box(self, dim):
+        """ Return the (lower, upper) corners of the box containing
+        the shape (non-dimensional) """
+        return _bounding_box(dim, {2: (self.bottom, self.top)})
+
 
 class Layer2D(Layer):
 
@@ -194,6 +231,16 @@ class Box(fn.Function):
         super(Box, self).__init__(argument_fns=None)
         self._fncself = self._fn._fncself
 
+    def bounding_box(self, dim):
+        """ Return the (lower, upper) corners of the box containing
+        the shape (non-dimensional) """
+        if (self.minY is not None) and (self.maxY is not None):
+            return _bounding_box(dim, {0: (self.minX, self.maxX),
+                                       1: (self.minY, self.maxY),
+                                       2: (self.bottom, self.top)})
+        return _bounding_box(dim, {0: (self.minX, self.maxX),
+                                   1: (self.bottom, self.top)})
+
 
 class Disk(fn.Function):
     """Disk"""
@@ -224,6 +271,13 @@ class Disk(fn.Function):
         super(Disk, self).__init__(argument_fns=None)
         self._fncself = self._fn._fncself
 
+    def bounding_box(self, dim):
+        """ Return the (lower, upper) corners of the box containing
+        the shape (non-dimensional) """
+        return _bounding_box(dim, dict(
+            (axis, (val - self.radius, val + self.radius))
+            for axis, val in enumerate(self.center)))
+
 
 Sphere = Disk
 
@@ -259,3 +313,10 @@ class Annulus(fn.Function):
         self._fn = (fn.math.dot(coord, coord) < r2**2) & (fn.math.dot(coord, coord) > r1**2)
         super(Annulus, self).__init__(argument_fns=None)
         self._fncself = self._fn._fncself
+
+    def bounding_box(self, dim):
+        """ Return the (lower, upper) corners of the box containing
+        the shape (non-dimensional) """
+        return _bounding_box(dim, dict(
+            (axis, (val - self.r2, val + self.r2))
+            for axis, val in enumerate(self.center)))
@@ -404,14 +404,14 @@ class ErosionThreshold(SurfaceProcesses):
         belowthreshold = [(((isAirMaterial < 0.5) & (fn.input()[1] > nd(self.threshold))), self.air[0].index),
                           (True, materialField)]
 
-        self._fn = fn.branching.conditional(belowthreshold)
+        self._erosion_fn = fn.branching.conditional(belowthreshold)
 
     def solve(self, dt):
 
         if not self.Model:
             raise ValueError("Model is not defined")
 
-        self.Model.materialField.data[:] = self._fn.evaluate(self.Model.swarm)
+        self.Model.materialField.data[:] = self._erosion_fn.evaluate(self.Model.swarm)
         if self.surfaceTracers:
             if self.surfaceTracers.swarm.particleCoordinates.data.size > 0:
                 coords = self.surfaceTracers.swarm.particleCoordinates
@@ -454,7 +454,7 @@ class SedimentationThreshold(SurfaceProcesses):
         conditions = [(self._change_material < 0.5, self.sediment[0].index),
                       (True, materialField)]
 
-        self._fn = fn.branching.conditional(conditions)
+        self._sedimentation_fn = fn.branching.conditional(conditions)
 
     def solve(self, dt):
 
@@ -465,7 +465,7 @@ class SedimentationThreshold(SurfaceProcesses):
             fn = self._change_material * self.timeField
             self.timeField.data[...] = fn.evaluate(self.Model.swarm)
 
-        self.Model.materialField.data[:] = self._fn.evaluate(self.Model.swarm)
+        self.Model.materialField.data[:] = self._sedimentation_fn.evaluate(self.Model.swarm)
 
         if self.surfaceTracers:
             if self.surfaceTracers.swarm.particleCoordinates.data.size > 0:
@@ -1,3 +1,5 @@
 from __future__ import print_function,  absolute_import
 from .UWtoAscii import convert_to_ascii
 from .UWtoAscii import main
+from .convert import convert_directory, convert_grid, find_steps
+from .convert import main as convert_main
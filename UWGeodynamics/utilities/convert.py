@@ -0,0 +1,384 @@
+#!/usr/bin/python
+from __future__ import print_function,  absolute_import
+import os
+import re
+import sys
+import glob
+import zipfile
+import argparse
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool, cpu_count
+import numpy as np
+import h5py
+
+__author__ = "Romain Beucher"
+
+FORMATS = {"ascii": ".asc", "npz": ".npz", "vtu": ".vtu"}
+
+# VTK cell type and node order of the UW elements
+_VTK_CELLS = {("Quadrilateral", 4): (9, [0, 1, 3, 2]),
+              ("Hexahedron", 8): (12, [0, 1, 3, 2, 4, 5, 7, 6]),
+              ("Quadrilateral_9", 9): (28, [0, 2, 8, 6, 1, 5, 7, 3, 4])}
+_VTK_VERTEX = 1
+
+
+def _hdf_item(element):
+    """ (h5 file, dataset path) of the first HDF DataItem of element """
+    for item in element.iter("DataItem"):
+        if item.get("Format") == "HDF":
+            filename, path = item.text.strip().split(":")
+            return filename, path
+    return None
+
+
+def _grid(element, root_dir):
+    """ Description of a Uniform XDMF grid """
+    grid = {"name": element.get("Name", "grid").replace(".h5", ""),
+            "time": None, "geometry": None, "topology": None,
+            "attributes": []}
+    time = element.find("Time")
+    if time is not None:
+        grid["time"] = time.get("Value")
+    geometry = element.find("Geometry")
+    if geometry is not None:
+        grid["geometry"] = _hdf_item(geometry)
+    topology = element.find("Topology")
+    if topology is not None and _hdf_item(topology):
+        grid["topology"] = (topology.get("Type"),) + _hdf_item(topology)
+    for attribute in element.findall("Attribute"):
+        item = _hdf_item(attribute)
+        if item:
+            grid["attributes"].append((attribute.get("Name"),
+                                       attribute.get("Center")) + item)
+    grid["root_dir"] = root_dir
+    return grid
+
+
+def _uniform_grids(element):
+    if element.get("GridType") == "Collection":
+        grids = []
+        for child in element.findall("Grid"):
+            grids += _uniform_grids(child)
+        return grids
+    return [element]
+
+
+def find_steps(xdmf_file):
+    """ Returns a list of (step, grids) described by a XDMF file
+
+    Both the XDMF files written at each checkpoint and the temporal
+    collections (one file for the whole run) are supported. """
+    root_dir = os.path.dirname(os.path.abspath(xdmf_file))
+    with open(xdmf_file, "r") as f:
+        text = f.read()
+    domain = ET.fromstring(text).find("Domain")
+    children = domain.findall("Grid")
+
+    if (len(children) == 1 and
+            children[0].get("CollectionType") == "Temporal"):
+        elements = children[0].findall("Grid")
+        markers = [int(step) for step in
+                   re.findall(r"<!-- step (-?\d+) -->", text)]
+        if len(markers) != len(elements):
+            markers = range(len(elements))
+        return [(step, [_grid(grid, root_dir)
+                        for grid in _uniform_grids(element)])
+                for step, element in zip(markers, elements)]
+
+    match = re.search(r"[.-](\d+)\.x[dm]+f$", xdmf_file)
+    step = int(match.group(1)) if match else 0
+    grids = []
+    for element in children:
+        grids += [_grid(grid, root_dir) for grid in _uniform_grids(element)]
+    return [(step, grids)]
+
+
+def _stream(xdmf_file):
+    stem = os.path.splitext(os.path.basename(xdmf_file))[0]
+    return re.sub(r"[.-]\d+$", "", stem)
+
+
+class _Data(object):
+    """ Open the h5 datasets of a grid """
+
+    def __init__(self, grid, fields=None):
+        self.files = {}
+        root_dir = grid["root_dir"]
+        self.geometry = self._dataset(root_dir, *grid["geometry"])
+        self.topology = None
+        if grid["topology"]:
+            self.topology = (grid["topology"][0],
+                             self._dataset(root_dir, *grid["topology"][1:]))
+        self.points = []
+        self.cells = []
+        ncells = len(self.topology[1]) if self.topology else None
+        for name, center, filename, path in grid["attributes"]:
+            if fields and name not in fields:
+                continue
+            dset = self._dataset(root_dir, filename, path)
+            if len(dset) == len(self.geometry):
+                self.points.append((name, dset))
+            elif len(dset) == ncells:
+                self.cells.append((name, dset))
+
+    def _dataset(self, root_dir, filename, path):
+        if filename not in self.files:
+            self.files[filename] = h5py.File(
+                os.path.join(root_dir, filename), "r")
+        return self.files[filename][path]
+
+    def close(self):
+        for h5f in self.files.values():
+            h5f.close()
+
+
+def _chunks(length, chunksize):
+    for start in range(0, length, chunksize):
+        yield start, min(start + chunksize, length)
+
+
+def _columns(dset, start, end):
+    values = dset[start:end]
+    return values.reshape((len(values), -1))
+
+
+def write_ascii(data, filename, chunksize):
+    """ Coordinates followed by the point values, one point per line """
+    with open(filename, "wb") as f:
+        for start, end in _chunks(len(data.geometry), chunksize):
+            block = [_columns(data.geometry, start, end)]
+            block += [_columns(dset, start, end) for _, dset in data.points]
+            np.savetxt(f, np.hstack(block))
+
+
+def write_npz(data, filename, chunksize, time=None):
+    """ Compressed numpy archive, the arrays are written by chunks """
+    arrays = [("coordinates", data.geometry)]
+    if data.topology:
+        arrays.append(("cells", data.topology[1]))
+    arrays += data.points + data.cells
+    with zipfile.ZipFile(filename, "w", compression=zipfile.ZIP_DEFLATED,
+                         allowZip64=True) as archive:
+        for name, dset in arrays:
+            with archive.open(name + ".npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array_header_1_0(
+                    f, {"descr": np.lib.format.dtype_to_descr(dset.dtype),
+                        "fortran_order": False, "shape": dset.shape})
+                for start, end in _chunks(len(dset), chunksize):
+                    f.write(np.ascontiguousarray(dset[start:end]).tobytes())
+        if time is not None:
+            archive.writestr("time.npy", _npy(np.array(time)))
+
+
+def _npy(array):
+    from io import BytesIO
+    out = BytesIO()
+    np.save(out, array)
+    return out.getvalue()
+
+
+def _vtk_type(dtype):
+    return {"f": "Float", "i": "Int", "u": "UInt"}[dtype.kind] + str(
+        8 * dtype.itemsize)
+
+
+def _data_array(f, name, dset, chunksize, transform=None, ncomp=None,
+                dtype=None):
+    dtype = dtype if dtype else dset.dtype
+    if ncomp is None:
+        ncomp = int(np.prod(dset.shape[1:]))
+    f.write('<DataArray type="{0}" Name="{1}" NumberOfComponents="{2}" '
+            'format="ascii">\n'.format(_vtk_type(np.dtype(dtype)), name,
+                                       ncomp).encode())
+    for start, end in _chunks(len(dset), chunksize):
+        values = _columns(dset, start, end)
+        if transform:
+            values = transform(values)
+        fmt = "%.10g" if np.dtype(dtype).kind == "f" else "%d"
+        np.savetxt(f, values, fmt=fmt)
+    f.write(b"</DataArray>\n")
+
+
+class _Range(object):
+    """ Dataset like view of np.arange(start, stop, step) """
+
+    def __init__(self, length, step=1, value=None):
+        self.shape = (length,)
+        self.dtype = np.dtype("int64")
+        self.step = step
+        self.value = value
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, item):
+        start, stop = item.start, item.stop
+        if self.value is not None:
+            return np.full(stop - start, self.value, dtype=self.dtype)
+        return np.arange(start + 1, stop + 1, dtype=self.dtype) * self.step
+
+
+def write_vtu(data, filename, chunksize):
+    """ VTK unstructured grid (ascii) """
+    npoints = len(data.geometry)
+    dim = data.geometry.shape[1]
+
+    if data.topology:
+        topology_type, cells = data.topology
+        key = (topology_type, cells.shape[1])
+        if key not in _VTK_CELLS:
+            raise ValueError("""Can not write {0} elements with {1} nodes
+                             to VTK""".format(*key))
+        cell_type, order = _VTK_CELLS[key]
+        ncells, nodes = len(cells), cells.shape[1]
+        connectivity = (cells, lambda values: values[:, order].reshape(-1, 1))
+    else:
+        cell_type, ncells, nodes = _VTK_VERTEX, npoints, 1
+        connectivity = (_Range(npoints, 1), lambda values: values - 1)
+
+    with open(filename, "wb") as f:
+        f.write(b'<?xml version="1.0"?>\n'
+                b'<VTKFile type="UnstructuredGrid" version="0.1" '
+                b'byte_order="LittleEndian">\n<UnstructuredGrid>\n')
+        f.write('<Piece NumberOfPoints="{0}" NumberOfCells="{1}">\n'.format(
+            npoints, ncells).encode())
+
+        f.write(b"<PointData>\n")
+        for name, dset in data.points:
+            _data_array(f, name, dset, chunksize)
+        f.write(b"</PointData>\n<CellData>\n")
+        for name, dset in data.cells:
+            _data_array(f, name, dset, chunksize)
+        f.write(b"</CellData>\n")
+
+        f.write(b"<Points>\n")
+        _data_array(f, "Points", data.geometry, chunksize, ncomp=3,
+                    transform=lambda values: np.hstack(
+                        [values, np.zeros((len(values), 3 - dim))]))
+        f.write(b"</Points>\n<Cells>\n")
+        _data_array(f, "connectivity", connectivity[0], chunksize,
+                    transform=connectivity[1], ncomp=1, dtype="int64")
+        _data_array(f, "offsets", _Range(ncells, nodes), chunksize,
+                    dtype="int64")
+        _data_array(f, "types", _Range(ncells, value=cell_type), chunksize,
+                    dtype="uint8")
+        f.write(b"</Cells>\n</Piece>\n</UnstructuredGrid>\n</VTKFile>\n")
+
+
+def convert_grid(grid, filename, fmt="ascii", fields=None, chunksize=2**20):
+    """ Convert a grid described by a XDMF file (see find_steps)
+
+    Parameters
+    ----------
+
+        grid : grid description
+        filename : output file
+        fmt : "ascii", "npz" or "vtu"
+        fields : list of the attributes to convert, default to all.
+        chunksize : number of values read at once
+    """
+    if fmt not in FORMATS:
+        raise ValueError("""Unknown format {0}, use one of {1}""".format(
+            fmt, list(FORMATS.keys())))
+    data = _Data(grid, fields)
+    try:
+        if fmt == "ascii":
+            write_ascii(data, filename, chunksize)
+        elif fmt == "npz":
+            write_npz(data, filename, chunksize, grid["time"])
+        else:
+            write_vtu(data, filename, chunksize)
+    finally:
+        data.close()
+    return filename
+
+
+def _convert(args):
+    return convert_grid(*args)
+
+
+def convert_directory(outputDir, fmt="ascii", destination=None,
+                      processes=None, fields=None, chunksize=2**20,
+                      verbose=True):
+    """ Convert all the outputs of a Model
+
+    Each grid of each step of the XDMF files of outputDir is written
+    to destination/<stream>.<step>.<grid name>.<ext>. The grids are
+    converted in parallel by a pool of processes and the datasets are
+    read by chunks of chunksize values.
+
+    Parameters
+    ----------
+
+        outputDir : Model output directory
+        fmt : "ascii", "npz" or "vtu"
+        destination : output directory, default to outputDir/<fmt>
+        processes : number of processes, default to the number of CPUs.
+        fields : list of the attributes to convert, default to all.
+        chunksize : number of values read at once.
+
+    Returns the list of files written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError("""Unknown format {0}, use one of {1}""".format(
+            fmt, list(FORMATS.keys())))
+
+    destination = destination if destination else os.path.join(outputDir,
+                                                                fmt)
+    if not os.path.exists(destination):
+        os.makedirs(destination)
+
+    tasks = []
+    xdmf_files = sorted(glob.glob(os.path.join(outputDir, "*.xmf")) +
+                        glob.glob(os.path.join(outputDir, "*.xdmf")))
+    for xdmf_file in xdmf_files:
+        stream = _stream(xdmf_file)
+        for step, grids in find_steps(xdmf_file):
+            for grid in grids:
+                filename = "{0}.{1}.{2}{3}".format(stream, step, grid["name"],
+                                                   FORMATS[fmt])
+                tasks.append((grid, os.path.join(destination, filename),
+                              fmt, fields, chunksize))
+
+    processes = processes if processes else cpu_count()
+    written = []
+    if processes == 1:
+        results = (_convert(task) for task in tasks)
+    else:
+        pool = Pool(processes)
+        results = pool.imap_unordered(_convert, tasks)
+    try:
+        for filename in results:
+            written.append(filename)
+            if verbose:
+                print("[{0}/{1}] {2}".format(len(written), len(tasks),
+                                             filename))
+                sys.stdout.flush()
+    finally:
+        if processes != 1:
+            pool.close()
+            pool.join()
+    return written
+
+
+def main():
+
+    description = """Convert the outputs of a UWGeodynamics Model
+                   to ASCII, compressed numpy archives or VTK
+                   (e.g. for import into MOVE/PETREL)"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('input', help='output directory of the Model')
+    parser.add_argument('-f', '--format', choices=sorted(FORMATS.keys()),
+                        default="ascii", help='output format')
+    parser.add_argument('-o', '--output', help='destination directory',
+                        required=False)
+    parser.add_argument('-n', '--processes', type=int,
+                        help='number of processes', required=False)
+    parser.add_argument('--fields', nargs="+",
+                        help='fields to convert (default to all)')
+    parser.add_argument('--chunksize', type=int, default=2**20,
+                        help='number of values read at once')
+    args = parser.parse_args()
+
+    convert_directory(args.input, args.format, args.output,
+                      args.processes, args.fields, args.chunksize)
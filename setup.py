@@ -262,6 +262,7 @@ setup(
     entry_points={  # Optional
         'console_scripts': [
             'UW_to_ASCII=UWGeodynamics.utilities:main',
+            'UW_convert=UWGeodynamics.utilities:convert_main',
         ],
     },
 )
@@ -81,6 +81,28 @@ def test_shapes():
     material = Model.add_material(name="Material", shape=shape)
     material = Model.add_material(name="Material", shape=shape2)
 
+def test_add_materials_matches_add_material():
+    layer = GEO.shapes.Layer(top=30.*u.kilometer, bottom=0.*u.kilometer)
+    box = GEO.shapes.Box(top=10.* u.kilometer, bottom=5*u.kilometer,
+                         minX=10.*u.kilometer, maxX=15*u.kilometer)
+    disk = GEO.shapes.Disk(center=(12. * u.kilometer, 8. * u.kilometer), radius=4.*u.kilometer)
+    shape = disk | box
+
+    layout = [("layer", layer), ("box", box),
+              ("disk", disk), ("composite", shape)]
+
+    Model1 = GEO.Model()
+    mats1 = [Model1.add_material(name=name, shape=shp)
+             for name, shp in layout]
+
+    Model2 = GEO.Model()
+    mats2 = Model2.add_materials(layout)
+    assert([mat.name for mat in mats2] ==
+           ["layer", "box", "disk", "composite"])
+    for mat1, mat2 in zip(mats1, mats2):
+        assert(((Model1.materialField.data == mat1.index) ==
+                (Model2.materialField.data == mat2.index)).all())
+
 def test_plastic_registry():
     pl = GEO.PlasticityRegistry()
     Material = GEO.Material(name="Material")
@@ -131,6 +153,670 @@ def test_temperature_boundary_condition():
     Model.set_temperatureBCs(top=500. * u.degK,
                              bottom=1200. * u.degK)
 
+def test_viscosity_function_is_cached():
+    Model = GEO.Model()
+    material = Model.add_material(name="Material",
+                                  shape=GEO.shapes.Layer(top=Model.top,
+                                                         bottom=Model.bottom))
+    material.viscosity = 1e21 * u.pascal * u.second
+    eta = Model._viscosityFn
+    assert(Model._viscosityFn is eta)
+    material.viscosity = 1e22 * u.pascal * u.second
+    assert(Model._viscosityFn is not eta)
+    eta = Model._viscosityFn
+    material.viscosity.viscosity = 1e20 * u.pascal * u.second
+    assert(Model._viscosityFn is not eta)
+
+def test_stress_function_does_not_evaluate_viscosity_again(monkeypatch):
+    Model = GEO.Model()
+    material = Model.add_material(name="Material",
+                                  shape=GEO.shapes.Layer(top=Model.top,
+                                                         bottom=Model.bottom))
+    material.viscosity = 1e21 * u.pascal * u.second
+    stress = Model._stressFn
+    evaluations = []
+    viscosityFn = GEO.Model._viscosityFn
+
+    def counted(self):
+        evaluations.append(1)
+        return viscosityFn.fget(self)
+    monkeypatch.setattr(GEO.Model, "_viscosityFn", property(counted))
+    assert(Model._stressFn is stress)
+    assert(not evaluations)
+    Model._invalidate_projections()
+    Model._stressFn
+    assert(len(evaluations) == 1)
+
+def test_timestep_controller():
+    Model = GEO.Model()
+    Model.timestep_controller = GEO.PIController(tolerance=1e-2,
+                                                 growth=2.0, shrink=0.5)
+    assert(isinstance(Model.timestep_controller, GEO.TimeStepController))
+
+def test_batched_projection_matches_meshvariable_projection():
+    import numpy as np
+    Model = GEO.Model()
+    Model.plasticStrain.data[:, 0] = np.random.random(
+        Model.plasticStrain.data.shape[0])
+    batched = np.copy(Model.projPlasticStrain.data)
+
+    field = uw.mesh.MeshVariable(Model.mesh, nodeDofCount=1)
+    uw.utils.MeshVariable_Projection(field, Model.plasticStrain,
+                                     voronoi_swarm=Model.swarm,
+                                     type=0).solve()
+    assert(np.allclose(batched, field.data))
+
+def test_restart_rebinds_swarm_projections(tmpdir):
+    import numpy as np
+    Model = GEO.Model(outputDir=str(tmpdir))
+    Model.plasticStrain.data[:, 0] = np.random.random(
+        Model.plasticStrain.data.shape[0])
+    Model.checkpoint(1, variables=["pressureField", "velocityField",
+                                   "materialField", "plasticStrain",
+                                   "timeField"])
+    old_swarm = Model.swarm
+    Model.restart(1)
+    assert(Model.swarm is not old_swarm)
+    assert(Model._swarm_projections.swarm is Model.swarm)
+    assert(Model._swarm_update.swarm is Model.swarm)
+
+    field = uw.mesh.MeshVariable(Model.mesh, nodeDofCount=1)
+    uw.utils.MeshVariable_Projection(field, Model.plasticStrain,
+                                     voronoi_swarm=Model.swarm,
+                                     type=0).solve()
+    assert(np.allclose(Model.projPlasticStrain.data, field.data))
+
+def test_restart_drops_allocated_lazy_variables(tmpdir):
+    Model = GEO.Model(outputDir=str(tmpdir))
+    old_density = Model._densityField
+    assert("densityField" in Model.swarm_variables)
+    Model.checkpoint(1, variables=["pressureField", "velocityField",
+                                   "materialField", "plasticStrain",
+                                   "timeField"])
+    Model.restart(1)
+    assert("densityField" not in Model.swarm_variables)
+    assert("projDensityField" not in Model.mesh_variables)
+    assert("_densityField" in Model._lazy_swarm_variables)
+    assert("_densityField" not in Model._swarm_projections.projectors)
+    density = Model._densityField
+    assert(density is not old_density)
+    assert(density.swarm is Model.swarm)
+
+def test_async_checkpoint_writer(tmpdir):
+    import h5py
+    import numpy as np
+    from UWGeodynamics._checkpoint_writer import AsyncCheckpointWriter
+    from UWGeodynamics._checkpoint_writer import _WriteRequest
+    writer = AsyncCheckpointWriter()
+    assert(writer.threaded == (uw.mpi.size == 1))
+    data = np.arange(10, dtype="float64").reshape((10, 1))
+    filename = str(tmpdir.join("data.h5"))
+    request = _WriteRequest(filename)
+    request.add_dataset("data", data.shape, slice(0, 10), data)
+    finalized = []
+    writer.submit([request], finalize=lambda: finalized.append(True))
+    writer.wait()
+    writer.close()
+    with h5py.File(filename, "r") as h5f:
+        assert(np.allclose(h5f["data"][:], data))
+    assert(finalized == ([True] if uw.mpi.rank == 0 else []))
+
+def test_stage_copy(tmpdir):
+    import numpy as np
+    from UWGeodynamics._checkpoint_writer import stage
+    Model = GEO.Model()
+    filename = str(tmpdir.join("velocityField.h5"))
+    for copy in (True, False):
+        request = stage(Model.velocityField, filename, copy=copy)[0]
+        data = request.datasets[0][3]
+        assert(np.shares_memory(data, Model.velocityField.data) != copy)
+
+def test_merged_tracers_groups(tmpdir):
+    import numpy as np
+    import pytest
+    from UWGeodynamics._manifest import CheckpointManifest
+    from UWGeodynamics.postprocessing._tracers import find_tracked_fields
+    GEO.rcParams["tracers.merged"] = True
+    try:
+        Model = GEO.Model(outputDir=str(tmpdir))
+        x = np.linspace(GEO.nd(Model.minCoord[0]), GEO.nd(Model.maxCoord[0]), 10)
+        surface = Model.add_passive_tracers(name="Surface", vertices=[x, 0.5 * x + 0.1])
+        moho = Model.add_passive_tracers(name="Moho", vertices=[x, 0.2 * x + 0.1])
+    finally:
+        GEO.rcParams["tracers.merged"] = False
+
+    with pytest.raises(ValueError):
+        surface.add_tracked_field(Model.pressureField, name="surface_press",
+                                  units=u.megapascal, dataType="double")
+    with pytest.raises(ValueError):
+        surface.data[...] = 0.
+    surface.tracers.add_tracked_field(Model.pressureField, name="press",
+                                      units=u.megapascal, dataType="double")
+    assert(moho.press.data.shape[0] == moho.particleLocalCount)
+
+    Model.checkpoint(1, variables=["pressureField", "velocityField",
+                                   "materialField", "plasticStrain",
+                                   "timeField"])
+    if uw.mpi.rank == 0:
+        entry = CheckpointManifest(str(tmpdir)).entry(1)
+        assert("tracers" in entry["variables"])
+        assert("Surface" not in entry["variables"])
+        assert(entry["metadata"]["groups"]["tracers"] == ["Surface", "Moho"])
+        assert(find_tracked_fields(str(tmpdir), "tracers") == ["press"])
+
+def test_merged_tracers_container_restart(tmpdir):
+    import numpy as np
+    from mpi4py import MPI
+    variables = ["pressureField", "velocityField", "materialField",
+                 "plasticStrain", "timeField"]
+    GEO.rcParams["tracers.merged"] = True
+    GEO.rcParams["checkpoint.layout"] = "single"
+    try:
+        Model = GEO.Model(outputDir=str(tmpdir))
+        x = np.linspace(GEO.nd(Model.minCoord[0]), GEO.nd(Model.maxCoord[0]), 10)
+        top = GEO.nd(Model.maxCoord[1])
+        Model.add_passive_tracers(name="Surface", vertices=[x, np.full_like(x, 0.8 * top)])
+        Model.add_passive_tracers(name="Moho", vertices=[x, np.full_like(x, 0.3 * top)])
+        Model.checkpoint(1, variables=variables)
+        # The groups are added in a different order
+        Model = GEO.Model(outputDir=str(tmpdir))
+        Model.add_passive_tracers(name="Moho", vertices=[x, np.full_like(x, 0.3 * top)])
+        Model.add_passive_tracers(name="Surface", vertices=[x, np.full_like(x, 0.8 * top)])
+        Model.restart(1)
+    finally:
+        GEO.rcParams["tracers.merged"] = False
+        GEO.rcParams["checkpoint.layout"] = "files"
+    surface = Model.surface_tracers.data
+    moho = Model.moho_tracers.data
+    assert(np.allclose(surface[:, 1], 0.8 * top))
+    assert(np.allclose(moho[:, 1], 0.3 * top))
+    assert(MPI.COMM_WORLD.allreduce(len(surface) + len(moho)) == 20)
+
+def test_manifest_records(tmpdir):
+    import os
+    from UWGeodynamics._manifest import CheckpointManifest
+    manifest = CheckpointManifest(str(tmpdir))
+    assert(not manifest.exists())
+    for step in (1, 2, 3):
+        manifest.append(step, step * 10., "fields",
+                        [os.path.join(str(tmpdir), "mesh.h5"),
+                         os.path.join(str(tmpdir), "velocityField-%d.h5" % step)],
+                        ["mesh", "velocityField"])
+        if step == 2:
+            manifest.append(2, 20., "swarms",
+                            [os.path.join(str(tmpdir), "swarm-2.h5")],
+                            ["swarm"])
+    # A truncated record is ignored
+    with open(manifest.path, "a") as f:
+        f.write('{"step": 4, "time"')
+    assert(manifest.steps() == [1, 2, 3])
+    assert(manifest.steps(["velocityField", "swarm"]) == [2])
+    entry = manifest.entry(2)
+    assert(entry["kinds"] == ["fields", "swarms"])
+    assert(entry["files"] == ["mesh.h5", "velocityField-2.h5", "swarm-2.h5"])
+    # Restarting from step 1 discards the later steps
+    manifest.append(2, 15., "fields",
+                    [os.path.join(str(tmpdir), "velocityField-2.h5")],
+                    ["velocityField"])
+    assert(manifest.steps() == [1, 2])
+    assert(manifest.entry(2)["time"] == "15.0")
+    assert(manifest.entry(2)["files"] == ["velocityField-2.h5"])
+
+def test_manifest_restart_rewrites_step(tmpdir):
+    import os
+    from UWGeodynamics._manifest import CheckpointManifest
+    path = lambda name: os.path.join(str(tmpdir), name)
+    manifest = CheckpointManifest(str(tmpdir))
+    for step in (1, 2):
+        manifest.append(step, step, "fields", [path("fields-%d.h5" % step)],
+                        ["velocityField"])
+        manifest.append(step, step, "swarms", [path("swarm-%d.h5" % step)],
+                        ["swarm"])
+    # Restart from step 1, step 2 is written again
+    manifest.append(2, 1.5, "fields", [path("fields-2b.h5")],
+                    ["pressureField"])
+    manifest.append(2, 1.5, "swarms", [path("swarm-2b.h5")], ["swarm"])
+    entry = manifest.entry(2)
+    assert(entry["time"] == "1.5")
+    assert(entry["files"] == ["fields-2b.h5", "swarm-2b.h5"])
+    assert(entry["variables"] == ["pressureField", "swarm"])
+    assert(manifest.files([2]) == [path("fields-2b.h5"),
+                                   path("swarm-2b.h5")])
+    assert(manifest.entry(1)["files"] == ["fields-1.h5", "swarm-1.h5"])
+
+def test_manifest_shared_files(tmpdir):
+    import os
+    from UWGeodynamics._manifest import CheckpointManifest
+    manifest = CheckpointManifest(str(tmpdir))
+    for step in (1, 2):
+        manifest.append(step, step, "fields",
+                        [os.path.join(str(tmpdir), "mesh.h5"),
+                         os.path.join(str(tmpdir), "velocityField-%d.h5" % step)],
+                        ["mesh", "velocityField"])
+    path = lambda name: os.path.join(str(tmpdir), name)
+    assert(manifest.files([1]) == [path("velocityField-1.h5")])
+    assert(manifest.files([1, 2]) == [path("mesh.h5"),
+                                      path("velocityField-1.h5"),
+                                      path("velocityField-2.h5")])
+    assert(manifest.files() == manifest.files([1, 2]))
+
+def test_manifest_dependencies(tmpdir):
+    import os
+    from UWGeodynamics._manifest import CheckpointManifest
+    path = lambda name: os.path.join(str(tmpdir), name)
+    manifest = CheckpointManifest(str(tmpdir))
+    manifest.append(1, 1., "fields", [path("velocityField-1.h5")],
+                    ["velocityField"])
+    manifest.append(2, 2., "fields", [path("velocityField-2.h5")],
+                    ["velocityField"], depends=[path("velocityField-1.h5")])
+    assert(manifest.dependencies(2) == [path("velocityField-1.h5")])
+    assert(manifest.dependencies(1) == [])
+    # Step 2 links to the file of step 1
+    assert(manifest.files([1]) == [])
+    assert(manifest.files([2]) == [path("velocityField-2.h5")])
+    assert(manifest.files([1, 2]) == [path("velocityField-1.h5"),
+                                      path("velocityField-2.h5")])
+
+def test_incremental_checkpoint_dependencies(tmpdir):
+    import os
+    from UWGeodynamics._manifest import CheckpointManifest
+    GEO.rcParams["checkpoint.incremental"] = True
+    try:
+        Model = GEO.Model(outputDir=str(tmpdir))
+        Model.checkpoint(1, variables=["velocityField", "pressureField"])
+        Model.checkpoint(2, variables=["velocityField", "pressureField"])
+    finally:
+        GEO.rcParams["checkpoint.incremental"] = False
+    if uw.mpi.rank == 0:
+        depends = CheckpointManifest(str(tmpdir)).dependencies(2)
+        assert(os.path.join(str(tmpdir), "velocityField-1.h5") in depends)
+
+def test_xdmf_collection_restarts_with_run(tmpdir):
+    from UWGeodynamics._checkpoint_writer import write_xdmf
+    assert(not GEO.rcParams["checkpoint.xdmf.collection"])
+    GEO.rcParams["checkpoint.xdmf.collection"] = True
+    try:
+        collections = dict()
+        for step in range(3):
+            filename = write_xdmf(str(tmpdir), "fields", step,
+                                  "<Grid Name=\"%d\"/>\n" % step,
+                                  collections=collections)
+        # A new run in the same directory starts a new collection
+        collections = dict()
+        write_xdmf(str(tmpdir), "fields", 0, "<Grid Name=\"0\"/>\n",
+                   collections=collections)
+    finally:
+        GEO.rcParams["checkpoint.xdmf.collection"] = False
+    with open(filename) as f:
+        content = f.read()
+    assert(content.count("<!-- step") == 1)
+    assert(content.endswith("</Grid>\n</Domain>\n</Xdmf>\n"))
+
+def test_projected_density_follows_material_field():
+    import numpy as np
+    Model = GEO.Model()
+    light = Model.add_material(name="Light", shape=GEO.shapes.Layer(
+        top=Model.top, bottom=Model.bottom))
+    heavy = Model.add_material(name="Heavy")
+    light.density = 1000. * u.kilogram / u.metre**3
+    heavy.density = 3000. * u.kilogram / u.metre**3
+    before = np.copy(Model.projDensityField.data)
+    assert(np.allclose(before, GEO.nd(1000. * u.kilogram / u.metre**3)))
+
+    # The projection is cached until the model state changes
+    solves = []
+    solve = Model._swarm_projections.solve
+    Model._swarm_projections.solve = lambda names: solves.append(names) or solve(names)
+    Model.projDensityField
+    Model.projViscosityField
+    Model.projViscosityField
+    assert(solves == [["_viscosityField"]])
+
+    Model.materialField.data[:] = heavy.index
+    Model._invalidate_projections()
+    after = Model.projDensityField.data
+    assert(np.allclose(after, GEO.nd(3000. * u.kilogram / u.metre**3)))
+
+def test_zonly_tracers_share_vertical_velocity():
+    import numpy as np
+    Model = GEO.Model()
+    x = np.linspace(GEO.nd(Model.minCoord[0]), GEO.nd(Model.maxCoord[0]), 10)
+    y = 0.5 * (GEO.nd(Model.minCoord[1]) + GEO.nd(Model.maxCoord[1]))
+    top = Model.add_passive_tracers(name="Top", vertices=[x, y], zOnly=True)
+    bottom = Model.add_passive_tracers(name="Bottom", vertices=[x, y], zOnly=True)
+    assert(top._verticalVelocityField is Model._verticalVelocityField)
+    assert(bottom._verticalVelocityField is Model._verticalVelocityField)
+    assert(not top._updateVerticalVelocity)
+
+def test_phase_change_uses_fn():
+    import underworld.function as fn
+
+    class RightHalf(GEO.PhaseChange):
+        def fn(self):
+            return fn.branching.conditional(
+                [(fn.input()[0] > self.middle, 1), (True, 0)])
+
+    Model = GEO.Model()
+    rock = Model.add_material(name="Rock", shape=GEO.shapes.Layer(
+        top=Model.top, bottom=Model.bottom))
+    other = Model.add_material(name="Other")
+    change = RightHalf(condition=fn.input()[0] < -1e30, result=other.index)
+    change.middle = 0.5 * (GEO.nd(Model.minCoord[0]) +
+                           GEO.nd(Model.maxCoord[0]))
+    rock.phase_changes = change
+    Model._phaseChangeFn()
+
+    coords = Model.swarm.particleCoordinates.data
+    material = Model.materialField.data[:, 0]
+    right = coords[:, 0] > change.middle
+    assert((material[right] == other.index).all())
+    assert((material[~right] == rock.index).all())
+
+def test_swarm_update_bitmask():
+    import numpy as np
+    import underworld.function as fn
+    from UWGeodynamics._swarm_update import SwarmUpdatePipeline
+    Model = GEO.Model()
+    masks = [fn.branching.conditional([(fn.input()[0] > value, 1.),
+                                       (True, 0.)])
+             for value in np.linspace(0.1, 0.9, 60)]
+    pipeline = SwarmUpdatePipeline(Model.swarm)
+    result = []
+    pipeline.add("masks", SwarmUpdatePipeline.bitmask(masks),
+                 lambda values: result.append(
+                     SwarmUpdatePipeline.unpack(values, len(masks))))
+    pipeline.run()
+    expected = np.hstack([mask.evaluate(Model.swarm) for mask in masks])
+    assert((result[0] == (expected > 0.5)).all())
+
+def test_swarm_update_joins_stages():
+    import numpy as np
+    import underworld.function as fn
+    from UWGeodynamics._swarm_update import SwarmUpdatePipeline
+    Model = GEO.Model()
+    coords = fn.input()
+    scalar = coords[0] * coords[1]
+    vector = fn.misc.constant((1., 2.)) * coords[0]
+    pipeline = SwarmUpdatePipeline(Model.swarm)
+    result = {}
+    for run in range(2):
+        pipeline.add("scalar", scalar,
+                     lambda values: result.update(scalar=values.copy()))
+        pipeline.add("vector", vector,
+                     lambda values: result.update(vector=values.copy()),
+                     count=2)
+        pipeline.run()
+        if not run:
+            joined = [value[1] for value in pipeline._joined.values()]
+    # The joined function is reused by the next runs
+    assert(len(joined) == 1)
+    assert(list(pipeline._joined.values())[0][1] is joined[0])
+    assert(np.allclose(result["scalar"], scalar.evaluate(Model.swarm)))
+    assert(np.allclose(result["vector"], vector.evaluate(Model.swarm)))
+
+def test_erosion_and_sedimentation_threshold():
+    Model = GEO.Model(elementRes=(16, 16),
+                      minCoord=(0. * u.kilometer, 0. * u.kilometer),
+                      maxCoord=(64. * u.kilometer, 64. * u.kilometer))
+    air = Model.add_material(name="Air", shape=GEO.shapes.Layer(
+        top=Model.top, bottom=24. * u.kilometer))
+    Model.add_material(name="Crust", shape=GEO.shapes.Layer(
+        top=24. * u.kilometer, bottom=Model.bottom))
+    Model.add_material(name="Bump", shape=GEO.shapes.Box(
+        top=40. * u.kilometer, bottom=24. * u.kilometer,
+        minX=0. * u.kilometer, maxX=32. * u.kilometer))
+    sediment = Model.add_material(name="Sediment")
+
+    Model.surfaceProcesses = GEO.surfaceProcesses.ErosionAndSedimentationThreshold(
+        air=[air], sediment=[sediment], threshold=32. * u.kilometer)
+    Model.surfaceProcesses.solve(0.)
+
+    coords = Model.swarm.particleCoordinates.data
+    material = Model.materialField.data[:, 0]
+    above = coords[:, 1] > GEO.nd(32. * u.kilometer)
+    below = (coords[:, 1] < GEO.nd(32. * u.kilometer)) & (coords[:, 1] > GEO.nd(24. * u.kilometer))
+    assert((material[above] == air.index).all())
+    assert(not (material[below] == air.index).any())
+    assert((material[below & (coords[:, 0] > GEO.nd(32. * u.kilometer))] ==
+            sediment.index).all())
+
+def test_tracers_store(tmpdir):
+    import os
+    import h5py
+    import numpy as np
+    from UWGeodynamics.postprocessing import extract_tracers_store
+    from UWGeodynamics.postprocessing import TracersStore
+    steps = {0: [3, 1, 2], 1: [], 2: [2, 4]}
+    for step, ids in steps.items():
+        ids = np.array(ids, dtype="int64").reshape((-1, 1))
+        coords = np.hstack([ids, 10 * ids + step]).astype("float64")
+        with h5py.File(str(tmpdir.join("tracers-%d.h5" % step)), "w") as h5f:
+            h5f.create_dataset("data", data=coords)
+            h5f.attrs["time"] = float(step)
+        for field, data in (("global_index", ids), ("density", -coords[:, :1])):
+            with h5py.File(str(tmpdir.join("tracers_%s-%d.h5" % (field, step))), "w") as h5f:
+                h5f.create_dataset("data", data=data)
+    filename = extract_tracers_store(str(tmpdir), "tracers", processes=1)
+    assert(os.path.exists(filename))
+    store = TracersStore(filename)
+    assert(len(store) == 4)
+    assert(list(store.steps) == [0, 1, 2])
+    assert(sorted(store.columns) == ["Coord1", "Coord2", "density"])
+    trajectory = store.trajectory(store.tracer(2))
+    assert(np.allclose(trajectory["Coord2"].values[[0, 2]], [20., 22.]))
+    assert(np.isnan(trajectory["Coord2"].values[1]))
+    assert(np.allclose(trajectory["density"].values[[0, 2]], [-2., -2.]))
+    df = store.at_step(2)
+    assert(np.isnan(df["Coord1"].values[[0, 2]]).all())
+    assert(np.allclose(df["Coord1"].values[[1, 3]], [2., 4.]))
+
+def test_tracers_store_without_tracers(tmpdir):
+    import h5py
+    import numpy as np
+    from UWGeodynamics.postprocessing import extract_tracers_store
+    from UWGeodynamics.postprocessing import TracersStore
+    for step in (0, 1):
+        with h5py.File(str(tmpdir.join("tracers-%d.h5" % step)), "w") as h5f:
+            h5f.create_dataset("data", data=np.empty((0, 2)))
+            h5f.attrs["time"] = float(step)
+        with h5py.File(str(tmpdir.join("tracers_global_index-%d.h5" % step)), "w") as h5f:
+            h5f.create_dataset("data", data=np.empty((0, 1), dtype="int64"))
+    store = TracersStore(extract_tracers_store(str(tmpdir), "tracers",
+                                               processes=1))
+    assert(len(store) == 0)
+    assert(len(store.at_step(1)) == 0)
+
+def test_convert_directory(tmpdir):
+    import h5py
+    import numpy as np
+    from UWGeodynamics.utilities import convert_directory
+    vertices = np.array([[0., 0.], [1., 0.], [0., 1.], [1., 1.]])
+    with h5py.File(str(tmpdir.join("mesh.h5")), "w") as h5f:
+        h5f.create_dataset("vertices", data=vertices)
+        h5f.create_dataset("en_map", data=np.array([[0, 1, 2, 3]]))
+    with h5py.File(str(tmpdir.join("temperature-1.h5")), "w") as h5f:
+        h5f.create_dataset("data", data=vertices[:, :1] + vertices[:, 1:])
+    with open(str(tmpdir.join("temperature-1.xmf")), "w") as f:
+        f.write("""<?xml version="1.0" ?>
+<Xdmf Version="2.0">
+<Domain>
+<Grid Name="FEM_Mesh_mesh" GridType="Uniform">
+<Time Value="2.5" />
+<Topology Type="Quadrilateral" NumberOfElements="1">
+<DataItem Format="HDF" DataType="Int" Dimensions="1 4">mesh.h5:/en_map</DataItem>
+</Topology>
+<Geometry Type="XY">
+<DataItem Format="HDF" NumberType="Float" Precision="8" Dimensions="4 2">mesh.h5:/vertices</DataItem>
+</Geometry>
+<Attribute Type="Scalar" Center="Node" Name="temperature">
+<DataItem Format="HDF" NumberType="Float" Precision="8" Dimensions="4 1">temperature-1.h5:/data</DataItem>
+</Attribute>
+</Grid>
+</Domain>
+</Xdmf>
+""")
+    written = convert_directory(str(tmpdir), "npz", processes=1,
+                                verbose=False)
+    assert(written == [str(tmpdir.join("npz", "temperature.1.FEM_Mesh_mesh.npz"))])
+    data = np.load(written[0])
+    assert(np.allclose(data["coordinates"], vertices))
+    assert(np.allclose(data["temperature"].ravel(), [0., 1., 1., 2.]))
+    assert(float(data["time"]) == 2.5)
+    written = convert_directory(str(tmpdir), "ascii", processes=1,
+                                verbose=False)
+    assert(np.allclose(np.loadtxt(written[0])[:, 2], [0., 1., 1., 2.]))
+    written = convert_directory(str(tmpdir), "vtu", processes=1,
+                                verbose=False)
+    with open(written[0], "r") as f:
+        text = f.read()
+    assert('NumberOfPoints="4" NumberOfCells="1"' in text)
+    assert("0\n1\n3\n2\n" in text)
+
+def test_log_file(tmpdir):
+    from UWGeodynamics.postprocessing import LogFile
+    block = """Non linear solver - iteration {0}
+Pressure Solve: = 0.5 secs / 5 its
+Final V Solve: = 0.25 secs
+Total BSSCR Linear solve time: 1.0 seconds
+Non linear solver - iteration {1}
+Pressure Solve: = 0.5 secs / 5 its
+Non linear Solution Time = 2.0 (secs)
+Non linear solver - Residual {2}; Tolerance 1.0e-02 - Converged
+"""
+    filename = str(tmpdir.join("log.txt"))
+    with open(filename, "w") as f:
+        f.write("Initialising the model\n")
+        f.write(block.format(0, 1, "1.0e-03"))
+    log = LogFile(filename)
+    assert(len(log.nonLinear_blocks) == 1)
+    assert(log.iterations == [1])
+    assert(log.residuals == [1e-3])
+    assert(log.pressure_solve_times == [0.5, 0.5])
+    assert(log.total_BSSCR_times == [1.0])
+    assert(log.solution_times == [2.0])
+    lines = block.format(0, 1, "5.0e-03").splitlines(True)
+    with open(filename, "a") as f:
+        f.write("".join(lines[:2]) + "Final V")
+    assert(log.update() == [])
+    assert(len(log.nonLinear_blocks) == 2)
+    assert(log.nonLinear_blocks[-1].data["Final V Solve times"] == [])
+    with open(filename, "a") as f:
+        f.write(" Solve: = 0.25 secs\n" + "".join(lines[3:]))
+    assert(len(log.update()) == 1)
+    assert(log.residuals == [1e-3, 5e-3])
+    arrays = log.to_arrays()
+    assert(list(arrays["Iterations"]) == [1., 1.])
+    assert(list(arrays["Final V Solve time"]) == [0.25, 0.25])
+    assert(log.nonLinear_blocks[0].get_vals(["pressure solve"], 3) ==
+           [0.5, 0.5])
+    # A finished log may not end with a newline
+    with open(filename, "w") as f:
+        f.write(block.format(0, 1, "1.0e-03").rstrip("\n"))
+    log = LogFile(filename)
+    assert(log.residuals == [1e-3])
+    assert(log.nonLinear_blocks[0].get_vals(["residual"], 5,
+                                            lambda val: float(val[:-1])) ==
+           [1e-3])
+
+def test_anderson_mixing():
+    import numpy as np
+    from UWGeodynamics._nonlinear import AndersonMixing
+    rng = np.random.RandomState(0)
+    M = 0.9 * rng.rand(6, 6) / 6.
+    c = rng.rand(6)
+    solution = np.linalg.solve(np.eye(6) - M, c)
+    # The first update is a (damped) Picard step
+    mixer = AndersonMixing([], depth=2, damping=0.5)
+    x = np.zeros(6)
+    assert(np.allclose(mixer.update(x, c), 0.5 * c))
+    # Only the last depth differences are kept
+    mixer = AndersonMixing([], depth=2)
+    iterates = [np.zeros(6)]
+    residuals = []
+    for iteration in range(5):
+        x = iterates[-1]
+        g = np.dot(M, x) + c
+        residuals.append(g - x)
+        iterates.append(mixer.update(x, g))
+        assert(len(mixer._dF) == min(iteration, 2))
+    assert(np.allclose(mixer._dF[0], residuals[-2] - residuals[-3]))
+    assert(np.allclose(mixer._dF[1], residuals[-1] - residuals[-2]))
+    mixer.reset()
+    assert(not mixer._dF and mixer._previous_f is None)
+    # On a linear problem, mixing all the iterates converges in
+    # (size + 1) iterations
+    mixer = AndersonMixing([], depth=6)
+    x = np.zeros(6)
+    for iteration in range(8):
+        x = mixer.update(x, np.dot(M, x) + c)
+    assert(np.allclose(x, solution, rtol=1e-10, atol=0.))
+
+def test_eisenstat_walker_bounds():
+    import pytest
+    from UWGeodynamics._nonlinear import EisenstatWalker
+
+    class Scr(object):
+        ksp_rtol = 1e-5
+
+    class Options(object):
+        scr = Scr()
+
+    class Solver(object):
+        options = Options()
+
+    solver = Solver()
+    forcing = EisenstatWalker(solver, eta_min=1e-4, eta_max=1e-1)
+    forcing.start()
+    assert(solver.options.scr.ksp_rtol == 1e-1)
+    forcing.update(1.0)
+    assert(solver.options.scr.ksp_rtol == 1e-1)
+    # Fast convergence: eta is bounded by eta_min
+    forcing.update(1e-6)
+    assert(solver.options.scr.ksp_rtol == 1e-4)
+    # Divergence: eta is bounded by eta_max
+    forcing.update(10.)
+    assert(solver.options.scr.ksp_rtol == 1e-1)
+    forcing.restore()
+    assert(solver.options.scr.ksp_rtol == 1e-5)
+
+    # The safeguard limits the decrease of a large eta
+    forcing = EisenstatWalker(solver, eta_min=1e-4, eta_max=0.5)
+    forcing.start()
+    forcing.update(1.0)
+    forcing.update(1e-3)
+    assert(abs(solver.options.scr.ksp_rtol - 0.9 * 0.5**2) < 1e-12)
+    forcing.restore()
+    assert(solver.options.scr.ksp_rtol == 1e-5)
+
+    # Solvers without a tolerance are left untouched
+    forcing = EisenstatWalker(object())
+    with pytest.warns(UserWarning):
+        forcing.start()
+    forcing.update(1.0)
+    forcing.restore()
+
+def test_timers_phases_are_exclusive():
+    import time
+    import pytest
+    from UWGeodynamics._timers import Timers
+    timers = Timers()
+    assert("nonlinear" in timers.phases)
+    with pytest.raises(ValueError):
+        timers("unknown")
+    with timers("stokes"):
+        with timers("nonlinear"):
+            time.sleep(0.05)
+            with timers("isostasy"):
+                time.sleep(0.1)
+    times = timers._times
+    assert(times["stokes"] < 0.04)
+    assert(0.04 < times["nonlinear"] < 0.09)
+    assert(times["isostasy"] >= 0.09)
+    record = timers.report(filename=None, step=1)
+    assert(record["step"] == 1)
+    assert(record["phases"]["isostasy"]["max"] >= 0.09)
+    assert(sum(timers._times.values()) == 0.)
+
 #def test_passive_tracers():
 #    import numpy as np
 #    Model = GEO.Model(elementRes=(64,64),
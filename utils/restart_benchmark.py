@@ -0,0 +1,73 @@
+""" Restart benchmark: time the reload of a swarm and of a swarm variable
+
+Usage:
+
+    mpirun -np 4 python restart_benchmark.py [resolution] [particles per cell]
+
+The swarm is saved then reloaded twice: once with the optimised load
+(same number of processes as the save) and once with the brute force
+load used when the number of processes differs. The number of particles
+loaded per second is reported for each load.
+"""
+from __future__ import print_function,  absolute_import
+import os
+import sys
+import tempfile
+import underworld as uw
+from mpi4py import MPI
+from UWGeodynamics.Underworld_extended import Swarm
+
+comm = MPI.COMM_WORLD
+rank = comm.rank
+
+
+def _report(name, count, elapsed):
+    if rank == 0:
+        print("{0:<24} {1:>12d} particles {2:>10.3f} s {3:>14.1f} particles/s".format(
+            name, count, elapsed, count / elapsed))
+        sys.stdout.flush()
+
+
+def main(resolution=64, particlesPerCell=50):
+
+    mesh = uw.mesh.FeMesh_Cartesian(elementType="Q1/dQ0",
+                                    elementRes=(resolution, resolution),
+                                    minCoord=(0., 0.), maxCoord=(1., 1.))
+    swarm = Swarm(mesh)
+    layout = uw.swarm.layouts.PerCellSpaceFillerLayout(
+        swarm=swarm, particlesPerCell=particlesPerCell)
+    swarm.populate_using_layout(layout)
+    variable = swarm.add_variable("double", 1)
+    variable.data[:, 0] = swarm.particleCoordinates.data[:, 0]
+
+    outputDir = tempfile.mkdtemp() if rank == 0 else None
+    outputDir = comm.bcast(outputDir, root=0)
+    swarm_file = os.path.join(outputDir, "swarm.h5")
+    variable_file = os.path.join(outputDir, "variable.h5")
+    swarm.save(swarm_file)
+    variable.save(variable_file)
+    count = swarm.particleGlobalCount
+
+    for name, optimise in (("optimised", True), ("brute force", False)):
+        clone = Swarm(mesh)
+        clone_variable = clone.add_variable("double", 1)
+
+        comm.Barrier()
+        start = MPI.Wtime()
+        clone.load(swarm_file, try_optimise=optimise)
+        comm.Barrier()
+        _report("swarm " + name, count, MPI.Wtime() - start)
+
+        start = MPI.Wtime()
+        clone_variable.load(variable_file)
+        comm.Barrier()
+        _report("variable " + name, count, MPI.Wtime() - start)
+
+    if rank == 0:
+        os.remove(swarm_file)
+        os.remove(variable_file)
+        os.rmdir(outputDir)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,89 @@
+""" Swarm update benchmark: time the evaluation of several swarm updates
+
+Usage:
+
+    mpirun -np 4 python swarm_update_benchmark.py [resolution] [particles per cell] [masks]
+
+A number of masks (conditions on the particle coordinates, like the
+conditions of phase changes) are evaluated on the swarm:
+
+- separately, one evaluation and one array per mask (as done before
+  the SwarmUpdatePipeline),
+- joined in a vector function (sum of constant vectors times scalars),
+- packed in the bits of scalar functions (SwarmUpdatePipeline.bitmask).
+
+The number of particles processed per second is reported for each method.
+"""
+from __future__ import print_function,  absolute_import
+import sys
+import numpy as np
+import underworld as uw
+import underworld.function as fn
+from mpi4py import MPI
+from UWGeodynamics._swarm_update import SwarmUpdatePipeline
+
+comm = MPI.COMM_WORLD
+rank = comm.rank
+
+
+def _report(name, count, elapsed):
+    if rank == 0:
+        print("{0:<24} {1:>12d} particles {2:>10.3f} s {3:>14.1f} particles/s".format(
+            name, count, elapsed, count / elapsed))
+        sys.stdout.flush()
+
+
+def _time(swarm, name, function):
+    comm.Barrier()
+    start = MPI.Wtime()
+    function()
+    comm.Barrier()
+    _report(name, swarm.particleGlobalCount, MPI.Wtime() - start)
+
+
+def main(resolution=64, particlesPerCell=50, nmasks=8):
+
+    mesh = uw.mesh.FeMesh_Cartesian(elementType="Q1/dQ0",
+                                    elementRes=(resolution, resolution),
+                                    minCoord=(0., 0.), maxCoord=(1., 1.))
+    swarm = uw.swarm.Swarm(mesh)
+    layout = uw.swarm.layouts.PerCellSpaceFillerLayout(
+        swarm=swarm, particlesPerCell=particlesPerCell)
+    swarm.populate_using_layout(layout)
+
+    masks = [fn.branching.conditional(
+        [(fn.input()[0] > float(index + 1) / (nmasks + 1), 1.), (True, 0.)])
+        for index in range(nmasks)]
+
+    def separate():
+        return [mask.evaluate(swarm) for mask in masks]
+
+    def joined():
+        vector = None
+        for comp, mask in enumerate(masks):
+            unit = [0.] * nmasks
+            unit[comp] = 1.
+            term = fn.misc.constant(unit) * mask
+            vector = term if vector is None else vector + term
+        return vector.evaluate(swarm)
+
+    def packed():
+        pipeline = SwarmUpdatePipeline(swarm)
+        result = []
+        pipeline.add("masks", SwarmUpdatePipeline.bitmask(masks),
+                     lambda values: result.append(
+                         SwarmUpdatePipeline.unpack(values, nmasks)))
+        pipeline.run()
+        return result[0]
+
+    reference = np.hstack(separate()) > 0.5
+    if not (packed() == reference).all():
+        raise RuntimeError("The packed masks differ from the masks")
+
+    _time(swarm, "separate", separate)
+    _time(swarm, "vector function", joined)
+    _time(swarm, "bitmask", packed)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])